@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark dei formati di output di "Crea TAR" su un kernel già estratto.
+
+Uso:
+    python scripts/bench_compress.py <cartella kernel estratto> [--codecs tar,gz,zst,xz] [--baseline]
+
+Per ogni codec crea l'archivio in una cartella temporanea e riporta tempo,
+dimensione, rapporto di compressione e MB/s (calcolati sui byte del tar).
+Con --baseline misura anche tarfile a thread singolo ("w:gz", "w:xz") per
+confronto.
+"""
+
+import argparse
+import os
+import sys
+import tarfile
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils.tar_utils import create_tar  # noqa: E402
+
+EXTENSIONS = {"tar": ".tar", "gz": ".tar.gz", "zst": ".tar.zst", "xz": ".tar.xz"}
+
+
+def tree_size(root):
+    total = 0
+    for dirpath, _dirs, files in os.walk(root):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def row(label, seconds, out_size, src_size):
+    mb = src_size / (1024 * 1024)
+    ratio = out_size / src_size if src_size else 0.0
+    print(f"{label:<22} {seconds:8.1f}s {out_size / (1024 * 1024):10.1f} MB {ratio * 100:7.1f}% {mb / max(seconds, 1e-6):9.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compressione TAR")
+    parser.add_argument("source")
+    parser.add_argument("--codecs", default="tar,gz,zst,xz")
+    parser.add_argument("--baseline", action="store_true", help="Misura anche tarfile a thread singolo")
+    args = parser.parse_args()
+
+    src_size = tree_size(args.source)
+    print(f"Sorgente: {args.source} ({src_size / (1024 * 1024):.1f} MB), CPU: {os.cpu_count()}")
+    print(f"{'formato':<22} {'tempo':>9} {'dimensione':>13} {'rapporto':>8} {'velocità':>14}")
+    quiet = lambda line: None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec in args.codecs.split(","):
+            out = os.path.join(tmp, "bench" + EXTENSIONS[codec])
+            t0 = time.perf_counter()
+            try:
+                create_tar(args.source, out, quiet)
+            except RuntimeError as e:
+                print(f"{codec:<22} saltato: {e}")
+                continue
+            row(f"{codec} (parallelo)" if codec != "tar" else "tar", time.perf_counter() - t0, os.path.getsize(out), src_size)
+            os.remove(out)
+
+        if args.baseline:
+            base = os.path.basename(os.path.normpath(args.source))
+            for mode, ext in (("w:gz", ".tar.gz"), ("w:xz", ".tar.xz")):
+                out = os.path.join(tmp, "baseline" + ext)
+                t0 = time.perf_counter()
+                with tarfile.open(out, mode) as tar:
+                    tar.add(args.source, arcname=base)
+                row(f"tarfile {mode} (1 thread)", time.perf_counter() - t0, os.path.getsize(out), src_size)
+                os.remove(out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del motore nativo al variare dei processi del pool.
+
+Uso:
+    python scripts/bench_native.py [archivio.SAR] [--workers 1,2,4,8] [--size-mb 256] [--repeat 2]
+
+Senza archivio viene generato un .SAR sintetico con alcune voci grandi
+(divise in intervalli di blocchi, come disp+work) e molte voci piccole.
+Per ogni numero di processi l'archivio viene estratto in una cartella
+temporanea; si riportano il tempo migliore, i MB/s (sui byte estratti) e
+l'accelerazione rispetto al primo valore di --workers.
+
+I blocchi sintetici usano il formato atteso da sar.decompress: servono a
+misurare la scalabilità della pipeline, non la compatibilità con SAPCAR.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sar.extract import extract_archive  # noqa: E402
+from sar.reader import ALG_LZH, list_entries  # noqa: E402
+
+BLOCK = 64 * 1024
+
+
+def _entry(name, data, etype=b"RG", mode=0o100755):
+    raw_name = name.encode() + b"\x00"
+    out = struct.pack("<2sIIIIIHH", etype, mode, len(data) & 0xFFFFFFFF, len(data) >> 32,
+                      1700000000, 4103, 0, len(raw_name)) + raw_name
+    if etype == b"RG" and data:
+        chunks = [data[i:i + BLOCK] for i in range(0, len(data), BLOCK)]
+        for i, chunk in enumerate(chunks):
+            c = zlib.compressobj(6, zlib.DEFLATED, -15)
+            payload = struct.pack("<IB2sB", len(chunk), ALG_LZH, b"\x1f\x9d", 2) + c.compress(chunk) + c.flush()
+            out += (b"ED" if i == len(chunks) - 1 else b"DA") + struct.pack("<I", len(payload)) + payload
+        out += struct.pack("<I", zlib.crc32(data))
+    return out
+
+
+def make_synthetic(path, size_mb):
+    """Archivio sintetico: metà dei byte in 3 voci grandi, il resto in voci da 256 KB"""
+    rnd = random.Random(1)
+    words = [bytes(rnd.getrandbits(8) for _ in range(rnd.randint(3, 12))) for _ in range(4096)]
+
+    def payload(n):
+        # Dati comprimibili circa 2:1, come i binari di un kernel
+        parts, total = [], 0
+        while total < n:
+            w = words[rnd.randrange(len(words))]
+            parts.append(w)
+            total += len(w)
+        return b"".join(parts)[:n]
+
+    total = size_mb * 1024 * 1024
+    with open(path, "wb") as f:
+        f.write(b"CAR 2.01")
+        f.write(_entry("exe", b"", b"DR", 0o40755))
+        big = total // 6
+        for i in range(3):
+            f.write(_entry(f"exe/big{i}", payload(big)))
+        small = 256 * 1024
+        for i in range((total - 3 * big) // small):
+            f.write(_entry(f"exe/lib{i:04d}.so", payload(small)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del motore nativo")
+    parser.add_argument("archive", nargs="?")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--size-mb", type=int, default=256, help="Dimensione estratta dell'archivio sintetico")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+    workers = [int(w) for w in args.workers.split(",") if w.strip()]
+
+    tmp = tempfile.mkdtemp(prefix="bench_native_")
+    try:
+        archive = args.archive
+        if not archive:
+            archive = os.path.join(tmp, "SYNTH_1-1.SAR")
+            print(f"Genero un archivio sintetico da {args.size_mb} MB...")
+            make_synthetic(archive, args.size_mb)
+        size = sum(e.size for e in list_entries(archive) if e.is_file)
+        print(f"{os.path.basename(archive)}: {size / 1048576:,.0f} MB estratti, "
+              f"{os.path.getsize(archive) / 1048576:,.0f} MB compressi")
+        print(f"{'processi':>8}  {'tempo':>8}  {'MB/s':>8}  {'accel.':>6}")
+        base = None
+        for n in workers:
+            best = None
+            for _ in range(args.repeat):
+                dest = os.path.join(tmp, "out")
+                shutil.rmtree(dest, ignore_errors=True)
+                with ProcessPoolExecutor(max_workers=n) as pool:
+                    # Avvio dei processi escluso dalla misura
+                    list(pool.map(abs, range(n)))
+                    t0 = time.perf_counter()
+                    rc = extract_archive(archive, dest, lambda line: None, executor=pool)
+                    elapsed = time.perf_counter() - t0
+                if rc != 0:
+                    print(f"[ERRORE] estrazione fallita con {n} processi")
+                    return 1
+                best = elapsed if best is None else min(best, elapsed)
+            base = base or best
+            print(f"{n:>8}  {best:>7.2f}s  {size / 1048576 / best:>8.1f}  {base / best:>5.2f}x")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
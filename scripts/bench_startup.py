@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del tempo di avvio della GUI (time-to-first-window).
+
+Uso:
+    python scripts/bench_startup.py [--exe build/dist/sapcar_unpacker.exe] [--runs 5] [--budget-ms 2500]
+
+Avvia l'applicazione più volte con SAPCAR_UNPACKER_STARTUP_BENCH impostata:
+l'app scrive un file al primo disegno della finestra e si chiude da sola.
+Misura il tempo dal lancio del processo alla comparsa del file e fallisce
+(codice 1) se la mediana supera il budget.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ENV_VAR = "SAPCAR_UNPACKER_STARTUP_BENCH"
+
+
+def measure_once(cmd, cwd, timeout):
+    fd, marker = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    os.remove(marker)
+    env = dict(os.environ, **{ENV_VAR: marker})
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=cwd, env=env)
+    try:
+        while not os.path.exists(marker) or os.path.getsize(marker) == 0:
+            if proc.poll() is not None and not os.path.exists(marker):
+                raise RuntimeError(f"L'applicazione è terminata senza disegnare la finestra (RC={proc.returncode})")
+            if time.perf_counter() - t0 > timeout:
+                raise RuntimeError("Timeout in attesa della prima finestra")
+            time.sleep(0.005)
+        wall_ms = (time.perf_counter() - t0) * 1000
+        with open(marker, "r", encoding="utf-8") as f:
+            inproc_ms = float(f.read().strip() or 0)
+        proc.wait(timeout=timeout)
+        return wall_ms, inproc_ms
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        try:
+            os.remove(marker)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark avvio GUI SAPCAR Unpacker")
+    parser.add_argument("--exe", help="Eseguibile PyInstaller da misurare (default: python src/main.py)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=2500.0, help="Mediana massima ammessa")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    if args.exe:
+        cmd, cwd = [os.path.abspath(args.exe)], None
+    else:
+        cmd, cwd = [sys.executable, "main.py"], os.path.join(ROOT, "src")
+
+    walls = []
+    for i in range(args.runs):
+        wall_ms, inproc_ms = measure_once(cmd, cwd, args.timeout)
+        walls.append(wall_ms)
+        print(f"run {i + 1}: prima finestra {wall_ms:.0f} ms (di cui {inproc_ms:.0f} ms nel processo Python)")
+
+    median = statistics.median(walls)
+    print(f"mediana: {median:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    if median > args.budget_ms:
+        print("[ERRORE] Tempo di avvio oltre il budget")
+        return 1
+    print("[OK] Tempo di avvio entro il budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
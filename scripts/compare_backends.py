@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Verifica che il motore nativo produca file identici (byte per byte) a SAPCAR.
+
+Uso:
+    python scripts/compare_backends.py <SAPCAR.exe> <cartella corpus .SAR>
+    python scripts/compare_backends.py --record <SAPCAR.exe> <cartella corpus .SAR>
+
+Ogni .SAR del corpus viene estratto due volte in cartelle temporanee (SAPCAR
+e motore nativo) e gli alberi risultanti vengono confrontati via SHA-256.
+Esce con codice 1 se almeno un archivio differisce.
+
+Con --record gli SHA-256 dei file estratti da SAPCAR vengono scritti in
+<corpus>/expected.json, usato da tests/test_sapcar_corpus.py per
+confrontare il motore nativo senza SAPCAR.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sar.extract import extract_archive  # noqa: E402
+from utils.subprocess_utils import run_cmd  # noqa: E402
+
+
+def tree_digest(root):
+    """Mappa percorso relativo -> SHA-256 di tutti i file sotto root"""
+    result = {}
+    for dirpath, _dirs, files in os.walk(root):
+        for name in files:
+            full = os.path.join(dirpath, name)
+            h = hashlib.sha256()
+            with open(full, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(chunk)
+            result[os.path.relpath(full, root).replace("\\", "/")] = h.hexdigest()
+    return result
+
+
+def compare(sapcar, sar_path):
+    quiet = lambda line: None
+    with tempfile.TemporaryDirectory() as ref_dir, tempfile.TemporaryDirectory() as nat_dir:
+        rc = run_cmd(os.path.dirname(sapcar), [sapcar, "-xvf", sar_path, "-R", ref_dir], quiet)
+        if rc != 0:
+            return [f"SAPCAR RC={rc}"]
+        if extract_archive(sar_path, nat_dir, quiet) != 0:
+            return ["estrazione nativa fallita"]
+        ref, nat = tree_digest(ref_dir), tree_digest(nat_dir)
+        errors = [f"mancante nel nativo: {p}" for p in sorted(set(ref) - set(nat))]
+        errors += [f"in più nel nativo: {p}" for p in sorted(set(nat) - set(ref))]
+        errors += [f"contenuto diverso: {p}" for p in sorted(set(ref) & set(nat)) if ref[p] != nat[p]]
+        return errors
+
+
+def record(sapcar, sars, corpus):
+    quiet = lambda line: None
+    expected = {}
+    for sar_path in sars:
+        with tempfile.TemporaryDirectory() as ref_dir:
+            rc = run_cmd(os.path.dirname(sapcar), [sapcar, "-xvf", sar_path, "-R", ref_dir], quiet)
+            if rc != 0:
+                print(f"[ERRORE] {os.path.basename(sar_path)}: SAPCAR RC={rc}")
+                return 1
+            expected[os.path.basename(sar_path)] = tree_digest(ref_dir)
+    with open(os.path.join(corpus, "expected.json"), "w", encoding="utf-8") as f:
+        json.dump(expected, f, indent=2, sort_keys=True)
+    print(f"Registrati {len(expected)} archivi in {os.path.join(corpus, 'expected.json')}")
+    return 0
+
+
+def main():
+    args = sys.argv[1:]
+    recording = bool(args) and args[0] == "--record"
+    if recording:
+        args = args[1:]
+    if len(args) != 2:
+        sys.stderr.write(__doc__)
+        return 2
+    sapcar, corpus = os.path.abspath(args[0]), args[1]
+    sars = sorted(os.path.join(corpus, n) for n in os.listdir(corpus) if n.lower().endswith(".sar"))
+    if recording:
+        return record(sapcar, sars, corpus)
+    failed = 0
+    for sar_path in sars:
+        errors = compare(sapcar, sar_path)
+        print(f"[{'OK' if not errors else 'ERRORE'}] {os.path.basename(sar_path)}")
+        for err in errors:
+            print(f"    {err}")
+        failed += bool(errors)
+    print(f"{len(sars) - failed}/{len(sars)} archivi identici")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
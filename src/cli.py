@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SAPCAR Unpacker - CLI headless (nessun import di tkinter/customtkinter)
+
+Uso (dalla cartella src):
+    python -m cli extract --dest C:\\sap\\kernel --sar-dir C:\\download [--sapcar SAPCAR.exe] [--backend native]
+    python -m cli tar --source C:\\sap\\kernel --output kernel.tar
+    python -m cli test-kernel --dest C:\\sap\\kernel
+    python -m cli list SAPEXE.SAR
+    python -m cli verify --sar-dir C:\\download
+    python -m cli plan --dest C:\\sap\\kernel --sar-dir C:\\download
+    python -m cli index --sar-dir C:\\download
+    python -m cli sar2tar --sar-dir C:\\download --output kernel.tar.zst
+
+Ogni evento viene scritto su stdout come una riga JSON (NDJSON), ad es.
+{"event": "log", "message": "..."} oppure {"event": "package_done", ...}.
+Durante l'estrazione gli eventi "progress" riportano l'avanzamento pesato
+sui byte dei .SAR, la velocità misurata (byte/s) e l'ETA in secondi.
+Il codice di uscita è 0 se tutto è andato a buon fine.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Optional
+
+from models.backends import BACKEND_NATIVE, BACKEND_SAPCAR, BACKENDS, NATIVE_DISABLED_MESSAGE, native_enabled
+from models.sapcar_model import sort_sar_files
+from utils.settings_manager import DEFAULT_MAX_WORKERS, SettingsManager
+
+# Intervallo minimo (secondi) tra due eventi "progress"
+PROGRESS_INTERVAL = 1.0
+
+class EventWriter:
+    """Scrive eventi NDJSON su uno stream (thread-safe)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields) -> None:
+        record = {"event": event, "ts": round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def log(self, message: str) -> None:
+        self.emit("log", message=message)
+
+
+def _collect_sar_files(args, events: EventWriter) -> Optional[list]:
+    """File .SAR indicati con --sar e --sar-dir; None (con evento "error") se una cartella non è leggibile"""
+    from utils.dedup import path_key
+
+    files = list(args.sar or [])
+    for folder in args.sar_dir or []:
+        try:
+            names = os.listdir(folder)
+        except OSError as e:
+            events.emit("error", message=f"Impossibile leggere la cartella {folder}: {e.strerror or e}", sar_dir=folder)
+            return None
+        for name in names:
+            path = os.path.join(folder, name)
+            if os.path.isfile(path) and name.lower().endswith(".sar"):
+                files.append(path)
+    seen = set()
+    files = [f for f in files if not (path_key(f) in seen or seen.add(path_key(f)))]
+    if getattr(args, "latest", False) and files:
+        from utils.sar_index import INDEX_NAME, SarIndex, select_latest
+
+        index = SarIndex(os.path.join(SettingsManager().settings_dir, INDEX_NAME))
+        _, superseded = select_latest(index.lookup(files))
+        _save_index(index, events)
+        for path, newer in superseded.items():
+            events.emit("superseded", sar=path, newer=newer.path, component=newer.component,
+                        patch=newer.patch, release=newer.release)
+        files = [f for f in files if f not in superseded]
+    return files
+
+
+def _save_index(index, events: EventWriter) -> None:
+    try:
+        index.save()
+    except OSError as e:
+        events.log(f"[AVVISO] Indice dei .SAR non salvato: {e}")
+
+
+def _run_cancellable(runner, sar_files, completed, events: EventWriter) -> int:
+    """Esegue il runner in un thread: Ctrl+C / SIGTERM annullano il batch terminando SAPCAR"""
+    result = {}
+    finished = threading.Event()
+
+    def target():
+        try:
+            result["rc"] = runner.run(sar_files, completed=completed)
+        finally:
+            finished.set()
+
+    def on_signal(signum, frame):
+        if not runner.cancelled:
+            events.emit("cancel", signal=signum)
+            runner.cancel()
+
+    if hasattr(signal, "SIGTERM"):
+        try:
+            signal.signal(signal.SIGTERM, on_signal)
+        except ValueError:
+            pass
+    threading.Thread(target=target, name="extract").start()
+    # Event.wait e non Thread.join: un join interrotto da Ctrl+C può risultare già concluso
+    while not finished.is_set():
+        try:
+            finished.wait(0.2)
+        except KeyboardInterrupt:
+            on_signal(signal.SIGINT, None)
+    return result.get("rc", 1)
+
+
+def cmd_extract(args, events: EventWriter) -> int:
+    from models.extraction_runner import ExtractionRunner, bookkeeping_paths
+    from models.member_filter import MemberFilter
+    from models.scheduler import make_scheduler
+    from utils.run_history import RunHistory
+    from utils.sar_verify import SarVerifier
+
+    sar_files = _collect_sar_files(args, events)
+    if sar_files is None:
+        return 2
+    sar_files = sort_sar_files(sar_files)
+    if not sar_files:
+        events.emit("error", message="Nessun file .SAR indicato.")
+        return 2
+    if len(sar_files) > 1:
+        from utils.dedup import remove_duplicates
+        sar_files, removed = remove_duplicates(sar_files)
+        for dup, kept in removed.items():
+            events.emit("duplicate", sar=dup, same_as=kept)
+    if args.backend == BACKEND_NATIVE and not native_enabled():
+        events.emit("error", message=NATIVE_DISABLED_MESSAGE)
+        return 2
+    if args.backend == BACKEND_SAPCAR:
+        if not args.sapcar or not os.path.isfile(args.sapcar):
+            events.emit("error", message="Indica un eseguibile SAPCAR* valido con --sapcar (oppure --backend native).")
+            return 2
+        if not os.path.basename(args.sapcar).upper().startswith("SAPCAR"):
+            events.emit("error", message="L'eseguibile deve iniziare con 'SAPCAR'.")
+            return 2
+    os.makedirs(args.dest, exist_ok=True)
+
+    completed = None
+    if args.resume:
+        from models.journal import JobJournal
+        state = JobJournal.load_unfinished(args.dest)
+        if state is not None:
+            completed = state.merged
+            events.emit("resume", dest=args.dest, completed=sorted(state.merged), interrupted=state.interrupted)
+
+    from utils.progress import ProgressTracker
+
+    sapcar = os.path.abspath(args.sapcar) if args.sapcar else ""
+    total = len(sar_files)
+    done = [0]
+    lock = threading.Lock()
+    tracker = ProgressTracker(sar_files)
+    last_progress = [0.0]
+
+    def emit_progress(force=False):
+        now = time.monotonic()
+        if not force and now - last_progress[0] < PROGRESS_INTERVAL:
+            return
+        last_progress[0] = now
+        snap = tracker.snapshot()
+        events.emit("progress", fraction=round(snap.fraction, 4), done_bytes=snap.done_bytes,
+                    total_bytes=snap.total_bytes,
+                    rate=round(snap.rate) if snap.rate else None,
+                    eta=round(snap.eta, 1) if snap.eta is not None else None)
+
+    def on_output(idx, sar, line):
+        tracker.on_line(idx, line)
+        emit_progress()
+
+    def on_package_done(idx, sar, rc, elapsed):
+        tracker.package_done(idx)
+        with lock:
+            done[0] += 1
+            events.emit("package_done", index=idx, total=total, done=done[0], sar=sar,
+                        rc=rc, elapsed=round(elapsed, 3))
+        emit_progress(force=True)
+
+    pipeline = None
+    if args.tar:
+        from utils.tar_utils import TarPipeline
+        pipeline = TarPipeline(args.dest, args.tar, events.log,
+                               exclude=bookkeeping_paths(args.dest))
+
+    events.emit("start", action="extract", dest=args.dest, packages=sar_files,
+                backend=args.backend, workers=args.workers, tar=args.tar)
+    t0 = time.time()
+    settings = SettingsManager()
+    history = RunHistory(settings.settings_dir)
+    cache = None
+    if args.cache or args.cache_dir:
+        from utils.kernel_cache import KernelCache
+        cache = KernelCache(args.cache_dir or settings.cache_dir, settings.load_cache_max_bytes(),
+                            hardlinks=args.cache_hardlinks or settings.load_cache_hardlinks())
+    runner = ExtractionRunner(
+        os.path.dirname(sapcar), os.path.basename(sapcar), args.dest, events.log,
+        max_workers=args.workers, on_package_done=on_package_done, backend=args.backend,
+        on_package_start=lambda idx, sar: tracker.package_started(idx), on_output=on_output,
+        on_package_merged=(lambda idx, sar, moved: pipeline.add_files(moved)) if pipeline else None,
+        before_replace=pipeline.wait_released if pipeline else None,
+        skip_unchanged=not args.force,
+        merge_failed=args.merge_failed,
+        history=history,
+        scheduler=make_scheduler(args.schedule, args.workers, history),
+        member_filter=MemberFilter(args.include, args.exclude),
+        cache=cache,
+        verifier=None if args.no_verify else SarVerifier(settings.settings_dir),
+    )
+    try:
+        rc = _run_cancellable(runner, sar_files, completed, events)
+    finally:
+        runner.history.close()
+    if pipeline is not None:
+        try:
+            pipeline.close()
+        except Exception as e:
+            events.emit("error", message=f"Creazione TAR fallita: {e}")
+            rc = rc or 1
+    events.emit("finish", action="extract", rc=rc, elapsed=round(time.time() - t0, 3))
+    return 0 if rc == 0 else 1
+
+
+def cmd_tar(args, events: EventWriter) -> int:
+    from models.extraction_runner import bookkeeping_paths
+    from utils.tar_utils import create_tar
+
+    if not os.path.isdir(args.source):
+        events.emit("error", message=f"La cartella non esiste: {args.source}")
+        return 2
+    events.emit("start", action="tar", source=args.source, output=args.output)
+    t0 = time.time()
+    try:
+        create_tar(args.source, args.output, events.log, verbose=args.verbose,
+                   exclude=bookkeeping_paths(args.source))
+    except Exception as e:
+        events.emit("finish", action="tar", rc=1, error=str(e), elapsed=round(time.time() - t0, 3))
+        return 1
+    events.emit("finish", action="tar", rc=0, elapsed=round(time.time() - t0, 3))
+    return 0
+
+
+def cmd_sar2tar(args, events: EventWriter) -> int:
+    from sar.to_tar import sar_to_tar
+
+    if not native_enabled():
+        events.emit("error", message="sar2tar usa il motore nativo. " + NATIVE_DISABLED_MESSAGE)
+        return 2
+    sar_files = _collect_sar_files(args, events)
+    if sar_files is None:
+        return 2
+    sar_files = sort_sar_files(sar_files)
+    if not sar_files:
+        events.emit("error", message="Nessun file .SAR indicato.")
+        return 2
+    events.emit("start", action="sar2tar", packages=sar_files, output=args.output)
+    t0 = time.time()
+    rc = sar_to_tar(sar_files, args.output, events.log, base=args.base, verbose=args.verbose)
+    events.emit("finish", action="sar2tar", rc=rc, elapsed=round(time.time() - t0, 3))
+    return 0 if rc == 0 else 1
+
+
+def cmd_test_kernel(args, events: EventWriter) -> int:
+    from models.kernel_test import run_kernel_test
+    from utils.file_utils import find_dispwork
+
+    disp = find_dispwork(args.dest)
+    if not disp:
+        events.emit("error", message="disp+work non trovato nella cartella di destinazione.")
+        return 2
+    events.emit("start", action="test-kernel", dispwork=disp)
+    kwargs = {} if args.timeout is None else {"timeout": args.timeout}
+    rc, lines = run_kernel_test(disp, events.log, **kwargs)
+    events.emit("finish", action="test-kernel", rc=rc, info=lines)
+    return 0 if rc == 0 else 1
+
+
+def cmd_plan(args, events: EventWriter) -> int:
+    from models.member_filter import MemberFilter
+    from models.planner import plan_extraction
+
+    sar_files = _collect_sar_files(args, events)
+    if sar_files is None:
+        return 2
+    sar_files = sort_sar_files(sar_files)
+    if not sar_files:
+        events.emit("error", message="Nessun file .SAR indicato.")
+        return 2
+    plan = plan_extraction(sar_files, args.dest, MemberFilter(args.include, args.exclude))
+    for p in plan.packages:
+        events.emit("package_plan", sar=p.sar, files=p.files, dirs=p.dirs, bytes=p.bytes, error=p.error)
+    for (earlier, later), paths in plan.overlaps.items():
+        events.emit("overlap", sar=earlier, overwritten_by=later, files=paths)
+    events.emit("plan", dest=plan.dest_dir, packages=len(plan.packages), files=plan.total_files,
+                bytes=plan.total_bytes, required_bytes=plan.required_bytes,
+                reclaimable_bytes=plan.reclaimable_bytes,
+                free_bytes=plan.free_bytes, fits=plan.fits)
+    return 0 if plan.fits else 1
+
+
+def cmd_verify(args, events: EventWriter) -> int:
+    from utils.sar_verify import VERIFY_ERROR, VERIFY_MISMATCH, SarVerifier
+
+    sar_files = _collect_sar_files(args, events)
+    if sar_files is None:
+        return 2
+    sar_files = sort_sar_files(sar_files)
+    if not sar_files:
+        events.emit("error", message="Nessun file .SAR indicato.")
+        return 2
+    t0 = time.time()
+    results = SarVerifier(SettingsManager().settings_dir).verify(sar_files, events.log)
+    for r in results:
+        events.emit("verified", sar=r.sar, status=r.status, sha256=r.sha256, algorithm=r.algorithm,
+                    source=r.source, signed=r.signed, cached=r.cached, error=r.error)
+    bad = [r for r in results if r.status in (VERIFY_MISMATCH, VERIFY_ERROR)]
+    events.emit("finish", action="verify", rc=1 if bad else 0, elapsed=round(time.time() - t0, 3))
+    return 1 if bad else 0
+
+
+def cmd_index(args, events: EventWriter) -> int:
+    from utils.sar_index import INDEX_NAME, SarIndex, select_latest
+
+    t0 = time.time()
+    index = SarIndex(os.path.join(SettingsManager().settings_dir, INDEX_NAME))
+    infos = []
+    try:
+        for folder in args.sar_dir or []:
+            infos.extend(index.scan(folder))
+        infos.extend(index.lookup(args.sar or []))
+    except OSError as e:
+        events.emit("error", message=str(e))
+        return 2
+    _save_index(index, events)
+    _, superseded = select_latest(infos)
+    for info in infos:
+        newer = superseded.get(info.path)
+        events.emit("package", sar=info.path, component=info.component, patch=info.patch, sapnum=info.sapnum,
+                    release=info.release, platform=info.platform, manifest=info.manifest,
+                    latest=newer is None and info.group is not None,
+                    superseded_by=newer.path if newer else None, error=info.error)
+    events.emit("finish", action="index", rc=0, packages=len(infos), superseded=len(superseded),
+                elapsed=round(time.time() - t0, 3))
+    return 0
+
+
+def cmd_list(args, events: EventWriter) -> int:
+    from sar import SarFormatError, iter_entries
+
+    rc = 0
+    for path in args.archives:
+        try:
+            for entry in iter_entries(path):
+                events.emit("entry", archive=path, name=entry.path, type=entry.type,
+                            size=entry.size, mode=entry.mode, mtime=entry.mtime, crc=entry.crc)
+        except (OSError, SarFormatError) as e:
+            events.emit("error", archive=path, message=str(e))
+            rc = 1
+    return rc
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m cli", description="SAPCAR Unpacker (headless, output NDJSON)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("extract", help="Estrae uno o più pacchetti .SAR")
+    p.add_argument("--dest", required=True, help="Cartella di destinazione")
+    p.add_argument("--sar", action="append", help="File .SAR (ripetibile)")
+    p.add_argument("--sar-dir", action="append", help="Cartella da cui prendere tutti i .SAR (ripetibile)")
+    p.add_argument("--sapcar", help="Eseguibile SAPCAR* (obbligatorio con --backend sapcar)")
+    p.add_argument("--backend", choices=BACKENDS, default=BACKEND_SAPCAR,
+                   help="native è sperimentale: richiede SAPCAR_UNPACKER_NATIVE=1")
+    p.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="Estrazioni parallele")
+    p.add_argument("--resume", action="store_true", help="Salta i pacchetti già completati dal batch interrotto in --dest")
+    p.add_argument("--force", action="store_true", help="Riestrae anche i pacchetti invariati (ignora il manifest)")
+    p.add_argument("--merge-failed", action="store_true",
+                   help="Sposta in destinazione anche i file estratti dai pacchetti terminati con errore")
+    p.add_argument("--tar", help="Crea questo archivio (.tar[.gz|.zst|.xz]) mentre i pacchetti vengono estratti")
+    p.add_argument("--include", action="append", default=[],
+                   help="Estrae solo i file corrispondenti al pattern glob (ripetibile, es. 'disp+work*')")
+    p.add_argument("--exclude", action="append", default=[], help="Non estrae i file corrispondenti (ripetibile)")
+    p.add_argument("--cache", action="store_true",
+                   help="Ricrea dalla cache (reflink o copia) una combinazione di .SAR già estratta e registra le nuove")
+    p.add_argument("--cache-dir", help="Cartella della cache (predefinita: nella cartella delle impostazioni)")
+    p.add_argument("--cache-hardlinks", action="store_true",
+                   help="Ricrea dalla cache con hardlink: più veloce, ma i file restano in sola lettura e condivisi con la cache")
+    p.add_argument("--no-verify", action="store_true", help="Non confronta i .SAR con i checksum pubblicati")
+    p.add_argument("--schedule", choices=("longest", "canonical"),
+                   help="Ordine di avvio: prima i pacchetti più costosi (predefinito con più worker) o alfabetico")
+    p.add_argument("--latest", action="store_true",
+                   help="Per ogni componente tiene solo la patch più recente (nome del file e SAPMANIFEST.MF)")
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser("tar", help="Crea un archivio .tar di una cartella")
+    p.add_argument("--source", required=True)
+    p.add_argument("--output", required=True)
+    p.add_argument("--verbose", action="store_true", help="Una riga di log per ogni file aggiunto")
+    p.set_defaults(func=cmd_tar)
+
+    p = sub.add_parser("sar2tar", help="Converte .SAR direttamente in .tar[.gz|.zst|.xz] senza estrarre su disco "
+                       "(motore nativo sperimentale: richiede SAPCAR_UNPACKER_NATIVE=1)")
+    p.add_argument("--sar", action="append", help="File .SAR (ripetibile)")
+    p.add_argument("--sar-dir", action="append", help="Cartella da cui prendere tutti i .SAR (ripetibile)")
+    p.add_argument("--output", required=True)
+    p.add_argument("--base", default="", help="Cartella radice dentro l'archivio")
+    p.add_argument("--verbose", action="store_true")
+    p.add_argument("--latest", action="store_true",
+                   help="Per ogni componente tiene solo la patch più recente (nome del file e SAPMANIFEST.MF)")
+    p.set_defaults(func=cmd_sar2tar)
+
+    p = sub.add_parser("test-kernel", help="Esegue disp+work -v nella cartella indicata")
+    p.add_argument("--dest", required=True)
+    p.add_argument("--timeout", type=float, help="Secondi concessi a disp+work (predefinito: 60)")
+    p.set_defaults(func=cmd_test_kernel)
+
+    p = sub.add_parser("plan", help="Totali, sovrapposizioni e spazio richiesto, senza estrarre")
+    p.add_argument("--dest", required=True, help="Cartella di destinazione")
+    p.add_argument("--sar", action="append", help="File .SAR (ripetibile)")
+    p.add_argument("--sar-dir", action="append", help="Cartella da cui prendere tutti i .SAR (ripetibile)")
+    p.add_argument("--include", action="append", default=[], help="Conta solo i file corrispondenti (ripetibile)")
+    p.add_argument("--exclude", action="append", default=[], help="Non conta i file corrispondenti (ripetibile)")
+    p.add_argument("--latest", action="store_true",
+                   help="Per ogni componente tiene solo la patch più recente (nome del file e SAPMANIFEST.MF)")
+    p.set_defaults(func=cmd_plan)
+
+    p = sub.add_parser("verify", help="Confronta i .SAR con i checksum pubblicati (hash in parallelo, con cache)")
+    p.add_argument("--sar", action="append", help="File .SAR (ripetibile)")
+    p.add_argument("--sar-dir", action="append", help="Cartella da cui prendere tutti i .SAR (ripetibile)")
+    p.add_argument("--latest", action="store_true",
+                   help="Per ogni componente tiene solo la patch più recente (nome del file e SAPMANIFEST.MF)")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("index", help="Componente, patch e release dei .SAR, con la patch più recente di ciascun componente")
+    p.add_argument("--sar", action="append", help="File .SAR (ripetibile)")
+    p.add_argument("--sar-dir", action="append", help="Cartella da indicizzare (ripetibile)")
+    p.set_defaults(func=cmd_index)
+
+    p = sub.add_parser("list", help="Elenca il contenuto di archivi .SAR (lettore nativo)")
+    p.add_argument("archives", nargs="+")
+    p.set_defaults(func=cmd_list)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args, EventWriter())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
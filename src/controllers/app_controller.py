@@ -2,24 +2,35 @@ import os
 import threading
 import time
 from tkinter import messagebox, filedialog
-from models.sapcar_model import SapcarModel
+from models.backends import BACKEND_NATIVE, BACKEND_SAPCAR, NATIVE_DISABLED_MESSAGE, native_enabled
+from models.sapcar_model import SapcarModel, sort_sar_files
+from utils.dedup import path_key
 from utils.file_utils import to_short_path, find_dispwork
-from utils.subprocess_utils import run_cmd
 from utils.settings_manager import SettingsManager
-import tarfile
-import subprocess
-import time
-import webbrowser
-import json
+from utils.log_sink import LogSink
 
 class AppController:
     def __init__(self, view):
         self.view = view
         self.model = SapcarModel()
         self.settings = SettingsManager()
+        self._log_store = None
+        self._runner = None
+        self._worker = None
+        self._tracker = None
+        self._sar_keys = set()
+        self._dedup_future = None
+        self._dedup_finder = None
+        self._hash_cache = None
+        self._dedup_lock = threading.Lock()
+        self._sar_index = None
+        self._closing = False
+        self._log_sink = LogSink(self.view, self.view.log)
+        self._log_sink.start()
         
         self._bind_events()
-        self._load_settings()
+        # Impostazioni e log su disco dopo il primo disegno della finestra
+        self.view.after_idle(self._load_settings)
         
     def _bind_events(self):
         """Collega gli eventi dell'interfaccia ai metodi del controller"""
@@ -28,6 +39,7 @@ class AppController:
         
         # Buttons
         self.view.run_btn.configure(command=self.run_extraction)
+        self.view.cancel_btn.configure(command=self.cancel_extraction)
         # browse/selectors
         self.view.sapcar_browse_btn.configure(command=self.choose_sapcar)
         self.view.add_sar_btn.configure(command=self.choose_sar_files)
@@ -39,24 +51,84 @@ class AppController:
         self.view.export_btn.configure(command=self.export_batch)
         self.view.tar_btn.configure(command=self.create_tar_of_destination)
         self.view.open_btn.configure(command=self.open_destination)
+        self.view.sar2tar_btn.configure(command=self.convert_sar_to_tar)
+        self.view.plan_btn.configure(command=self.plan_extraction)
+        # menu
+        self.view.tools_menu.entryconfigure("Log completo...", command=self.open_full_log)
         
     def _load_settings(self):
         """Carica le impostazioni salvate"""
+        from utils.log_store import LogStore
+        try:
+            self._log_store = LogStore.for_session(self.settings.settings_dir)
+            self._log_sink.attach_store(self._log_store)
+        except OSError:
+            self._log_store = None
+
         last_sapcar = self.settings.load_last_sapcar()
         if last_sapcar and os.path.isfile(last_sapcar):
             self.view.sapcar_path.set(last_sapcar)
-            self.view.log.insert("end", f"Caricato ultimo SAPCAR: {last_sapcar}\n")
+            self._log(f"Caricato ultimo SAPCAR: {last_sapcar}")
+        self.view.max_workers.set(self.settings.load_max_workers())
+        if native_enabled():
+            self.view.backend.set("Nativo" if self.settings.load_backend() == BACKEND_NATIVE else "SAPCAR")
+        else:
+            # Motore nativo sperimentale: selezionabile solo se abilitato
+            self.view.backend_combo.configure(values=("SAPCAR",))
+            self.view.backend.set("SAPCAR")
+            self.view.sar2tar_btn.configure(state="disabled")
+        self._offer_resume()
+
+    def _offer_resume(self):
+        """Propone di riprendere l'ultimo batch se il suo journal non risulta terminato"""
+        from models.journal import JobJournal
+
+        dest = self.settings.load_last_dest()
+        state = JobJournal.load_unfinished(dest) if dest else None
+        if state is None:
+            return
+        remaining = state.remaining
+        missing = [s for s in state.sar_files if s in remaining and not os.path.isfile(s)]
+        self._log(f"(info) Estrazione interrotta in {dest}: {len(state.merged)}/{len(state.sar_files)} pacchetti completati")
+        if missing:
+            self._log("(info) Ripresa non possibile, .SAR non più disponibili: " + ", ".join(os.path.basename(s) for s in missing))
+            JobJournal.abandon(dest)
+            return
+        first = os.path.basename(remaining[0]) if remaining else "-"
+        if not messagebox.askyesno(
+            "Riprendi estrazione",
+            f"L'ultima estrazione in:\n{dest}\n\nsi è interrotta ({len(state.merged)} pacchetti su {len(state.sar_files)} completati).\n\n"
+            f"Riprendere da {first}?",
+        ):
+            JobJournal.abandon(dest)
+            self._log("(info) Ripresa annullata.")
+            return
+        self.view.dest_dir.set(dest)
+        if state.backend == BACKEND_NATIVE and not native_enabled():
+            self._log(f"(info) Il batch usava il motore nativo: {NATIVE_DISABLED_MESSAGE} Riprendo con SAPCAR.")
+        elif state.backend in (BACKEND_SAPCAR, BACKEND_NATIVE):
+            self.view.backend.set("Nativo" if state.backend == BACKEND_NATIVE else "SAPCAR")
+        # La lista del journal si ripristina com'è: senza ricerca duplicati, il batch
+        # ripreso contiene esattamente i pacchetti che il journal si aspetta
+        self.view.sar_files = list(state.sar_files)
+        self._sar_keys = {path_key(f) for f in state.sar_files}
+        self._dedup_future = None
+        self.view.sar_count_lbl.config(text=f"{len(self.view.sar_files)} selezionati")
+        self._log(f"(info) Ripristinati {len(state.sar_files)} file .SAR dal journal")
+        self.run_extraction(resume=state)
             
-    def _validate_inputs(self):
+    def _validate_inputs(self, require_sapcar=True):
         """Valida gli input prima dell'estrazione"""
-        sapcar = self.view.sapcar_path.get().strip('" ')
-        if not sapcar or not os.path.isfile(sapcar):
-            messagebox.showerror("Errore", "Seleziona un eseguibile SAPCAR* valido.")
-            return False
-            
-        if not os.path.basename(sapcar).upper().startswith("SAPCAR"):
-            messagebox.showerror("Errore", "L'eseguibile deve iniziare con 'SAPCAR'.")
-            return False
+        if require_sapcar:
+            sapcar = self.view.sapcar_path.get().strip('" ')
+            if not sapcar or not os.path.isfile(sapcar):
+                hint = " (oppure usa il motore Nativo)" if native_enabled() else ""
+                messagebox.showerror("Errore", f"Seleziona un eseguibile SAPCAR* valido{hint}.")
+                return False
+
+            if not os.path.basename(sapcar).upper().startswith("SAPCAR"):
+                messagebox.showerror("Errore", "L'eseguibile deve iniziare con 'SAPCAR'.")
+                return False
             
         if not self.view.sar_files:
             messagebox.showerror("Errore", "Aggiungi almeno un file .SAR.")
@@ -102,24 +174,86 @@ class AppController:
         except Exception as e:
             messagebox.showerror("Errore", f"Impossibile leggere la cartella:\n{e}")
             return
-        if found:
+        if found and self.view.latest_only.get():
+            self._log(f"Indicizzazione di {len(found)} file .SAR in corso...")
+            threading.Thread(target=self._add_latest_only, args=(found,), daemon=True).start()
+        elif found:
             self._append_sar_files(found)
 
+    def _add_latest_only(self, found):
+        """Indicizza i .SAR trovati (in background) e aggiunge solo l'ultima patch di ogni componente"""
+        from utils.sar_index import INDEX_NAME, SarIndex, format_superseded, select_latest
+
+        superseded = {}
+        try:
+            if self._sar_index is None:
+                self._sar_index = SarIndex(os.path.join(self.settings.settings_dir, INDEX_NAME))
+            _, superseded = select_latest(self._sar_index.lookup(found))
+            self._sar_index.save()
+        except Exception as e:
+            self._log(f"[AVVISO] Indicizzazione dei .SAR non riuscita, aggiunti tutti i file: {e}")
+        for path, newer in superseded.items():
+            self._log(format_superseded(path, newer))
+        self.view.after(0, self._append_sar_files, [f for f in found if f not in superseded])
+
     def _append_sar_files(self, new_files):
-        self.view.sar_files.extend(new_files)
-        # de-dup
-        seen = set()
-        uniq = []
-        for f in self.view.sar_files:
-            if f not in seen:
-                uniq.append(f)
-                seen.add(f)
-        self.view.sar_files = uniq
+        added = []
+        for f in new_files:
+            # Stesso file anche se scritto in modo diverso (maiuscole, / e \, percorso relativo)
+            key = path_key(f)
+            if key not in self._sar_keys:
+                self._sar_keys.add(key)
+                added.append(f)
+        self.view.sar_files.extend(added)
+        self.view.sar_count_lbl.config(text=f"{len(self.view.sar_files)} selezionati")
+        self._log(f"Aggiunti {len(added)} file .SAR (totale: {len(self.view.sar_files)})")
+        if added and len(self.view.sar_files) > 1:
+            self._schedule_dedup()
+
+    def _schedule_dedup(self):
+        """Cerca in background i .SAR con lo stesso contenuto e li toglie dalla lista"""
+        from concurrent.futures import Future
+        from utils.dedup import DuplicateFinder, remove_duplicates
+
+        if self._dedup_finder is None:
+            # Gli sha256 calcolati qui servono anche alla verifica dei checksum
+            self._dedup_finder = DuplicateFinder(self._get_hash_cache())
+        snapshot = list(self.view.sar_files)
+        future = Future()
+
+        def job():
+            # Una ricerca alla volta: quelle successive ritrovano gli hash in memoria
+            with self._dedup_lock:
+                removed = {}
+                try:
+                    _, removed = remove_duplicates(snapshot, self._dedup_finder)
+                    self._dedup_finder.hash_cache.save()
+                except Exception as e:
+                    self._log(f"[AVVISO] Ricerca duplicati non riuscita: {e}")
+                future.set_result(removed)
+            if removed:
+                self.view.after(0, self._apply_duplicates, removed)
+
+        self._dedup_future = future
+        threading.Thread(target=job, daemon=True).start()
+
+    def _apply_duplicates(self, removed):
+        """Toglie dalla lista le copie trovate (se la copia tenuta è ancora in lista)"""
+        present = set(self.view.sar_files)
+        dropped = [dup for dup, kept in removed.items() if dup in present and kept in present]
+        if not dropped:
+            return
+        for dup in dropped:
+            self._log(f"[DUPLICATO] {os.path.basename(dup)} è identico a {os.path.basename(removed[dup])}: rimosso dalla lista")
+            self._sar_keys.discard(path_key(dup))
+        dropped = set(dropped)
+        self.view.sar_files = [f for f in self.view.sar_files if f not in dropped]
         self.view.sar_count_lbl.config(text=f"{len(self.view.sar_files)} selezionati")
-        self._log(f"Aggiunti {len(new_files)} file .SAR (totale: {len(self.view.sar_files)})")
 
     def clear_sar_files(self):
         self.view.sar_files = []
+        self._sar_keys.clear()
+        self._dedup_future = None
         self.view.sar_count_lbl.config(text="0 selezionati")
         self._log("Lista .SAR svuotata.")
 
@@ -128,119 +262,206 @@ class AppController:
         if d:
             self.view.dest_dir.set(d)
         
-    def run_extraction(self):
-        """Esegue l'estrazione dei file SAR"""
-        if not self._validate_inputs():
+    def run_extraction(self, resume=None):
+        """Esegue l'estrazione dei file SAR (resume: JournalState di un batch interrotto)"""
+        backend = self._get_backend()
+        if not self._validate_inputs(require_sapcar=(backend == BACKEND_SAPCAR)):
             return
-            
-        sapcar = os.path.abspath(self.view.sapcar_path.get().strip('" '))
+
+        sapcar_raw = self.view.sapcar_path.get().strip('" ')
+        sapcar = os.path.abspath(sapcar_raw) if sapcar_raw else ""
         sapcar_dir = os.path.dirname(sapcar)
         sapcar_name = os.path.basename(sapcar)
         
         # Ordina i file SAR (SAPEXE* prima)
-        sar_files = sorted(
-            self.view.sar_files,
-            key=lambda p: (0 if os.path.basename(p).upper().startswith("SAPEXE") else 1, os.path.basename(p).upper())
-        )
+        sar_files = sort_sar_files(self.view.sar_files)
+
+        tar_to = None
+        if self.view.tar_during.get():
+            tar_to = self._ask_tar_path(self.view.dest_dir.get().strip('" '))
+            if not tar_to:
+                return
         
+        self.settings.save_last_dest(self.view.dest_dir.get().strip('" '))
         self.view.run_btn.configure(state="disabled")
-        self._log("\n== Inizio estrazione ==")
-        self._log(f"SAPCAR: {sapcar}")
-        self._log(f"Working dir: {sapcar_dir}")
+        self.view.cancel_btn.configure(state="normal")
+        self._log("\n== Ripresa estrazione ==" if resume else "\n== Inizio estrazione ==")
+        if backend == BACKEND_NATIVE:
+            self._log("Motore: nativo (senza SAPCAR)")
+        else:
+            self._log(f"SAPCAR: {sapcar}")
+            self._log(f"Working dir: {sapcar_dir}")
         
+        dedup = self._dedup_future
+
         def worker():
             try:
-                self._execute_extraction(sapcar_dir, sapcar_name, sar_files)
+                files = sar_files
+                if dedup is not None:
+                    if not dedup.done():
+                        self._log("(info) Attendo la ricerca dei .SAR duplicati...")
+                    removed = dedup.result()
+                    # Come _apply_duplicates: una copia si scarta solo se quella tenuta è in lista
+                    present = set(sar_files)
+                    files = [f for f in sar_files if not (f in removed and removed[f] in present)]
+                self._execute_extraction(sapcar_dir, sapcar_name, files, tar_to,
+                                         completed=resume.merged if resume else None)
             finally:
+                self._runner = None
                 self.view.run_btn.configure(state="normal")
+                self.view.cancel_btn.configure(state="disabled")
                 
-        threading.Thread(target=worker, daemon=True).start()
-        
-    def _execute_extraction(self, sapcar_dir, sapcar_name, sar_files):
-        """Esegue l'estrazione effettiva dei file"""
-        dest_dir = os.path.normpath(self.view.dest_dir.get().strip('" '))
-        
-        
-        overall_rc = 0
-        self._init_progress(len(sar_files))
+        self._worker = threading.Thread(target=worker, daemon=True)
+        self._worker.start()
+
+    def cancel_extraction(self):
+        """Interrompe l'estrazione in corso (SAPCAR e figli vengono terminati)"""
+        runner = self._runner
+        if runner is None or runner.cancelled:
+            return
+        self._log("\n(info) Annullamento richiesto...")
+        self.view.cancel_btn.configure(state="disabled")
+        runner.cancel()
         
-        for idx, sar in enumerate(sar_files, start=1):
-            sar_norm = os.path.normpath(sar)
-            self._log(f"\n[{idx}/{len(sar_files)}] Estrazione di: {sar_norm}")
+    def _execute_extraction(self, sapcar_dir, sapcar_name, sar_files, tar_to=None, completed=None):
+        """Esegue l'estrazione effettiva dei file (e, se richiesto, il .tar in parallelo)"""
+        from models.extraction_runner import ExtractionRunner, bookkeeping_paths
+        from utils.run_history import RunHistory
 
-            # Ottieni short paths quando possibile per evitare problemi con gli spazi
-            sar_short = to_short_path(sar_norm)
-            dest_short = to_short_path(dest_dir)
+        dest_dir = os.path.normpath(self.view.dest_dir.get().strip('" '))
+        max_workers = self._get_max_workers()
+        if max_workers > 1:
+            self._log(f"(info) Estrazioni parallele: {max_workers}")
 
-            # Scegli argomento per SAPCAR: preferisci short path se non contiene spazi
-            if sar_short and os.path.exists(sar_short) and " " not in sar_short:
-                sar_arg = sar_short
-                sar_used = "short"
-            else:
-                # con subprocess (shell=False) non servono virgolette
-                sar_arg = sar_norm
-                sar_used = "quoted"
+        pipeline = None
+        if tar_to:
+            from utils.tar_utils import TarPipeline
 
-            if dest_short and os.path.exists(dest_short) and " " not in dest_short:
-                dest_arg = dest_short
-                dest_used = "short"
-            else:
-                # con subprocess (shell=False) non servono virgolette
-                dest_arg = dest_dir
-                dest_used = "quoted"
+            self._log(f"(info) Archivio creato durante l'estrazione: {tar_to}")
+            try:
+                os.makedirs(dest_dir, exist_ok=True)
+                pipeline = TarPipeline(dest_dir, tar_to, self._log, exclude=bookkeeping_paths(dest_dir))
+            except Exception as e:
+                self._log(f"[ERRORE] Impossibile creare l'archivio TAR: {e}")
+                messagebox.showerror("Errore", f"Impossibile creare l'archivio TAR:\n{e}")
+                return
 
-            self._log(f"(info) sar arg: {sar_arg} ({sar_used}), dest arg: {dest_arg} ({dest_used})")
+        self._init_progress(sar_files)
+        tracker = self._tracker
+        runner = ExtractionRunner(
+            sapcar_dir, sapcar_name, dest_dir, self._log,
+            max_workers=max_workers,
+            on_package_done=lambda idx, sar, rc, elapsed: tracker.package_done(idx),
+            on_package_start=lambda idx, sar: tracker.package_started(idx),
+            on_output=lambda idx, sar, line: tracker.on_line(idx, line),
+            backend=self._get_backend(),
+            on_package_merged=(lambda idx, sar, moved: pipeline.add_files(moved)) if pipeline else None,
+            before_replace=pipeline.wait_released if pipeline else None,
+            skip_unchanged=bool(self.view.skip_unchanged.get()),
+            history=RunHistory(self.settings.settings_dir),
+            member_filter=self._get_member_filter(),
+            cache=self._get_cache(),
+            verifier=self._get_verifier(),
+        )
+        self._runner = runner
+        try:
+            overall_rc = runner.run(sar_files, completed=completed)
+        finally:
+            runner.history.close()
 
-            # PowerShell: --% passa i parametri così com'è
-            sapcar_exe = os.path.join(sapcar_dir, sapcar_name)
-            cmd = [sapcar_exe, "-xvf", sar_arg, "-R", dest_arg]
+        if pipeline is not None:
+            try:
+                pipeline.close()
+                self._log("[OK] Archivio TAR creato.")
+            except Exception as e:
+                overall_rc = overall_rc or 1
+                self._log(f"[ERRORE] Creazione TAR fallita: {e}")
 
-            # Log leggibile del comando
-            pretty = " ".join([f'"{a}"' if (" " in a or "\t" in a) else a for a in cmd])
-            self._log(f"Comando: {pretty}")
-            
-            t0 = time.time()
-            rc = run_cmd(sapcar_dir, cmd, self._log)
-            elapsed = time.time() - t0
-            
-            if rc == 0:
-                self._log(f"[OK] Estratto: {os.path.basename(sar)}")
-            else:
-                overall_rc = rc
-                self._log(f"[ERRORE] RC={rc} su: {os.path.basename(sar)}")
-                
-            self._tick_progress(elapsed)
-            
-        if overall_rc == 0:
+        if runner.cancelled:
+            self._log("\n== Estrazione annullata ==")
+            if not self._closing:
+                messagebox.showinfo("Annullato", "Estrazione annullata.\nI pacchetti completati sono nella destinazione; il batch può essere ripreso al prossimo avvio.")
+        elif overall_rc == 0:
             self._log("\n== Completato senza errori ==")
             messagebox.showinfo("Fatto", "Estrazione completata senza errori.")
         else:
             self._log("\n== Completato con errori ==")
             messagebox.showwarning("Errore", "Alcune estrazioni non sono andate a buon fine.")
-            
+
         self._finish_progress()
-        
-    def _init_progress(self, total):
-        """Inizializza la barra di progresso"""
-        self._total_pkgs = max(0, total)
-        self._done_pkgs = 0
+
+    def _get_backend(self):
+        """Motore di estrazione selezionato nella vista"""
+        try:
+            return BACKEND_NATIVE if self.view.backend.get() == "Nativo" and native_enabled() else BACKEND_SAPCAR
+        except Exception:
+            return BACKEND_SAPCAR
+
+    def _get_cache(self):
+        """Cache dei kernel estratti, se abilitata nella vista"""
+        if not self.view.use_cache.get():
+            return None
+        from utils.kernel_cache import KernelCache
+
+        return KernelCache(self.settings.cache_dir, self.settings.load_cache_max_bytes(),
+                           hardlinks=self.settings.load_cache_hardlinks())
+
+    def _get_verifier(self):
+        """Verifica dei .SAR prima dell'estrazione, se abilitata nella vista"""
+        if not self.view.verify_sar.get():
+            return None
+        from utils.sar_verify import SarVerifier
+
+        return SarVerifier(cache=self._get_hash_cache())
+
+    def _get_hash_cache(self):
+        """Cache degli hash condivisa da ricerca dei duplicati e verifica"""
+        if self._hash_cache is None:
+            from utils.sar_verify import HASH_CACHE_NAME, HashCache
+
+            self._hash_cache = HashCache(os.path.join(self.settings.settings_dir, HASH_CACHE_NAME))
+        return self._hash_cache
+
+    def _get_member_filter(self):
+        """Filtro file impostato nella vista (inattivo se i campi sono vuoti)"""
+        from models.member_filter import MemberFilter
+
+        return MemberFilter.from_text(self.view.include_patterns.get(), self.view.exclude_patterns.get())
+
+    def _get_max_workers(self):
+        """Legge dalla vista il limite di estrazioni parallele"""
+        try:
+            return max(1, int(self.view.max_workers.get()))
+        except Exception:
+            return 1
+
+    def _init_progress(self, sar_files):
+        """Inizializza la barra di progresso (pesata sui byte dei .SAR)"""
+        from utils.progress import ProgressTracker
+
+        self._tracker = ProgressTracker(sar_files)
         self._start_ts = time.time()
-        self.view.progress_var.set(0.0)
-        
-    def _tick_progress(self, duration):
-        """Aggiorna la barra di progresso"""
-        self._done_pkgs = min(self._done_pkgs + 1, self._total_pkgs)
-        perc = (self._done_pkgs / self._total_pkgs * 100) if self._total_pkgs > 0 else 0
-        
-        def update():
-            self.view.progress_var.set(perc)
-            self.view.progress_lbl.configure(
-                text=f"{self._done_pkgs}/{self._total_pkgs} • {int(perc)}%"
-            )
-        self.view.after(0, update)
+        self.view.after(0, self._refresh_progress, self._tracker)
+
+    def _refresh_progress(self, tracker):
+        """Aggiorna barra ed ETA finché il batch di tracker è in corso"""
+        if tracker is not self._tracker:
+            return
+        from utils.progress import format_eta
+
+        snap = tracker.snapshot()
+        self.view.progress_var.set(snap.fraction * 100)
+        text = (f"{snap.done_packages}/{snap.total_packages} • {int(snap.fraction * 100)}% • "
+                f"{snap.done_bytes / 1048576:.0f}/{snap.total_bytes / 1048576:.0f} MB")
+        if snap.rate:
+            text += f" • {snap.rate / 1048576:.1f} MB/s • ETA {format_eta(snap.eta)}"
+        self.view.progress_lbl.configure(text=text)
+        self.view.after(500, self._refresh_progress, tracker)
         
     def _finish_progress(self):
         """Completa la barra di progresso"""
+        self._tracker = None
+
         def update():
             self.view.progress_var.set(100.0)
             elapsed = time.time() - self._start_ts
@@ -249,20 +470,51 @@ class AppController:
         self.view.after(0, update)
         
     def _log(self, message):
-        """Aggiunge una riga al log"""
-        self.view.log.configure(state="normal")
-        self.view.log.insert("end", message + "\n")
-        self.view.log.see("end")
-        self.view.log.configure(state="disabled")
-        self.view.update_idletasks()
+        """Aggiunge una riga al log (thread-safe: la scrittura avviene a lotti nel main loop)"""
+        self._log_sink.write(message)
         
     def _on_close(self):
         """Gestisce la chiusura dell'applicazione"""
+        runner = self._runner
+        if runner is not None and self._worker is not None and self._worker.is_alive():
+            # Non lasciamo processi SAPCAR orfani: annulliamo e attendiamo (con il main loop attivo)
+            self._closing = True
+            runner.cancel()
+            self._log("(info) Chiusura: attendo la terminazione delle estrazioni in corso...")
+            self._wait_worker_and_close(time.time() + 10)
+            return
+        self._shutdown()
+
+    def _wait_worker_and_close(self, deadline):
+        if self._worker is not None and self._worker.is_alive() and time.time() < deadline:
+            self.view.after(100, self._wait_worker_and_close, deadline)
+            return
+        self._shutdown()
+
+    def _shutdown(self):
+        """Salva le impostazioni e chiude la finestra"""
+        self._log_sink.stop()
+        # Righe accodate dopo l'ultimo lotto mostrato
+        self._log_sink.drain()
+        if self._log_store is not None:
+            self._log_store.close()
         try:
             self.settings.save_last_sapcar(self.view.sapcar_path.get().strip('" '))
+            self.settings.save_max_workers(self._get_max_workers())
+            self.settings.save_backend(self._get_backend())
         finally:
             self.view.destroy()
 
+    def open_full_log(self):
+        """Apre il visualizzatore del log completo su disco"""
+        if self._log_store is None:
+            messagebox.showerror("Errore", "Il log su disco non è disponibile.")
+            return
+        from views.log_viewer import LogViewer
+
+        self._log_sink.flush()
+        LogViewer(self.view, self._log_store)
+
     # ---- Extra actions (export, tar, open, test kernel) ----
     def export_batch(self):
         if not self._validate_inputs():
@@ -274,7 +526,7 @@ class AppController:
         dest_short = to_short_path(dest_norm)
 
         lines = [f'Set-Location -Path "{sapcar_dir}"', ""]
-        for sar in sorted(self.view.sar_files, key=lambda p: (0 if os.path.basename(p).upper().startswith("SAPEXE") else 1, os.path.basename(p).upper())):
+        for sar in sort_sar_files(self.view.sar_files):
             sar_norm = os.path.normpath(sar)
             sar_short = to_short_path(sar_norm)
             sar_arg = sar_short if (sar_short == to_short_path(sar_short) and " " not in sar_short) else f'"{sar_norm}"'
@@ -290,6 +542,11 @@ class AppController:
             except Exception as e:
                 messagebox.showerror("Errore", f"Impossibile salvare il file:\n{e}")
 
+    def _ask_tar_path(self, dest_dir):
+        """Chiede dove salvare l'archivio (tar semplice o compresso in parallelo)"""
+        default_name = os.path.basename(os.path.normpath(dest_dir).rstrip("\\/")) if dest_dir else ""
+        return filedialog.asksaveasfilename(title="Salva archivio TAR", initialfile=f"{default_name or 'estrazione'}.tar", defaultextension=".tar", filetypes=[("TAR archive", "*.tar"), ("TAR + gzip (parallelo)", "*.tar.gz"), ("TAR + zstd (parallelo)", "*.tar.zst"), ("TAR + xz (parallelo)", "*.tar.xz")])
+
     def create_tar_of_destination(self):
         dest_dir = self.view.dest_dir.get().strip('" ')
         if not dest_dir:
@@ -300,8 +557,7 @@ class AppController:
             messagebox.showerror("Errore", f"La cartella di destinazione non esiste:\n{dest_dir}")
             return
 
-        default_name = os.path.basename(dest_dir.rstrip("\\/")) or "estrazione"
-        save_to = filedialog.asksaveasfilename(title="Salva archivio TAR", initialfile=f"{default_name}.tar", defaultextension=".tar", filetypes=[("TAR archive", "*.tar")])
+        save_to = self._ask_tar_path(dest_dir)
         if not save_to:
             return
 
@@ -310,30 +566,11 @@ class AppController:
         self._log(f"Archivio: {save_to}")
 
         def worker():
-            try:
-                save_abs = os.path.abspath(save_to)
-                base = os.path.basename(dest_dir.rstrip("\\/"))
-
-                with tarfile.open(save_abs, "w") as tar:
-                    for root, dirs, files in os.walk(dest_dir):
-                        for name in files:
-                            full = os.path.join(root, name)
-                            if os.path.abspath(full) == save_abs:
-                                continue
-                            arcname = os.path.join(base, os.path.relpath(full, start=dest_dir)).replace("\\", "/")
-                            self._log(f"Aggiungo: {arcname}")
-                            tar.add(full, arcname=arcname, recursive=False)
-                        for d in dirs:
-                            dir_full = os.path.join(root, d)
-                            rel_arc = os.path.join(base, os.path.relpath(dir_full, start=dest_dir)).replace("\\", "/")
-                            ti = tarfile.TarInfo(rel_arc)
-                            ti.type = tarfile.DIRTYPE
-                            try:
-                                ti.mtime = int(os.path.getmtime(dir_full))
-                            except Exception:
-                                ti.mtime = int(time.time())
-                            tar.addfile(ti)
+            from models.extraction_runner import bookkeeping_paths
+            from utils.tar_utils import create_tar
 
+            try:
+                create_tar(dest_dir, save_to, self._log, exclude=bookkeeping_paths(dest_dir))
                 self._log("[OK] Archivio TAR creato.")
                 messagebox.showinfo("TAR creato", f"Archivio creato:\n{save_to}")
             except Exception as e:
@@ -342,6 +579,75 @@ class AppController:
 
         threading.Thread(target=worker, daemon=True).start()
 
+    def convert_sar_to_tar(self):
+        """Converte i .SAR selezionati direttamente in un archivio tar (senza estrarre su disco)"""
+        if not native_enabled():
+            messagebox.showerror("Motore nativo", NATIVE_DISABLED_MESSAGE)
+            return
+        if not self.view.sar_files:
+            messagebox.showerror("Errore", "Aggiungi almeno un file .SAR.")
+            return
+        sar_files = sort_sar_files(self.view.sar_files)
+        dest = self.view.dest_dir.get().strip('" ')
+        default_name = os.path.basename(os.path.normpath(dest)) if dest else "kernel"
+        save_to = self._ask_tar_path(dest)
+        if not save_to:
+            return
+
+        self._log("\n== Conversione SAR → TAR (motore nativo) ==")
+        self._log(f"Pacchetti: {len(sar_files)}")
+        self._log(f"Archivio: {save_to}")
+        self.view.sar2tar_btn.configure(state="disabled")
+
+        def worker():
+            from sar.to_tar import sar_to_tar
+
+            try:
+                rc = sar_to_tar(sar_files, save_to, self._log, base=default_name)
+            finally:
+                self.view.sar2tar_btn.configure(state="normal")
+            if rc == 0:
+                messagebox.showinfo("TAR creato", f"Archivio creato:\n{save_to}")
+            else:
+                messagebox.showerror("Errore", "Conversione SAR → TAR fallita. Vedi il log.")
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def plan_extraction(self):
+        """Legge gli indici dei .SAR e riporta totali, sovrapposizioni e spazio (senza scrivere nulla)"""
+        if not self.view.sar_files:
+            messagebox.showerror("Errore", "Aggiungi almeno un file .SAR.")
+            return
+        dest_dir = self.view.dest_dir.get().strip('" ')
+        if not dest_dir:
+            messagebox.showerror("Errore", "Seleziona la cartella di destinazione.")
+            return
+        sar_files = sort_sar_files(self.view.sar_files)
+        self._log("\n== Pianificazione estrazione ==")
+        self.view.plan_btn.configure(state="disabled")
+
+        def worker():
+            from models.planner import format_plan, plan_extraction
+
+            try:
+                plan = plan_extraction(sar_files, dest_dir, self._get_member_filter())
+            finally:
+                self.view.plan_btn.configure(state="normal")
+            for line in format_plan(plan):
+                self._log(line)
+            summary = (f"{len(plan.packages)} pacchetti, {plan.total_files} file, "
+                       f"{plan.total_bytes / 1048576:,.0f} MB\n"
+                       f"Coppie di pacchetti con file sovrascritti: {len(plan.overlaps)}")
+            if not plan.fits:
+                messagebox.showwarning("Spazio insufficiente", f"{summary}\n\nSpazio libero: "
+                                       f"{plan.free_bytes / 1048576:,.0f} MB, richiesti ~{plan.required_bytes / 1048576:,.0f} MB")
+            elif plan.unreadable:
+                messagebox.showwarning("Piano", f"{summary}\n\nIndice non leggibile per {len(plan.unreadable)} pacchetti (vedi il log).")
+            else:
+                messagebox.showinfo("Piano", summary)
+
+        threading.Thread(target=worker, daemon=True).start()
+
     def open_destination(self):
         d = self.view.dest_dir.get().strip('" ')
         if not d or not os.path.isdir(d):
@@ -350,37 +656,15 @@ class AppController:
         try:
             os.startfile(d)
         except Exception as e:
+            import subprocess
             try:
                 subprocess.Popen(["explorer", d])
             except Exception:
                 messagebox.showerror("Errore", f"Impossibile aprire la cartella:\n{e}")
 
     def extract_dispwork_main_section(self, lines):
-        norm = [(i, (line or ""), (line or "").strip().lower()) for i, line in enumerate(lines)]
-        start_idx = None
-        end_idx = None
-
-        for i, raw, low in norm:
-            if low == "disp+work information":
-                start_idx = i
-                if i > 0 and set(norm[i - 1][1].strip()) <= set("-"):
-                    start_idx = i - 1
-                break
-
-        if start_idx is None:
-            return lines
-
-        for i, raw, low in norm[start_idx + 1:]:
-            if low == "disp+work patch information":
-                end_idx = i
-                if i > 0 and set(norm[i - 1][1].strip()) <= set("-"):
-                    end_idx = i - 1
-                break
-
-        if end_idx is None:
-            end_idx = len(lines)
-
-        return lines[start_idx:end_idx]
+        from models.kernel_test import extract_dispwork_main_section
+        return extract_dispwork_main_section(lines)
 
     def test_kernel(self):
         dest = self.view.dest_dir.get().strip('" ')
@@ -393,31 +677,12 @@ class AppController:
             messagebox.showerror("disp+work non trovato", "Non è stato trovato 'disp+work' nella cartella di destinazione.\nControlla di aver estratto SAPEXE / SAPEXEDB correttamente.")
             return
 
-        disp_dir = os.path.dirname(disp)
-        disp_name = os.path.basename(disp)
-        
-
         self._log(f"\n== Test kernel: eseguo {disp} -v ==")
 
         def worker():
-            buf = []
-
-            def collect_only(line: str):
-                buf.append(line)
-
-            rc = None
-            for flag in ("-v", "-V"):
-                exe = os.path.join(disp_dir, disp_name)
-                cmd = [exe, flag]
-                pretty = " ".join([f'"{a}"' if (" " in a or "\t" in a) else a for a in cmd])
-                self._log(f"Comando: {pretty} (cwd={disp_dir})")
-                rc = run_cmd(disp_dir, cmd, collect_only)
-                if rc == 0:
-                    break
-                else:
-                    self._log(f"(info) disp+work ha restituito RC={rc} con {flag}. Provo alternativa...")
-
-            lines = self.extract_dispwork_main_section(buf)
+            from models.kernel_test import run_kernel_test
+
+            rc, lines = run_kernel_test(disp, self._log)
             self._log("\n== Sezione principale (filtrata) ==")
             for ln in lines:
                 self._log(ln)
@@ -4,14 +4,33 @@
 SAPCAR Unpacker - Main Application Entry
 """
 
+import os
 import sys
+import time
+import multiprocessing
 from views.main_window import MainWindow
 from controllers.app_controller import AppController
 
+# Se impostata, l'app scrive in questo file il tempo al primo disegno ed esce
+# (usata da scripts/bench_startup.py)
+STARTUP_BENCH_ENV = "SAPCAR_UNPACKER_STARTUP_BENCH"
+
 def main():
+    # Necessario per il pool di processi del motore nativo nell'eseguibile PyInstaller
+    multiprocessing.freeze_support()
+    t0 = time.perf_counter()
+    bench_file = os.environ.get(STARTUP_BENCH_ENV)
     try:
         app = MainWindow()
+        # Primo disegno della finestra prima di caricare customtkinter e le impostazioni
+        app.update()
+        if bench_file:
+            with open(bench_file, "w", encoding="utf-8") as f:
+                f.write(f"{(time.perf_counter() - t0) * 1000:.1f}\n")
+        app.create_action_buttons()
         controller = AppController(app)
+        if bench_file:
+            app.after(200, app.destroy)
         app.mainloop()
     except Exception as e:
         sys.stderr.write(f"Errore di esecuzione: {e}\n")
@@ -0,0 +1,24 @@
+"""
+Motori di estrazione. Modulo senza dipendenze pesanti: lo importano anche
+la GUI e la CLI prima di caricare models.extraction_runner (e subprocess).
+
+Il motore nativo è sperimentale: la decodifica LZH/LZC non è ancora stata
+confrontata con un corpus di archivi prodotti da SAPCAR
+(tests/fixtures/sapcar), quindi va abilitato esplicitamente con la
+variabile d'ambiente NATIVE_ENV.
+"""
+
+import os
+
+BACKEND_SAPCAR = "sapcar"
+BACKEND_NATIVE = "native"
+BACKENDS = (BACKEND_SAPCAR, BACKEND_NATIVE)
+
+NATIVE_ENV = "SAPCAR_UNPACKER_NATIVE"
+NATIVE_DISABLED_MESSAGE = (f"Il motore nativo è sperimentale e non è abilitato "
+                           f"(imposta {NATIVE_ENV}=1 per usarlo).")
+
+
+def native_enabled() -> bool:
+    """True se il motore nativo sperimentale è stato abilitato"""
+    return os.environ.get(NATIVE_ENV, "").strip().lower() in ("1", "true", "yes", "si", "sì")
@@ -0,0 +1,617 @@
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from models.backends import BACKEND_NATIVE, BACKEND_SAPCAR
+from models.journal import JOURNAL_NAME, JobJournal
+from models.manifest import MANIFEST_NAME, ExtractionManifest, package_key
+from models.member_filter import MemberFilter
+from models.planner import format_plan, plan_extraction
+from models.sapcar_model import is_sapexe, sort_sar_files
+from models.scheduler import Scheduler, make_scheduler
+from utils.file_utils import to_short_path, merge_tree
+from utils.hashing import file_digest
+from utils.progress import format_eta
+from utils.sar_verify import VERIFY_ERROR, VERIFY_MISMATCH
+from utils.subprocess_utils import CANCELLED_RC, run_cmd
+
+# Cartella temporanea (dentro la destinazione) in cui ogni pacchetto viene estratto
+STAGING_DIR_NAME = ".sapcar_staging"
+
+# Lunghezza massima dei nomi di file passati a una singola invocazione di SAPCAR
+# (la riga di comando di Windows è limitata a 32767 caratteri)
+SAPCAR_ARGS_CHARS = 24000
+
+
+def bookkeeping_paths(dest_dir: str) -> tuple:
+    """File e cartelle di servizio dentro la destinazione (da escludere dagli archivi)"""
+    return (os.path.join(dest_dir, STAGING_DIR_NAME), os.path.join(dest_dir, MANIFEST_NAME),
+            os.path.join(dest_dir, JOURNAL_NAME))
+
+
+def _list_package_files(sar: str) -> Optional[List[str]]:
+    """File contenuti in un pacchetto letti dall'indice (None se il formato non è leggibile)"""
+    try:
+        from sar import list_entries
+        return [e.path for e in list_entries(sar) if e.is_file]
+    except Exception:
+        return None
+
+
+def _chunk_args(names: List[str], limit: int = SAPCAR_ARGS_CHARS) -> List[List[str]]:
+    """Divide i nomi in gruppi la cui lunghezza complessiva resta entro limit"""
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    length = 0
+    for name in names:
+        cost = len(name) + 3   # spazio e virgolette
+        if current and length + cost > limit:
+            chunks.append(current)
+            current, length = [], 0
+        current.append(name)
+        length += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _pretty_cmd(cmd: List[str]) -> str:
+    return " ".join([f'"{a}"' if (" " in a or "\t" in a) else a for a in cmd])
+
+
+class ExtractionRunner:
+    """
+    Estrae più pacchetti SAR con un pool di worker.
+
+    I pacchetti SAPEXE* vengono completati prima che partano gli altri.
+    Ogni pacchetto viene estratto in una cartella di staging e poi spostato
+    nella destinazione rispettando l'ordine di get_sar_files_sorted, così i
+    file in comune tra pacchetti vengono risolti come in un'esecuzione
+    sequenziale (vince l'ultimo pacchetto in ordine).
+
+    Con backend=BACKEND_NATIVE i pacchetti sono decompressi in-process
+    (modulo sar) senza bisogno di SAPCAR.
+
+    on_package_merged viene chiamato (nello stesso ordine) con i percorsi
+    relativi dei file appena spostati nella destinazione: permette di
+    archiviare un pacchetto mentre i successivi sono ancora in estrazione.
+    before_replace(percorso) viene chiamato prima di sovrascrivere un file
+    della destinazione (utils.file_utils.merge_tree): con TarPipeline
+    attende che la copia precedente sia stata archiviata.
+
+    I pacchetti terminati con errore non vengono spostati nella
+    destinazione (la loro cartella di staging viene eliminata) e restano da
+    rieseguire; con merge_failed=True viene spostato anche quanto estratto
+    fino all'errore, come nelle versioni precedenti.
+
+    L'esito di ogni pacchetto viene registrato nel manifest della
+    destinazione; con skip_unchanged=True i pacchetti già estratti da un
+    .SAR identico, con file ancora intatti, vengono saltati.
+
+    Gli stati dei pacchetti sono scritti anche nel journal della
+    destinazione (models.journal): dopo un'interruzione run(completed=...)
+    riprende saltando i pacchetti già spostati nella destinazione.
+
+    on_package_start (idx, sar) e on_output (idx, sar, riga) permettono di
+    seguire l'avanzamento dentro i pacchetti effettivamente estratti.
+
+    Con history (utils.run_history.RunHistory) la durata del batch viene
+    stimata prima di partire, le estrazioni riuscite vengono registrate e
+    i pacchetti anomalmente lenti segnalati nel log.
+
+    Con preflight=True, prima di scrivere nella destinazione, gli indici dei
+    pacchetti da estrarre vengono confrontati con lo spazio libero: se non
+    basta il batch non parte (models.planner).
+
+    member_filter (models.member_filter) limita l'estrazione ai file che
+    corrispondono ai pattern: i nomi vengono risolti sull'indice del .SAR
+    e passati a SAPCAR a gruppi, oppure filtrati dal motore nativo.
+
+    Con cache (utils.kernel_cache.KernelCache) una combinazione di .SAR già
+    estratta in passato viene ricreata dalla cache con hardlink/reflink
+    invece di rieseguire l'estrazione; altrimenti, a batch riuscito, il
+    risultato viene registrato in cache.
+
+    Con verifier (utils.sar_verify.SarVerifier) i .SAR vengono confrontati
+    con i checksum pubblicati prima di toccare la destinazione; gli sha256
+    calcolati vengono riusati per manifest e cache.
+
+    scheduler (models.scheduler) decide l'ordine di avvio dentro ogni fase;
+    per default, con più worker, partono prima i pacchetti più costosi.
+
+    cancel() (chiamabile da qualsiasi thread) ferma il batch: SAPCAR viene
+    terminato con tutti i suoi figli, i processi del motore nativo si
+    fermano al blocco successivo e nessun altro pacchetto viene spostato
+    nella destinazione, che resta coerente e riprendibile dal journal.
+    """
+
+    def __init__(self, sapcar_dir: str, sapcar_name: str, dest_dir: str,
+                 log: Callable[[str], None], max_workers: int = 1,
+                 on_package_done: Optional[Callable[[int, str, int, float], None]] = None,
+                 backend: str = BACKEND_SAPCAR,
+                 on_package_merged: Optional[Callable[[int, str, List[str]], None]] = None,
+                 skip_unchanged: bool = False,
+                 on_package_start: Optional[Callable[[int, str], None]] = None,
+                 on_output: Optional[Callable[[int, str, str], None]] = None,
+                 history=None,
+                 scheduler: Optional[Scheduler] = None,
+                 preflight: bool = True,
+                 member_filter: Optional[MemberFilter] = None,
+                 cache=None,
+                 verifier=None,
+                 before_replace: Optional[Callable[[str], None]] = None,
+                 merge_failed: bool = False):
+        self.sapcar_dir = sapcar_dir
+        self.sapcar_name = sapcar_name
+        self.dest_dir = os.path.normpath(dest_dir)
+        self.log = log
+        self.max_workers = max(1, int(max_workers))
+        self.on_package_done = on_package_done
+        self.backend = backend
+        self.on_package_merged = on_package_merged
+        self.skip_unchanged = skip_unchanged
+        self.on_package_start = on_package_start
+        self.on_output = on_output
+        self.history = history
+        self.scheduler = scheduler
+        self.preflight = preflight
+        self.member_filter = member_filter or MemberFilter()
+        self.cache = cache
+        self.verifier = verifier
+        self.before_replace = before_replace
+        self.merge_failed = merge_failed
+        self._process_pool = None
+        self._manifest: Optional[ExtractionManifest] = None
+        self._journal: Optional[JobJournal] = None
+        self._skip = set()
+        self._resumed = set()
+        self._rcs = {}
+        self._digests = {}
+        self._merged = set()
+        self._failed: List[str] = []
+        # Pacchetti estratti per intero perché il filtro non era applicabile
+        self._unfiltered = set()
+        self._cancel = threading.Event()
+        self._mp_cancel = None
+
+        self._lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._staged = {}
+        self._next_merge = 0
+        self._merge_rc = 0
+        self._sar_files: List[str] = []
+
+    def run(self, sar_files: List[str], completed: Optional[Dict[str, List[str]]] = None) -> int:
+        """
+        Esegue l'estrazione e restituisce l'ultimo RC diverso da zero (0 se tutto ok).
+        completed: pacchetti già spostati nella destinazione da un batch interrotto (.SAR -> file)
+        """
+        self._sar_files = sort_sar_files(sar_files)
+        self._staged = {}
+        self._next_merge = 0
+        self._merge_rc = 0
+        self._rcs = {}
+        self._digests = {}
+        self._merged = set()
+        self._failed = []
+        self._unfiltered = set()
+        if self.verifier is not None:
+            self.log(f"(info) Verifica di {len(self._sar_files)} pacchetti...")
+            results = self.verifier.verify(self._sar_files, self.log)
+            bad = [r for r in results if r.status in (VERIFY_MISMATCH, VERIFY_ERROR)]
+            if bad:
+                self.log(f"[ERRORE] Estrazione non avviata: {len(bad)} pacchetti non superano la verifica")
+                return 1
+            for idx, result in enumerate(results, start=1):
+                if result.sha256:
+                    self._digests[idx] = result.sha256
+        staging_root = os.path.join(self.dest_dir, STAGING_DIR_NAME)
+        if os.path.isdir(staging_root):
+            # Residuo di un'esecuzione interrotta: i pacchetti non spostati vengono rifatti
+            self.log("(info) Rimuovo la cartella di staging di un'esecuzione interrotta")
+            shutil.rmtree(staging_root, ignore_errors=True)
+
+        self._manifest = ExtractionManifest.load(self.dest_dir)
+        completed = completed or {}
+        self._resumed = {sar for sar in self._sar_files if sar in completed}
+        for sar in self._resumed:
+            self._manifest.record(sar, 0, completed[sar], filter_key=self.member_filter.key)
+        if self.member_filter:
+            self.log(f"(info) Filtro file: {self.member_filter.describe()}")
+        self._skip = (self._manifest.plan(self._sar_files, self._package_files, self.member_filter.key)
+                      if self.skip_unchanged else set())
+        self._skip |= self._resumed
+
+        # Anche la cache scrive nella destinazione: lo spazio si controlla prima
+        if self.preflight:
+            plan = plan_extraction([sar for sar in self._sar_files if sar not in self._skip], self.dest_dir,
+                                   self.member_filter)
+            if not plan.fits:
+                for line in format_plan(plan):
+                    self.log(line)
+                self.log("[ERRORE] Estrazione non avviata: libera spazio nella destinazione e riprova")
+                return 1
+
+        sar_digests = None
+        # Se tutti i pacchetti sono invariati la destinazione è già a posto
+        if self.cache is not None and len(self._skip) < len(self._sar_files):
+            sar_digests = self._sar_digests()
+            if sar_digests is not None:
+                rc = self._run_from_cache(sar_digests, staging_root)
+                if rc is not None:
+                    return rc
+
+        self._journal = JobJournal(self.dest_dir)
+        try:
+            self._journal.open(self._sar_files, self.backend, resume=bool(self._resumed))
+        except OSError as e:
+            self.log(f"[ERRORE] Impossibile scrivere il journal {self._journal.path}: {e}")
+        for idx, sar in enumerate(self._sar_files, start=1):
+            self._journal.record("queued", idx=idx, sar=sar)
+        if self._skip:
+            self.log(f"(info) Pacchetti invariati da saltare: {len(self._skip)}/{len(self._sar_files)}")
+
+        indexed = list(enumerate(self._sar_files, start=1))
+        phases = [
+            [item for item in indexed if is_sapexe(item[1])],
+            [item for item in indexed if not is_sapexe(item[1])],
+        ]
+        self._log_estimate(phases)
+
+        overall_rc = 0
+        workers = min(self.max_workers, len(indexed)) or 1
+        if self.backend == BACKEND_NATIVE:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            from sar.extract import init_worker
+            # Un solo pool di processi condiviso da tutti i pacchetti (parallelismo per voce)
+            self._mp_cancel = multiprocessing.Event()
+            if self._cancel.is_set():
+                self._mp_cancel.set()
+            self._process_pool = ProcessPoolExecutor(initializer=init_worker, initargs=(self._mp_cancel,))
+        scheduler = self.scheduler or make_scheduler(None, workers, self.history)
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sapcar") as pool:
+                for phase in phases:
+                    # I pacchetti saltati terminano subito: in testa, così lo spostamento non li attende
+                    skipped = [item for item in phase if item[1] in self._skip]
+                    todo = scheduler.order([item for item in phase if item[1] not in self._skip],
+                                           self.backend, workers)
+                    # Barriera: la fase successiva parte solo quando questa è terminata
+                    futures = [pool.submit(self._extract_package, idx, sar, staging_root)
+                               for idx, sar in skipped + todo]
+                    for fut in futures:
+                        rc = fut.result()
+                        if rc != 0:
+                            overall_rc = rc
+        finally:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(cancel_futures=True)
+                self._process_pool = None
+                self._mp_cancel = None
+
+        cancelled = self._cancel.is_set()
+        if self._failed and not cancelled:
+            self.log(f"\n[ERRORE] Pacchetti non spostati in destinazione ({len(self._failed)}): "
+                     + ", ".join(os.path.basename(sar) for sar in self._failed))
+        if cancelled:
+            # Pacchetti non spostati: la destinazione non li contiene, il manifest neppure
+            shutil.rmtree(staging_root, ignore_errors=True)
+            for sar in self._sar_files:
+                if sar not in self._skip and sar not in self._merged:
+                    self._manifest.forget(sar)
+            done = sum(1 for sar in self._sar_files if sar in self._merged or sar in self._skip)
+            self.log(f"\n[ANNULLATO] Pacchetti completati: {done}/{len(self._sar_files)}; "
+                     f"gli altri non sono stati copiati nella destinazione (il batch può essere ripreso)")
+        try:
+            os.rmdir(staging_root)
+        except OSError:
+            pass
+        try:
+            self._manifest.save()
+        except OSError as e:
+            self.log(f"[ERRORE] Impossibile aggiornare il manifest {self._manifest.path}: {e}")
+        if cancelled:
+            self._journal.record("cancelled")
+            self._journal.close()
+            return CANCELLED_RC
+        rc = overall_rc or self._merge_rc
+        if rc == 0 and sar_digests is not None:
+            if self._unfiltered:
+                self.log("(info) Kernel non registrato in cache: il filtro non è stato applicato a tutti i pacchetti")
+            else:
+                self._store_in_cache(sar_digests)
+        self._journal.close(rc)
+        return rc
+
+    def _sar_digests(self) -> Optional[List[str]]:
+        """sha256 dei .SAR in ordine (dal manifest se il file non è cambiato)"""
+        digests = []
+        for idx, sar in enumerate(self._sar_files, start=1):
+            digest = self._digests.get(idx)
+            if digest is None and self._manifest.sar_unchanged(sar):
+                digest = self._manifest.packages[package_key(sar)].get("sha256")
+            if digest is None:
+                try:
+                    digest = file_digest(sar)
+                except OSError as e:
+                    self.log(f"[AVVISO] Cache non utilizzabile: {e}")
+                    return None
+            self._digests[idx] = digest
+            digests.append(digest)
+        return digests
+
+    def _run_from_cache(self, sar_digests: List[str], staging_root: str) -> Optional[int]:
+        """Ricrea la destinazione dalla cache; None se la combinazione non è in cache"""
+        entry = self.cache.lookup(sar_digests, self.member_filter.key)
+        if entry is None:
+            self.log("(info) Combinazione di pacchetti non presente in cache: estrazione completa")
+            return None
+        self.log(f"[CACHE] Kernel già estratto in precedenza: ricreo {len(entry['files'])} file dalla cache")
+        t0 = time.time()
+        try:
+            stage_dir = os.path.join(staging_root, "cache")
+            summary = self.cache.materialize(entry, stage_dir)
+            merge_tree(stage_dir, self.dest_dir, self.before_replace)
+        except OSError as e:
+            self.log(f"[AVVISO] Cache non utilizzabile ({e}): estrazione completa")
+            shutil.rmtree(staging_root, ignore_errors=True)
+            return None
+        try:
+            os.rmdir(staging_root)
+        except OSError:
+            pass
+        self.log(f"[CACHE] Destinazione pronta in {time.time() - t0:.1f}s ({summary})")
+
+        self._journal = JobJournal(self.dest_dir)
+        try:
+            self._journal.open(self._sar_files, self.backend)
+        except OSError as e:
+            self.log(f"[ERRORE] Impossibile scrivere il journal {self._journal.path}: {e}")
+        for idx, sar in enumerate(self._sar_files, start=1):
+            files = entry["packages"][idx - 1]
+            self._manifest.record(sar, 0, files, sha256=sar_digests[idx - 1], filter_key=self.member_filter.key)
+            self._journal.record("merged", idx=idx, sar=sar, files=files, cached=True)
+            self._merged.add(sar)
+            if self.on_package_done:
+                self.on_package_done(idx, sar, 0, 0.0)
+            if self.on_package_merged:
+                self.on_package_merged(idx, sar, [rel.replace("/", os.sep) for rel in files])
+        try:
+            self._manifest.save()
+        except OSError as e:
+            self.log(f"[ERRORE] Impossibile aggiornare il manifest {self._manifest.path}: {e}")
+        self._journal.close(0)
+        return 0
+
+    def _store_in_cache(self, sar_digests: List[str]) -> None:
+        """Registra in cache il contenuto finale della destinazione"""
+        packages = [self._manifest.packages.get(package_key(sar), {}).get("files", []) for sar in self._sar_files]
+        self.log("(info) Registro il kernel nella cache...")
+        try:
+            self.cache.store(sar_digests, self.member_filter.key, self.dest_dir, packages, self.log)
+        except OSError as e:
+            self.log(f"[AVVISO] Registrazione in cache non riuscita: {e}")
+
+    def cancel(self) -> None:
+        """Richiede l'interruzione del batch in corso"""
+        self._cancel.set()
+        mp_cancel = self._mp_cancel
+        if mp_cancel is not None:
+            mp_cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def _package_files(self, sar: str) -> Optional[List[str]]:
+        """File del pacchetto che il filtro lascia estrarre (None se l'indice non è leggibile)"""
+        files = _list_package_files(sar)
+        if files is None or not self.member_filter:
+            return files
+        return self.member_filter.select(files)
+
+    def _select_members(self, sar: str) -> Optional[List[str]]:
+        """Nomi delle voci da passare a SAPCAR (come scritti nell'archivio)"""
+        try:
+            from sar import list_entries
+            return [e.name for e in list_entries(sar) if e.is_file and self.member_filter.matches(e.path)]
+        except Exception:
+            return None
+
+    def _extract_package(self, idx: int, sar: str, staging_root: str) -> int:
+        total = len(self._sar_files)
+        sar_norm = os.path.normpath(sar)
+        tag = f"[{idx}/{total}]"
+        if self._cancel.is_set() and sar not in self._skip:
+            self._package_done(idx, sar, CANCELLED_RC, 0.0, None)
+            return CANCELLED_RC
+        if sar in self._resumed:
+            self.log(f"\n{tag} [RIPRESA] Già completato: {os.path.basename(sar_norm)}")
+            self._package_done(idx, sar, 0, 0.0, None, skipped=True)
+            return 0
+        if sar in self._skip:
+            self.log(f"\n{tag} [SKIP] Invariato: {os.path.basename(sar_norm)}")
+            self._package_done(idx, sar, 0, 0.0, None, skipped=True)
+            return 0
+        self.log(f"\n{tag} Estrazione di: {sar_norm}")
+        self._journal.record("running", idx=idx, sar=sar)
+
+        stage_dir = os.path.join(staging_root, f"{idx:04d}")
+        try:
+            os.makedirs(stage_dir, exist_ok=True)
+        except Exception as e:
+            self.log(f"[ERRORE] Impossibile creare la cartella di staging {stage_dir}: {e}")
+            self._package_done(idx, sar, 1, 0.0, None)
+            return 1
+
+        if self.max_workers > 1:
+            # Con più worker le righe di SAPCAR si mescolano: le prefissiamo col pacchetto
+            log_line = lambda line: self.log(f"{tag} {line}")
+        else:
+            log_line = self.log
+        if self.on_output:
+            def line_log(line: str) -> None:
+                log_line(line)
+                self.on_output(idx, sar, line)
+        else:
+            line_log = log_line
+        if self.on_package_start:
+            self.on_package_start(idx, sar)
+
+        t0 = time.time()
+        if self.backend == BACKEND_NATIVE:
+            from sar.extract import extract_archive
+            self.log(f"{tag} Motore nativo: {os.path.basename(sar_norm)} -> {stage_dir}")
+            rc = extract_archive(sar_norm, stage_dir, line_log, executor=self._process_pool,
+                                 cancel_event=self._mp_cancel,
+                                 select=self.member_filter.matches if self.member_filter else None)
+        elif self.member_filter:
+            members = self._select_members(sar_norm)
+            if members is None:
+                self.log(f"[AVVISO] {tag} Indice non leggibile: il filtro non si applica a "
+                         f"{os.path.basename(sar_norm)}, estraggo il pacchetto completo")
+                with self._lock:
+                    self._unfiltered.add(sar)
+                rc = self._run_sapcar(tag, sar_norm, stage_dir, line_log)
+            elif not members:
+                self.log(f"{tag} [FILTRO] Nessun file selezionato in {os.path.basename(sar_norm)}")
+                rc = 0
+            else:
+                self.log(f"{tag} [FILTRO] {len(members)} file selezionati")
+                rc = 0
+                for chunk in _chunk_args(members):
+                    rc = self._run_sapcar(tag, sar_norm, stage_dir, line_log, chunk)
+                    if rc != 0 or self._cancel.is_set():
+                        break
+        else:
+            rc = self._run_sapcar(tag, sar_norm, stage_dir, line_log)
+        elapsed = time.time() - t0
+        if self._cancel.is_set():
+            rc = CANCELLED_RC
+        self._package_done(idx, sar, rc, elapsed, stage_dir)
+        return rc
+
+    def _run_sapcar(self, tag: str, sar_norm: str, stage_dir: str, line_log: Callable[[str], None],
+                    members: Optional[List[str]] = None) -> int:
+        """Estrae un pacchetto con l'eseguibile SAPCAR (members: solo queste voci)"""
+        # Ottieni short paths quando possibile per evitare problemi con gli spazi
+        sar_short = to_short_path(sar_norm)
+        dest_short = to_short_path(stage_dir)
+
+        # Scegli argomento per SAPCAR: preferisci short path se non contiene spazi
+        if sar_short and os.path.exists(sar_short) and " " not in sar_short:
+            sar_arg, sar_used = sar_short, "short"
+        else:
+            # con subprocess (shell=False) non servono virgolette
+            sar_arg, sar_used = sar_norm, "quoted"
+
+        if dest_short and os.path.exists(dest_short) and " " not in dest_short:
+            dest_arg, dest_used = dest_short, "short"
+        else:
+            dest_arg, dest_used = stage_dir, "quoted"
+
+        self.log(f"(info) {tag} sar arg: {sar_arg} ({sar_used}), dest arg: {dest_arg} ({dest_used})")
+
+        sapcar_exe = os.path.join(self.sapcar_dir, self.sapcar_name)
+        cmd = [sapcar_exe, "-xvf", sar_arg, "-R", dest_arg]
+        self.log(f"{tag} Comando: {_pretty_cmd(cmd)}" + (f" + {len(members)} file" if members else ""))
+        cmd += members or []
+        return run_cmd(self.sapcar_dir, cmd, line_log, cancel_event=self._cancel)
+
+    def _log_estimate(self, phases: List[List[tuple]]) -> None:
+        """Stima dallo storico la durata dei pacchetti da estrarre"""
+        if self.history is None or self.member_filter:
+            return
+        total = 0.0
+        for phase in phases:
+            todo = [sar for _, sar in phase if sar not in self._skip]
+            estimate = self.history.predict_total(todo, self.backend, self.max_workers)
+            if estimate is None:
+                return
+            total += estimate
+        if total:
+            self.log(f"(info) Durata stimata dallo storico: ~{format_eta(total)}")
+
+    def _record_history(self, sar: str, elapsed: float) -> None:
+        """Registra l'estrazione nello storico, segnalandola se anomala"""
+        try:
+            size = os.path.getsize(sar)
+        except OSError:
+            return
+        expected = self.history.is_slow(sar, size, elapsed, self.backend, self.max_workers)
+        if expected:
+            self.log(f"[LENTO] {os.path.basename(sar)}: {elapsed:.1f}s contro ~{expected:.1f}s previsti "
+                     f"(disco, antivirus o rete?)")
+        self.history.record(sar, size, elapsed, self.backend, self.max_workers)
+
+    def _package_done(self, idx: int, sar: str, rc: int, elapsed: float, stage_dir: Optional[str],
+                      skipped: bool = False) -> None:
+        # Le estrazioni filtrate non sono rappresentative della velocità
+        if self.history is not None and rc == 0 and stage_dir and not self.member_filter:
+            self._record_history(sar, elapsed)
+        with self._lock:
+            if rc == 0 and not skipped:
+                self.log(f"[OK] Estratto: {os.path.basename(sar)} ({elapsed:.1f}s)")
+            elif rc == CANCELLED_RC:
+                self.log(f"[ANNULLATO] {os.path.basename(sar)}")
+            elif rc != 0:
+                self.log(f"[ERRORE] RC={rc} su: {os.path.basename(sar)}")
+            self._rcs[idx] = rc
+            if rc == CANCELLED_RC:
+                self._journal.record("cancelled", idx=idx, sar=sar)
+            elif not skipped:
+                self._journal.record("done" if rc == 0 else "failed", idx=idx, sar=sar, rc=rc,
+                                     elapsed=round(elapsed, 3))
+            if self.on_package_done:
+                self.on_package_done(idx, sar, rc, elapsed)
+            self._staged[idx] = stage_dir
+        self._merge_ready()
+
+    def _merge_ready(self) -> None:
+        """Sposta nella destinazione i pacchetti completati, rispettando l'ordine"""
+        with self._merge_lock:
+            while True:
+                if self._cancel.is_set():
+                    # Dopo l'annullamento la destinazione non cambia più
+                    return
+                with self._lock:
+                    nxt = self._next_merge + 1
+                    if nxt not in self._staged:
+                        return
+                    stage_dir = self._staged.pop(nxt)
+                    self._next_merge = nxt
+                sar = self._sar_files[nxt - 1]
+                if sar in self._skip:
+                    rec = self._manifest.packages.get(package_key(sar), {})
+                    self._journal.record("merged", idx=nxt, sar=sar, files=rec.get("files", []), skipped=True)
+                    continue
+                moved = []
+                rc = self._rcs.get(nxt, 1)
+                if rc != 0 and not self.merge_failed:
+                    # Contenuto parziale: la destinazione resta com'era prima del pacchetto
+                    if stage_dir:
+                        shutil.rmtree(stage_dir, ignore_errors=True)
+                    self._failed.append(sar)
+                    self.log(f"[ERRORE] {os.path.basename(sar)} non spostato in destinazione (rc={rc})")
+                    previous = self._manifest.packages.get(package_key(sar), {}).get("files", [])
+                    self._manifest.record(sar, rc, previous, sha256=self._digests.get(nxt),
+                                          filter_key=self.member_filter.key)
+                    continue
+                if stage_dir and os.path.isdir(stage_dir):
+                    try:
+                        moved = merge_tree(stage_dir, self.dest_dir, self.before_replace)
+                    except Exception as e:
+                        self._merge_rc = rc = 1
+                        self.log(f"[ERRORE] Spostamento in destinazione fallito per {os.path.basename(sar)}: {e}")
+                    else:
+                        if rc == 0:
+                            self._journal.record("merged", idx=nxt, sar=sar, files=moved)
+                        if self.on_package_merged:
+                            self.on_package_merged(nxt, sar, moved)
+                self._manifest.record(sar, rc, moved, sha256=self._digests.get(nxt),
+                                      filter_key="" if sar in self._unfiltered else self.member_filter.key)
+                self._merged.add(sar)
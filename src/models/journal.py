@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Journal (dentro la destinazione) degli stati dei pacchetti dell'ultimo batch
+JOURNAL_NAME = ".sapcar_journal.jsonl"
+
+
+@dataclass
+class JournalState:
+    """Stato di un batch non terminato ricostruito dal journal"""
+    dest_dir: str
+    sar_files: List[str]
+    backend: str
+    started: float
+    merged: Dict[str, List[str]] = field(default_factory=dict)   # .SAR -> file spostati in destinazione
+    interrupted: List[str] = field(default_factory=list)         # avviati ma non completati
+
+    @property
+    def remaining(self) -> List[str]:
+        return [s for s in self.sar_files if s not in self.merged]
+
+
+class JobJournal:
+    """
+    Journal append-only (una riga JSON per evento) degli stati dei pacchetti.
+
+    Ogni riga viene scritta con flush + fsync, così dopo un crash o un
+    riavvio il journal descrive esattamente i pacchetti già spostati nella
+    destinazione. Eventi: batch, queued, running, done, failed, cancelled,
+    merged, end (un batch annullato non ha "end" e resta riprendibile).
+    """
+
+    def __init__(self, dest_dir: str):
+        self.dest_dir = os.path.normpath(dest_dir)
+        self.path = os.path.join(self.dest_dir, JOURNAL_NAME)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def open(self, sar_files: List[str], backend: str, resume: bool = False) -> None:
+        """Inizia un batch (resume=True: prosegue il journal esistente)"""
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8", newline="\n")
+        self.record("batch", sar_files=list(sar_files), backend=backend, resume=resume)
+
+    def record(self, event: str, **fields) -> None:
+        """Accoda un evento e lo rende persistente prima di tornare"""
+        line = json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            try:
+                os.fsync(self._file.fileno())
+            except OSError:
+                pass
+
+    def close(self, rc: Optional[int] = None) -> None:
+        """Chiude il batch; con rc indicato lo segna come terminato"""
+        if rc is not None:
+            self.record("end", rc=rc)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @staticmethod
+    def load_unfinished(dest_dir: str) -> Optional[JournalState]:
+        """Stato del batch se il journal di dest_dir non è terminato, altrimenti None"""
+        path = os.path.join(os.path.normpath(dest_dir), JOURNAL_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().split("\n")
+        except OSError:
+            return None
+
+        state: Optional[JournalState] = None
+        running = set()
+        for line in lines:
+            try:
+                ev = json.loads(line)
+            except ValueError:
+                # riga vuota o troncata dal crash
+                continue
+            kind = ev.get("event")
+            if kind == "batch":
+                if state is None or not ev.get("resume"):
+                    state = JournalState(dest_dir, ev.get("sar_files", []), ev.get("backend", ""), ev.get("ts", 0.0))
+                    running = set()
+            elif state is None:
+                continue
+            elif kind == "running":
+                running.add(ev.get("sar"))
+            elif kind in ("done", "failed", "cancelled"):
+                running.discard(ev.get("sar"))
+            elif kind == "merged":
+                state.merged[ev.get("sar")] = ev.get("files", [])
+            elif kind in ("end", "abandoned"):
+                state = None
+        if state is None:
+            return None
+        state.interrupted = [s for s in state.sar_files if s in running]
+        return state
+
+    @staticmethod
+    def abandon(dest_dir: str) -> None:
+        """Segna il batch non terminato come abbandonato (non verrà più proposto)"""
+        journal = JobJournal(dest_dir)
+        try:
+            with open(journal.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"event": "abandoned", "ts": round(time.time(), 3)}) + "\n")
+        except OSError:
+            pass
@@ -0,0 +1,62 @@
+import os
+from typing import Callable, List, Optional, Tuple
+
+from utils.subprocess_utils import TIMEOUT_RC, run_cmd
+
+# Secondi concessi a disp+work -v (un dialogo di DLL mancante lo bloccherebbe per sempre)
+KERNEL_TEST_TIMEOUT = 60
+
+def extract_dispwork_main_section(lines: List[str]) -> List[str]:
+    """Estrae dall'output di disp+work -v solo la sezione 'disp+work information'"""
+    norm = [(i, (line or ""), (line or "").strip().lower()) for i, line in enumerate(lines)]
+    start_idx = None
+    end_idx = None
+
+    for i, raw, low in norm:
+        if low == "disp+work information":
+            start_idx = i
+            if i > 0 and set(norm[i - 1][1].strip()) <= set("-"):
+                start_idx = i - 1
+            break
+
+    if start_idx is None:
+        return lines
+
+    for i, raw, low in norm[start_idx + 1:]:
+        if low == "disp+work patch information":
+            end_idx = i
+            if i > 0 and set(norm[i - 1][1].strip()) <= set("-"):
+                end_idx = i - 1
+            break
+
+    if end_idx is None:
+        end_idx = len(lines)
+
+    return lines[start_idx:end_idx]
+
+def run_kernel_test(disp: str, log: Callable[[str], None],
+                    timeout: float = KERNEL_TEST_TIMEOUT) -> Tuple[Optional[int], List[str]]:
+    """
+    Esegue disp+work -v (poi -V come alternativa), al massimo timeout secondi per tentativo.
+    Restituisce (rc, righe della sezione principale).
+    """
+    disp_dir = os.path.dirname(disp)
+    disp_name = os.path.basename(disp)
+    buf = []
+
+    rc = None
+    for flag in ("-v", "-V"):
+        exe = os.path.join(disp_dir, disp_name)
+        cmd = [exe, flag]
+        pretty = " ".join([f'"{a}"' if (" " in a or "\t" in a) else a for a in cmd])
+        log(f"Comando: {pretty} (cwd={disp_dir})")
+        rc = run_cmd(disp_dir, cmd, buf.append, timeout=timeout)
+        if rc == 0:
+            break
+        if rc == TIMEOUT_RC:
+            log(f"(info) disp+work non ha risposto entro {timeout:g}s (dialogo di errore o DLL mancante?)")
+            break
+        else:
+            log(f"(info) disp+work ha restituito RC={rc} con {flag}. Provo alternativa...")
+
+    return rc, extract_dispwork_main_section(buf)
@@ -0,0 +1,188 @@
+import json
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from utils.dedup import path_key
+from utils.hashing import file_digest, file_signature
+
+# File (dentro la destinazione) con lo stato dell'ultima estrazione
+MANIFEST_NAME = ".sapcar_manifest.json"
+MANIFEST_VERSION = 2
+
+
+def package_key(sar: str) -> str:
+    """
+    Chiave del pacchetto nel manifest: percorso assoluto normalizzato, così
+    due .SAR con lo stesso nome in cartelle diverse restano distinti
+    """
+    return path_key(sar)
+
+
+def _rel_key(rel_path: str) -> str:
+    return rel_path.replace("\\", "/")
+
+
+class ExtractionManifest:
+    """
+    Manifest di una cartella di destinazione.
+
+    Per ogni pacchetto registra dimensione, mtime e (se già noto) hash del .SAR, l'esito
+    dell'ultima estrazione e i file prodotti; per ogni file prodotto la
+    dimensione e l'mtime finali. Alla riesecuzione i pacchetti con .SAR
+    identico e file ancora intatti possono essere saltati.
+    """
+
+    def __init__(self, dest_dir: str):
+        self.dest_dir = os.path.normpath(dest_dir)
+        self.path = os.path.join(self.dest_dir, MANIFEST_NAME)
+        self.packages: Dict[str, dict] = {}
+        self.files: Dict[str, List[int]] = {}
+
+    @classmethod
+    def load(cls, dest_dir: str) -> "ExtractionManifest":
+        """Carica il manifest (vuoto se assente, illeggibile o di un'altra versione)"""
+        manifest = cls(dest_dir)
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+        if not isinstance(data, dict):
+            return manifest
+        if data.get("version") == MANIFEST_VERSION:
+            manifest.packages = data.get("packages") or {}
+        elif data.get("version") == 1:
+            # Versione 1: chiave = nome del file; il percorso completo è nel record
+            manifest.packages = {package_key(rec["sar"]): rec for rec in (data.get("packages") or {}).values()
+                                 if isinstance(rec, dict) and rec.get("sar")}
+        else:
+            return manifest
+        manifest.files = data.get("files") or {}
+        return manifest
+
+    def sar_unchanged(self, sar: str) -> bool:
+        """
+        True se il .SAR coincide con quello registrato: basta la stessa
+        dimensione e mtime; se l'mtime è cambiato serve l'hash registrato
+        """
+        rec = self.packages.get(package_key(sar))
+        if not rec:
+            return False
+        try:
+            size, mtime_ns = file_signature(sar)
+        except OSError:
+            return False
+        if size != rec.get("size"):
+            return False
+        if mtime_ns == rec.get("mtime_ns"):
+            return True
+        if not rec.get("sha256"):
+            return False
+        try:
+            same = file_digest(sar) == rec["sha256"]
+        except OSError:
+            return False
+        if same:
+            # Copiato o "toccato" ma identico: aggiorniamo l'mtime per la prossima volta
+            rec["mtime_ns"] = mtime_ns
+        return same
+
+    def outputs_intact(self, sar: str) -> bool:
+        """True se tutti i file prodotti dal pacchetto sono ancora come al termine dell'estrazione"""
+        rec = self.packages.get(package_key(sar))
+        if not rec:
+            return False
+        for rel in rec.get("files", []):
+            expected = self.files.get(rel)
+            if expected is None:
+                return False
+            try:
+                if list(file_signature(os.path.join(self.dest_dir, *rel.split("/")))) != expected:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def is_unchanged(self, sar: str, filter_key: str = "") -> bool:
+        """
+        Pacchetto estratto con successo, .SAR identico e file intatti.
+        Un'estrazione filtrata vale solo per lo stesso filtro; una completa vale per tutti.
+        """
+        rec = self.packages.get(package_key(sar))
+        return (bool(rec) and rec.get("rc") == 0 and rec.get("filter", "") in ("", filter_key)
+                and self.sar_unchanged(sar) and self.outputs_intact(sar))
+
+    def plan(self, sar_files: List[str],
+             list_files: Callable[[str], Optional[Iterable[str]]], filter_key: str = "") -> Set[str]:
+        """
+        Restituisce i pacchetti (già ordinati) da saltare.
+
+        Un pacchetto invariato va comunque rieseguito se segue, nell'ordine,
+        un pacchetto rieseguito con cui ha file in comune: altrimenti il
+        pacchetto precedente sovrascriverebbe i suoi file. list_files
+        restituisce i file di un pacchetto da rieseguire (None = sconosciuti,
+        quindi in conflitto con tutti i successivi).
+        """
+        skip: Set[str] = set()
+        rerun_files: Set[str] = set()
+        rerun_unknown = False
+        for sar in sar_files:
+            if not rerun_unknown and self.is_unchanged(sar, filter_key):
+                files = set(self.packages[package_key(sar)].get("files", []))
+                if not (files & rerun_files):
+                    skip.add(sar)
+                    continue
+                rerun_files |= files
+                continue
+            listed = list_files(sar)
+            if listed is None:
+                rerun_unknown = True
+            else:
+                rerun_files |= {_rel_key(p) for p in listed}
+        return skip
+
+    def record(self, sar: str, rc: int, files: Iterable[str], sha256: Optional[str] = None,
+               filter_key: str = "") -> None:
+        """
+        Registra l'esito dell'estrazione di un pacchetto (filter_key: MemberFilter.key).
+        sha256 non viene calcolato qui: se non indicato resta quello già registrato
+        per lo stesso file (stessa dimensione e mtime), altrimenti None.
+        """
+        key = package_key(sar)
+        try:
+            size, mtime_ns = file_signature(sar)
+        except OSError:
+            size, mtime_ns = None, None
+        previous = self.packages.get(key)
+        if sha256 is None and previous and (previous.get("size"), previous.get("mtime_ns")) == (size, mtime_ns):
+            sha256 = previous.get("sha256")
+        self.packages[key] = {
+            "sar": os.path.abspath(sar),
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": sha256,
+            "rc": rc,
+            "files": sorted(_rel_key(p) for p in files),
+            "filter": filter_key,
+        }
+
+    def forget(self, sar: str) -> None:
+        """Dimentica un pacchetto (verrà riestratto alla prossima esecuzione)"""
+        self.packages.pop(package_key(sar), None)
+
+    def save(self) -> None:
+        """Aggiorna lo stato finale dei file e scrive il manifest in modo atomico"""
+        files: Dict[str, List[int]] = {}
+        for rec in self.packages.values():
+            for rel in rec.get("files", []):
+                if rel in files:
+                    continue
+                try:
+                    files[rel] = list(file_signature(os.path.join(self.dest_dir, *rel.split("/"))))
+                except OSError:
+                    pass
+        self.files = files
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "packages": self.packages, "files": self.files}, f)
+        os.replace(tmp, self.path)
@@ -0,0 +1,71 @@
+import fnmatch
+import re
+from typing import Iterable, List, Tuple
+
+_SEPARATORS = re.compile(r"[;,\s]+")
+
+
+def _normalize(patterns: Iterable[str]) -> Tuple[str, ...]:
+    out = []
+    for pattern in patterns:
+        for part in _SEPARATORS.split(pattern or ""):
+            part = part.replace("\\", "/").strip("/").lower()
+            if part and part not in out:
+                out.append(part)
+    return tuple(out)
+
+
+class MemberFilter:
+    """
+    Filtro glob sui file di un pacchetto (es. "disp+work*; R3trans*; lib*.so").
+
+    Un pattern senza "/" si confronta col nome del file, altrimenti col
+    percorso completo nell'archivio; il confronto non distingue maiuscole
+    e minuscole. Senza include vengono selezionati tutti i file, poi
+    exclude scarta quelli corrispondenti.
+    """
+
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = ()):
+        self.include = _normalize(include)
+        self.exclude = _normalize(exclude)
+
+    @classmethod
+    def from_text(cls, include: str = "", exclude: str = "") -> "MemberFilter":
+        """Filtro da testo libero (pattern separati da ; , o spazi)"""
+        return cls([include], [exclude])
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    @staticmethod
+    def _hit(patterns: Tuple[str, ...], path: str) -> bool:
+        name = path.rsplit("/", 1)[-1]
+        for pattern in patterns:
+            if fnmatch.fnmatchcase(path if "/" in pattern else name, pattern):
+                return True
+        return False
+
+    def matches(self, path: str) -> bool:
+        """True se il file (percorso con separatori "/") va estratto"""
+        path = path.replace("\\", "/").strip("/").lower()
+        if self.include and not self._hit(self.include, path):
+            return False
+        return not self._hit(self.exclude, path)
+
+    def select(self, paths: Iterable[str]) -> List[str]:
+        return [p for p in paths if self.matches(p)]
+
+    @property
+    def key(self) -> str:
+        """Forma canonica (per il manifest): vuota se il filtro non è attivo"""
+        if not self:
+            return ""
+        return "+" + ";".join(self.include) + " -" + ";".join(self.exclude)
+
+    def describe(self) -> str:
+        parts = []
+        if self.include:
+            parts.append("includi " + "; ".join(self.include))
+        if self.exclude:
+            parts.append("escludi " + "; ".join(self.exclude))
+        return ", ".join(parts) or "tutti i file"
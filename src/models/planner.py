@@ -0,0 +1,168 @@
+import os
+import shutil
+import stat
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Dimensione di allocazione usata per stimare lo spazio occupato dai file
+CLUSTER_SIZE = 4096
+# Margine libero richiesto oltre ai file estratti (journal, manifest, file temporanei)
+SPACE_HEADROOM = 64 * 1024 * 1024
+# Esempi di file sovrascritti riportati per ogni coppia di pacchetti
+OVERLAP_EXAMPLES = 5
+
+
+@dataclass
+class PackagePlan:
+    """Contenuto di un pacchetto letto dall'indice del .SAR"""
+    sar: str
+    files: int = 0
+    dirs: int = 0
+    bytes: int = 0
+    allocated: int = 0
+    error: Optional[str] = None   # indice non leggibile: il pacchetto non entra nei totali
+
+
+@dataclass
+class ExtractionPlan:
+    """Piano di un batch: totali, sovrapposizioni e verifica dello spazio"""
+    dest_dir: str
+    packages: List[PackagePlan]
+    # (pacchetto precedente, pacchetto successivo) -> file del primo sovrascritti dal secondo
+    overlaps: Dict[Tuple[str, str], List[str]] = field(default_factory=dict)
+    free_bytes: Optional[int] = None
+    # Spazio dei file già presenti nella destinazione che verranno sovrascritti
+    reclaimable_bytes: int = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(p.bytes for p in self.packages)
+
+    @property
+    def total_files(self) -> int:
+        return sum(p.files for p in self.packages)
+
+    @property
+    def required_bytes(self) -> int:
+        """Spazio in più occupato a fine estrazione (i file sovrascritti liberano il loro)"""
+        return max(0, sum(p.allocated for p in self.packages) - self.reclaimable_bytes) + SPACE_HEADROOM
+
+    @property
+    def unreadable(self) -> List[PackagePlan]:
+        return [p for p in self.packages if p.error]
+
+    @property
+    def fits(self) -> bool:
+        """False solo se lo spazio libero è sicuramente insufficiente"""
+        return self.free_bytes is None or self.free_bytes >= self.required_bytes
+
+
+def _free_space(path: str) -> Optional[int]:
+    """Spazio libero sul volume di path (o della prima cartella esistente che lo contiene)"""
+    path = os.path.abspath(path)
+    while not os.path.isdir(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return None
+
+
+def _allocated(size: int) -> int:
+    return -(-size // CLUSTER_SIZE) * CLUSTER_SIZE
+
+
+def _reclaimable(dest_dir: str, paths: Iterable[str]) -> int:
+    """Spazio occupato dai file esistenti in dest_dir che verranno sostituiti"""
+    total = 0
+    for path in paths:
+        try:
+            st = os.stat(os.path.join(dest_dir, *path.split("/")))
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode):
+            total += _allocated(st.st_size)
+    return total
+
+
+def _read_package(sar: str, member_filter=None) -> Tuple[PackagePlan, List[str]]:
+    plan = PackagePlan(sar)
+    paths: List[str] = []
+    try:
+        from sar import list_entries
+        entries = list_entries(sar)
+    except Exception as e:
+        plan.error = str(e) or type(e).__name__
+        return plan, paths
+    for entry in entries:
+        if entry.is_dir:
+            plan.dirs += 1
+        elif entry.is_file:
+            if member_filter and not member_filter.matches(entry.path):
+                continue
+            plan.files += 1
+            plan.bytes += entry.size
+            plan.allocated += _allocated(entry.size)
+            paths.append(entry.path)
+    return plan, paths
+
+
+def plan_extraction(sar_files: Iterable[str], dest_dir: str, member_filter=None) -> ExtractionPlan:
+    """
+    Legge gli indici dei .SAR (nell'ordine di estrazione) senza scrivere nulla.
+
+    Lo spazio richiesto è la somma dei file di tutti i pacchetti: con
+    l'estrazione in staging, nel caso peggiore tutti i pacchetti sono
+    estratti prima che i file sovrascritti tra un pacchetto e l'altro
+    vengano liberati. I file già presenti nella destinazione che verranno
+    sostituiti (es. riestrazione in una cartella kernel popolata) vengono
+    sottratti. Con member_filter (models.member_filter) contano solo i file
+    selezionati.
+    """
+    packages: List[PackagePlan] = []
+    owner: Dict[str, str] = {}
+    overlaps: Dict[Tuple[str, str], List[str]] = {}
+    for sar in sar_files:
+        plan, paths = _read_package(sar, member_filter)
+        packages.append(plan)
+        for path in paths:
+            previous = owner.get(path)
+            if previous is not None and previous != sar:
+                overlaps.setdefault((previous, sar), []).append(path)
+            owner[path] = sar
+    return ExtractionPlan(os.path.normpath(dest_dir), packages, overlaps, _free_space(dest_dir),
+                          _reclaimable(dest_dir, owner))
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1048576:,.1f} MB"
+
+
+def format_plan(plan: ExtractionPlan) -> List[str]:
+    """Righe di log che descrivono il piano"""
+    lines = []
+    for p in plan.packages:
+        name = os.path.basename(p.sar)
+        if p.error:
+            lines.append(f"[AVVISO] {name}: indice non leggibile ({p.error}), escluso dai totali")
+        else:
+            lines.append(f"  {name}: {p.files} file, {p.dirs} cartelle, {_mb(p.bytes)}")
+    lines.append(f"Totale: {plan.total_files} file, {_mb(plan.total_bytes)} "
+                 f"(richiesti ~{_mb(plan.required_bytes)} in {plan.dest_dir})")
+    if plan.reclaimable_bytes:
+        lines.append(f"  {_mb(plan.reclaimable_bytes)} già occupati da file esistenti che verranno sovrascritti")
+    for (earlier, later), paths in plan.overlaps.items():
+        sample = ", ".join(paths[:OVERLAP_EXAMPLES]) + (", ..." if len(paths) > OVERLAP_EXAMPLES else "")
+        lines.append(f"  {os.path.basename(later)} sovrascrive {len(paths)} file di "
+                     f"{os.path.basename(earlier)}: {sample}")
+    if plan.free_bytes is None:
+        lines.append("[AVVISO] Spazio libero della destinazione non determinabile")
+    elif plan.fits:
+        lines.append(f"[OK] Spazio libero: {_mb(plan.free_bytes)}")
+    else:
+        lines.append(f"[ERRORE] Spazio insufficiente: liberi {_mb(plan.free_bytes)}, "
+                     f"richiesti ~{_mb(plan.required_bytes)}")
+    return lines
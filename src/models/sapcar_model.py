@@ -2,6 +2,18 @@ import os
 import json
 from typing import List, Optional
 
+def is_sapexe(path: str) -> bool:
+    """True se il pacchetto è un SAPEXE* (da estrarre prima degli altri)"""
+    return os.path.basename(path).upper().startswith("SAPEXE")
+
+def sar_sort_key(path: str) -> tuple:
+    """Chiave di ordinamento: SAPEXE* prima, poi alfabetico"""
+    return (0 if is_sapexe(path) else 1, os.path.basename(path).upper())
+
+def sort_sar_files(files: List[str]) -> List[str]:
+    """Ordina una lista di file SAR (SAPEXE* prima)"""
+    return sorted(files, key=sar_sort_key)
+
 class SapcarModel:
     def __init__(self):
         self.sapcar_path: str = ""
@@ -42,13 +54,7 @@ class SapcarModel:
             
     def get_sar_files_sorted(self) -> List[str]:
         """Restituisce i file SAR ordinati (SAPEXE* prima)"""
-        return sorted(
-            self.sar_files,
-            key=lambda p: (
-                0 if os.path.basename(p).upper().startswith("SAPEXE") else 1,
-                os.path.basename(p).upper()
-            )
-        )
+        return sort_sar_files(self.sar_files)
         
     def to_dict(self) -> dict:
         """Converte il modello in dizionario per il salvataggio"""
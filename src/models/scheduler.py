@@ -0,0 +1,74 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+# Politiche di ordinamento della coda
+SCHEDULE_CANONICAL = "canonical"
+SCHEDULE_LONGEST = "longest"
+
+Package = Tuple[int, str]   # (indice canonico, percorso .SAR)
+
+
+class Scheduler:
+    """
+    Ordine di avvio dei pacchetti di una fase.
+
+    Lo scheduler decide solo quando un pacchetto parte: la regola SAPEXE
+    (fase a sé, prima delle altre) è applicata dal runner e lo spostamento
+    nella destinazione segue sempre l'ordine canonico degli indici.
+    """
+
+    name = SCHEDULE_CANONICAL
+
+    def order(self, packages: List[Package], backend: str, workers: int) -> List[Package]:
+        return sorted(packages)
+
+
+class LongestFirstScheduler(Scheduler):
+    """
+    Avvia per primi i pacchetti più costosi (LPT): con più worker il batch
+    non finisce più in attesa di un pacchetto grande partito per ultimo.
+
+    Il costo è la durata prevista dallo storico se disponibile per tutti i
+    pacchetti della fase, altrimenti la dimensione del .SAR.
+    """
+
+    name = SCHEDULE_LONGEST
+
+    def __init__(self, history=None):
+        self.history = history
+
+    def costs(self, packages: List[Package], backend: str, workers: int) -> Dict[int, float]:
+        sizes = {}
+        for idx, sar in packages:
+            try:
+                sizes[idx] = os.path.getsize(sar)
+            except OSError:
+                sizes[idx] = 0
+        if self.history is not None:
+            durations = {idx: self.history.expected_duration(sar, sizes[idx], backend, workers)
+                         for idx, sar in packages}
+            if all(d is not None for d in durations.values()):
+                return durations
+        return {idx: float(size) for idx, size in sizes.items()}
+
+    def order(self, packages: List[Package], backend: str, workers: int) -> List[Package]:
+        costs = self.costs(packages, backend, workers)
+        # A parità di costo resta l'ordine canonico
+        return sorted(packages, key=lambda item: (-costs[item[0]], item[0]))
+
+
+SCHEDULERS = {
+    SCHEDULE_CANONICAL: Scheduler,
+    SCHEDULE_LONGEST: LongestFirstScheduler,
+}
+
+
+def make_scheduler(name: Optional[str], workers: int, history=None) -> Scheduler:
+    """Scheduler per nome; None sceglie longest-first solo con più worker"""
+    if name is None:
+        name = SCHEDULE_LONGEST if workers > 1 else SCHEDULE_CANONICAL
+    if name == SCHEDULE_LONGEST:
+        return LongestFirstScheduler(history)
+    if name in SCHEDULERS:
+        return SCHEDULERS[name]()
+    raise ValueError(f"Scheduler sconosciuto: {name}")
@@ -0,0 +1,17 @@
+from sar.reader import (
+    SarArchive,
+    SarBlock,
+    SarEntry,
+    SarFormatError,
+    iter_entries,
+    list_entries,
+)
+
+__all__ = [
+    "SarArchive",
+    "SarBlock",
+    "SarEntry",
+    "SarFormatError",
+    "iter_entries",
+    "list_entries",
+]
@@ -0,0 +1,128 @@
+"""
+Decompressione dei blocchi SAR (algoritmi SAP LZH e LZC).
+
+Ogni blocco compresso inizia con un header SAP di 8 byte:
+lunghezza non compressa (4), algoritmo (1), magic 1F 9D (2), flag (1).
+LZH è un flusso deflate (decodificato con zlib), LZC è il classico LZW di
+`compress` (stesso formato dei file .Z).
+"""
+
+import struct
+import zlib
+
+from sar.reader import ALG_LZC, ALG_LZH, SarBlock, SarFormatError
+
+_COMPR_HEADER = struct.Struct("<IB2sB")
+
+_LZW_INIT_BITS = 9
+_LZW_CLEAR = 256
+_LZW_BLOCK_MODE = 0x80
+_LZW_BITS_MASK = 0x1F
+
+
+def _unlzh(data, expected: int) -> bytes:
+    d = zlib.decompressobj(-zlib.MAX_WBITS)
+    try:
+        out = d.decompress(data, expected) if expected else d.decompress(data)
+    except zlib.error as e:
+        raise SarFormatError(f"Decompressione LZH non riuscita: {e}")
+    return out
+
+
+def _unlzw(data, flags: int) -> bytes:
+    """Decodifica LZW compatibile con compress/ncompress (codici LSB-first, gruppi di 8 codici)"""
+    maxbits = flags & _LZW_BITS_MASK
+    block_mode = bool(flags & _LZW_BLOCK_MODE)
+    if maxbits < _LZW_INIT_BITS or maxbits > 16:
+        raise SarFormatError(f"Parametro LZC non valido: maxbits={maxbits}")
+    maxmaxcode = 1 << maxbits
+    first = 257 if block_mode else 256
+
+    data = bytes(data) + b"\x00\x00"
+    total_bits = (len(data) - 2) * 8
+
+    table = [bytes((i,)) for i in range(256)]
+    if block_mode:
+        table.append(b"")
+    free_ent = first
+    n_bits = _LZW_INIT_BITS
+    maxcode = (1 << n_bits) - 1
+    bitmask = (1 << n_bits) - 1
+    group_start = 0
+    pos = 0
+    prev = None
+    out = bytearray()
+    from_bytes = int.from_bytes
+
+    def realign(p: int) -> int:
+        span = n_bits << 3
+        rel = p - group_start
+        return group_start + ((rel + span - 1) // span) * span
+
+    while pos + n_bits <= total_bits:
+        if free_ent > maxcode:
+            pos = realign(pos)
+            group_start = pos
+            n_bits += 1
+            maxcode = maxmaxcode if n_bits == maxbits else (1 << n_bits) - 1
+            bitmask = (1 << n_bits) - 1
+            continue
+
+        byte = pos >> 3
+        code = (from_bytes(data[byte:byte + 3], "little") >> (pos & 7)) & bitmask
+        pos += n_bits
+
+        if prev is None:
+            if code >= 256:
+                raise SarFormatError("Flusso LZC corrotto (primo codice non letterale)")
+            prev = table[code]
+            out += prev
+            continue
+
+        if code == _LZW_CLEAR and block_mode:
+            # Come ncompress: la tabella riparte da 256 e il gruppo corrente viene scartato
+            del table[256:]
+            table.append(b"")
+            free_ent = first - 1
+            pos = realign(pos)
+            group_start = pos
+            n_bits = _LZW_INIT_BITS
+            maxcode = (1 << n_bits) - 1
+            bitmask = (1 << n_bits) - 1
+            continue
+
+        if code < free_ent:
+            entry = table[code]
+        elif code == free_ent:
+            entry = prev + prev[:1]
+        else:
+            raise SarFormatError("Flusso LZC corrotto (codice fuori tabella)")
+        out += entry
+
+        if free_ent < maxmaxcode:
+            new = prev + entry[:1]
+            if free_ent < len(table):
+                table[free_ent] = new
+            else:
+                table.append(new)
+            free_ent += 1
+        prev = entry
+
+    return bytes(out)
+
+
+def decompress_block(block: SarBlock, payload) -> bytes:
+    """Restituisce i dati non compressi di un blocco dato il suo payload grezzo"""
+    if not block.compressed:
+        return bytes(payload)
+    ulen, alg, _magic, flags = _COMPR_HEADER.unpack_from(payload, 0)
+    body = payload[_COMPR_HEADER.size:]
+    if alg == ALG_LZH:
+        out = _unlzh(body, ulen)
+    elif alg == ALG_LZC:
+        out = _unlzw(body, flags)
+    else:
+        raise SarFormatError(f"Algoritmo di compressione sconosciuto: 0x{alg:02x}")
+    if len(out) != ulen:
+        raise SarFormatError(f"Lunghezza decompressa errata ({len(out)} invece di {ulen})")
+    return out
@@ -0,0 +1,335 @@
+"""
+Estrazione nativa degli archivi SAR, alternativa a SAPCAR.
+
+Le voci vengono raggruppate in lotti e decompresse in parallelo da un
+pool di processi; ogni processo riapre l'archivio in mmap e scrive
+direttamente i propri file nella destinazione.
+
+Le voci molto grandi vengono invece divise in intervalli di blocchi:
+i processi decomprimono gli intervalli in parallelo e il processo
+principale scrive i dati nel file nell'ordine corretto.
+
+L'estrazione si può annullare con un multiprocessing.Event passato sia a
+extract_archive sia ai processi del pool (init_worker): viene controllato
+a ogni blocco, quindi anche durante la scrittura di un file molto grande.
+"""
+
+import os
+import signal
+import stat
+import zlib
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from sar.decompress import decompress_block
+from sar.reader import SarArchive, SarBlock, SarEntry, SarFormatError
+
+# Dimensione (byte compressi) oltre la quale un lotto viene chiuso
+BATCH_BYTES = 8 * 1024 * 1024
+# Voci più grandi di così (byte compressi) vengono divise in intervalli di blocchi
+SPLIT_BYTES = 32 * 1024 * 1024
+# Dimensione indicativa (byte compressi) di ogni intervallo
+RANGE_BYTES = 4 * 1024 * 1024
+
+# Evento di annullamento visto dai processi del pool (impostato da init_worker)
+_cancel_event = None
+
+
+class ExtractionCancelled(Exception):
+    """Estrazione interrotta su richiesta"""
+
+
+def init_worker(cancel_event) -> None:
+    """Inizializzatore dei processi del pool: registra l'evento di annullamento"""
+    global _cancel_event
+    _cancel_event = cancel_event
+    # Ctrl+C arriva a tutto il gruppo di processi: l'annullamento lo gestisce il processo principale
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _check_cancel(cancel_event=None) -> None:
+    event = cancel_event if cancel_event is not None else _cancel_event
+    if event is not None and event.is_set():
+        raise ExtractionCancelled()
+
+
+def safe_target(dest_dir: str, entry_path: str) -> str:
+    """Percorso di destinazione della voce, rifiutando percorsi che escono da dest_dir"""
+    target = os.path.normpath(os.path.join(dest_dir, *entry_path.split("/")))
+    root = os.path.normpath(dest_dir)
+    if os.path.commonpath([root, target]) != root:
+        raise SarFormatError(f"Percorso non sicuro nell'archivio: {entry_path}")
+    return target
+
+
+def _apply_metadata(target: str, entry: SarEntry) -> None:
+    mode = stat.S_IMODE(entry.mode)
+    if mode and os.name != "nt":
+        try:
+            os.chmod(target, mode)
+        except OSError:
+            pass
+    if entry.mtime:
+        try:
+            os.utime(target, (entry.mtime, entry.mtime))
+        except OSError:
+            pass
+
+
+def _prepare_target(target: str) -> None:
+    parent = os.path.dirname(target)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    if os.path.exists(target) and not os.access(target, os.W_OK):
+        os.chmod(target, stat.S_IWRITE | stat.S_IREAD)
+
+
+def _finish_entry(entry: SarEntry, target: str, written: int, crc: int) -> None:
+    if written != entry.size:
+        raise SarFormatError(f"Dimensione errata per '{entry.path}' ({written} invece di {entry.size})")
+    if entry.crc is not None and crc != entry.crc:
+        raise SarFormatError(f"CRC errato per '{entry.path}'")
+    _apply_metadata(target, entry)
+
+
+def write_entry(sar: SarArchive, entry: SarEntry, target: str) -> int:
+    """Decomprime una voce file in target verificandone il CRC; restituisce i byte scritti"""
+    _prepare_target(target)
+    crc = 0
+    written = 0
+    with open(target, "wb") as f:
+        for block in entry.blocks:
+            _check_cancel()
+            data = decompress_block(block, sar.block_data(block))
+            crc = zlib.crc32(data, crc)
+            written += len(data)
+            f.write(data)
+    _finish_entry(entry, target, written, crc)
+    return written
+
+
+def read_entry(sar: SarArchive, entry: SarEntry) -> bytes:
+    """Contenuto di una voce file in memoria (per file piccoli, es. SAPMANIFEST.MF)"""
+    parts = []
+    crc = 0
+    for block in entry.blocks:
+        data = decompress_block(block, sar.block_data(block))
+        crc = zlib.crc32(data, crc)
+        parts.append(data)
+    content = b"".join(parts)
+    if len(content) != entry.size:
+        raise SarFormatError(f"Dimensione errata per '{entry.path}' ({len(content)} invece di {entry.size})")
+    if entry.crc is not None and crc != entry.crc:
+        raise SarFormatError(f"CRC errato per '{entry.path}'")
+    return content
+
+
+def _block_ranges(blocks: Tuple[SarBlock, ...]) -> List[Tuple[SarBlock, ...]]:
+    """Divide i blocchi di una voce in intervalli contigui di circa RANGE_BYTES"""
+    ranges, current, current_bytes = [], [], 0
+    for block in blocks:
+        current.append(block)
+        current_bytes += block.length
+        if current_bytes >= RANGE_BYTES:
+            ranges.append(tuple(current))
+            current, current_bytes = [], 0
+    if current:
+        ranges.append(tuple(current))
+    return ranges
+
+
+def _decode_range(archive_path: str, blocks: Tuple[SarBlock, ...]) -> bytes:
+    """Eseguito nei processi del pool: decomprime un intervallo di blocchi"""
+    _check_cancel()
+    with SarArchive(archive_path) as sar:
+        return b"".join(decompress_block(block, sar.block_data(block)) for block in blocks)
+
+
+def write_split_entries(pool: Executor, archive_path: str, entries: List[SarEntry], dest_dir: str,
+                        log: Callable[[str], None], window: Optional[int] = None, cancel_event=None) -> int:
+    """
+    Decomprime le voci grandi distribuendo sul pool gli intervalli di blocchi
+    di tutte le voci in un'unica coda: mentre si scrive la fine di una voce
+    il pool sta già decodificando l'inizio della successiva. Al massimo
+    `window` intervalli sono in volo, così la memoria resta limitata; ogni
+    voce viene scritta in ordine e il CRC calcolato sul flusso.
+    Restituisce 0 se tutto ok, 1 se almeno una voce è fallita.
+    """
+    window = window or max(2, (os.cpu_count() or 1) * 2)
+    remaining = [len(_block_ranges(e.blocks)) for e in entries]
+    tasks = iter([(i, blocks) for i, e in enumerate(entries) for blocks in _block_ranges(e.blocks)])
+    pending = deque()
+
+    def submit_next() -> None:
+        task = next(tasks, None)
+        if task is not None:
+            pending.append((task[0], pool.submit(_decode_range, archive_path, task[1])))
+
+    for _ in range(window):
+        submit_next()
+
+    rc = 0
+    failed = set()
+    current = None   # [indice voce, file, percorso, crc, byte scritti]
+    try:
+        while pending:
+            _check_cancel(cancel_event)
+            idx, fut = pending.popleft()
+            submit_next()
+            remaining[idx] -= 1
+            if idx in failed:
+                continue
+            entry = entries[idx]
+            try:
+                data = fut.result()
+                if current is None:
+                    target = safe_target(dest_dir, entry.path)
+                    _prepare_target(target)
+                    current = [idx, open(target, "wb"), target, 0, 0]
+                current[3] = zlib.crc32(data, current[3])
+                current[4] += len(data)
+                current[1].write(data)
+                if remaining[idx] == 0:
+                    current[1].close()
+                    _finish_entry(entry, current[2], current[4], current[3])
+                    current = None
+                    log(f"x {entry.path}")
+            except ExtractionCancelled:
+                raise
+            except Exception as e:
+                rc = 1
+                failed.add(idx)
+                log(f"[ERRORE] {entry.path}: {e}")
+                if current is not None:
+                    current[1].close()
+                    current = None
+    finally:
+        for _idx, fut in pending:
+            fut.cancel()
+        if current is not None:
+            current[1].close()
+    return rc
+
+
+def _extract_batch(archive_path: str, entries: List[SarEntry], dest_dir: str) -> List[Tuple[str, int, Optional[str]]]:
+    """Eseguito nei processi del pool: estrae un lotto di voci (path, byte, errore)"""
+    done = []
+    with SarArchive(archive_path) as sar:
+        for entry in entries:
+            if _cancel_event is not None and _cancel_event.is_set():
+                break
+            try:
+                done.append((entry.path, write_entry(sar, entry, safe_target(dest_dir, entry.path)), None))
+            except ExtractionCancelled:
+                break
+            except (OSError, SarFormatError) as e:
+                done.append((entry.path, 0, str(e)))
+    return done
+
+
+def _batches(entries: List[SarEntry]) -> List[List[SarEntry]]:
+    batches, current, current_bytes = [], [], 0
+    for entry in entries:
+        current.append(entry)
+        current_bytes += entry.compressed_size
+        if current_bytes >= BATCH_BYTES:
+            batches.append(current)
+            current, current_bytes = [], 0
+    if current:
+        batches.append(current)
+    return batches
+
+
+def extract_archive(archive_path: str, dest_dir: str, log: Callable[[str], None],
+                    executor: Optional[Executor] = None, cancel_event=None,
+                    select: Optional[Callable[[str], bool]] = None) -> int:
+    """
+    Estrae un archivio SAR in dest_dir senza SAPCAR.
+
+    Args:
+        archive_path: File .SAR
+        dest_dir: Cartella di destinazione
+        log: Callback di log (una riga "x <file>" per voce, come SAPCAR -xvf)
+        executor: Pool di processi da riutilizzare (se None ne viene creato uno)
+        cancel_event: multiprocessing.Event di annullamento (il pool indicato deve
+            essere stato creato con initializer=init_worker sullo stesso evento)
+        select: Se indicato, vengono estratti solo i file per cui select(percorso)
+            è vero (le cartelle necessarie vengono create comunque)
+
+    Returns:
+        int: 0 se tutto ok, 1 in caso di errore
+    """
+    try:
+        with SarArchive(archive_path) as sar:
+            entries = sar.list()
+    except (OSError, SarFormatError) as e:
+        log(f"[ERRORE] {e}")
+        return 1
+
+    if select is not None:
+        entries = [e for e in entries if select(e.path)]
+
+    files = []
+    for entry in entries:
+        try:
+            target = safe_target(dest_dir, entry.path)
+        except SarFormatError as e:
+            log(f"[ERRORE] {e}")
+            return 1
+        if entry.is_dir:
+            os.makedirs(target, exist_ok=True)
+            log(f"x {entry.path}")
+        elif entry.is_file:
+            files.append(entry)
+        else:
+            log(f"(info) voce di tipo {entry.type} ignorata: {entry.path}")
+
+    large = [e for e in files if e.compressed_size > SPLIT_BYTES and len(e.blocks) > 1]
+    small = [e for e in files if not (e.compressed_size > SPLIT_BYTES and len(e.blocks) > 1)]
+    # I lotti più pesanti per primi, così il pool resta occupato fino alla fine
+    batches = sorted(_batches(small), key=lambda b: sum(e.compressed_size for e in b), reverse=True)
+
+    own_pool = executor is None
+    if executor is None and cancel_event is not None:
+        pool = ProcessPoolExecutor(initializer=init_worker, initargs=(cancel_event,))
+    else:
+        pool = executor or ProcessPoolExecutor()
+    rc = 0
+    futures = []
+    try:
+        futures = [pool.submit(_extract_batch, archive_path, batch, dest_dir) for batch in batches]
+        # Le voci grandi vengono scritte da qui mentre il pool decodifica i loro
+        # intervalli insieme ai lotti
+        try:
+            rc = write_split_entries(pool, archive_path, large, dest_dir, log, cancel_event=cancel_event)
+        except ExtractionCancelled:
+            pass
+        for fut in futures:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            try:
+                for path, _size, error in fut.result():
+                    if error:
+                        rc = 1
+                        log(f"[ERRORE] {path}: {error}")
+                    else:
+                        log(f"x {path}")
+            except Exception as e:
+                rc = 1
+                log(f"[ERRORE] {e}")
+    finally:
+        for fut in futures:
+            fut.cancel()
+        if own_pool:
+            pool.shutdown()
+
+    if cancel_event is not None and cancel_event.is_set():
+        # Il chiamante che ha richiesto l'annullamento riporta l'esito
+        return 1
+
+    # Le date delle cartelle vanno impostate dopo aver scritto i file
+    for entry in entries:
+        if entry.is_dir:
+            _apply_metadata(safe_target(dest_dir, entry.path), entry)
+    return rc
@@ -0,0 +1,214 @@
+"""
+Lettore nativo degli archivi SAPCAR (formato CAR 2.00 / 2.01).
+
+Analizza solo le intestazioni: il file viene mappato in memoria (mmap) e le
+strutture lette con struct.unpack_from, senza copiare i dati compressi.
+"""
+
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+CAR_MAGIC = b"CAR "
+CAR_VERSIONS = ("2.00", "2.01")
+
+# Tipi di voce
+TYPE_FILE = "RG"
+TYPE_DIR = "DR"
+TYPE_SHORTCUT = "SC"
+TYPE_LINK = "LK"
+TYPE_SIGNATURE = "SM"
+ENTRY_TYPES = (TYPE_FILE, TYPE_DIR, TYPE_SHORTCUT, TYPE_LINK, TYPE_SIGNATURE)
+
+# Tipi di blocco dati
+BLOCK_COMPRESSED = "DA"
+BLOCK_COMPRESSED_LAST = "ED"
+BLOCK_UNCOMPRESSED = "UD"
+BLOCK_UNCOMPRESSED_LAST = "UE"
+LAST_BLOCK_TYPES = (BLOCK_COMPRESSED_LAST, BLOCK_UNCOMPRESSED_LAST)
+COMPRESSED_BLOCK_TYPES = (BLOCK_COMPRESSED, BLOCK_COMPRESSED_LAST)
+
+# Algoritmi di compressione SAP (byte nell'intestazione del blocco)
+ALG_LZC = 0x10
+ALG_LZH = 0x12
+
+# type(2) perm(4) len_low(4) len_high(4) mtime(4) codepage(4) user_info_len(2) name_len(2)
+_ENTRY_HEADER = struct.Struct("<2sIIIIIHH")
+_U32 = struct.Struct("<I")
+# uncompressed_len(4) algorithm(1) magic(2) special(1)
+_COMPR_HEADER = struct.Struct("<IB2sB")
+
+
+class SarFormatError(Exception):
+    """Archivio SAR non valido o non supportato"""
+
+
+@dataclass(frozen=True)
+class SarBlock:
+    """Blocco dati di una voce: posizione e dimensioni nel file SAR"""
+    type: str
+    offset: int               # inizio del payload nell'archivio
+    length: int               # byte del payload (per i compressi include l'header SAP di 8 byte)
+    uncompressed_length: int
+    algorithm: Optional[int]  # ALG_LZC / ALG_LZH, None se non compresso
+
+    @property
+    def compressed(self) -> bool:
+        return self.type in COMPRESSED_BLOCK_TYPES
+
+
+@dataclass(frozen=True)
+class SarEntry:
+    """Voce dell'indice di un archivio SAR"""
+    name: str
+    type: str
+    mode: int
+    size: int
+    mtime: int
+    code_page: int
+    user_info: bytes
+    crc: Optional[int]
+    blocks: Tuple[SarBlock, ...]
+    header_offset: int
+
+    @property
+    def path(self) -> str:
+        """Nome normalizzato con separatori '/'"""
+        return self.name.replace("\\", "/").lstrip("/")
+
+    @property
+    def is_file(self) -> bool:
+        return self.type in (TYPE_FILE, TYPE_SIGNATURE)
+
+    @property
+    def is_dir(self) -> bool:
+        return self.type == TYPE_DIR
+
+    @property
+    def compressed_size(self) -> int:
+        return sum(b.length for b in self.blocks)
+
+
+class SarArchive:
+    """
+    Archivio SAR mappato in memoria.
+
+    Uso:
+        with SarArchive(path) as sar:
+            for entry in sar.iter_entries():
+                ...
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size < 8:
+                raise SarFormatError(f"File troppo corto per essere un archivio SAR: {path}")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self.size = size
+        magic = bytes(self._map[0:4])
+        version = bytes(self._map[4:8]).decode("ascii", "replace")
+        if magic != CAR_MAGIC or version not in CAR_VERSIONS:
+            self.close()
+            raise SarFormatError(f"Intestazione CAR non riconosciuta ({magic!r} {version!r}): {path}")
+        self.version = version
+
+    def __enter__(self) -> "SarArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Rilascia la mappatura e il file"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def block_data(self, block: SarBlock) -> memoryview:
+        """Payload grezzo di un blocco (vista sul file mappato, nessuna copia)"""
+        return memoryview(self._map)[block.offset:block.offset + block.length]
+
+    def iter_entries(self) -> Iterator[SarEntry]:
+        """Scorre le voci dell'archivio leggendo solo le intestazioni"""
+        buf = self._map
+        end = self.size
+        pos = 8
+        null_terminated = self.version == "2.01"
+
+        while pos < end:
+            if pos + _ENTRY_HEADER.size > end:
+                raise SarFormatError(f"Intestazione troncata all'offset {pos}")
+            header_offset = pos
+            (etype, mode, len_low, len_high, mtime, code_page,
+             user_info_len, name_len) = _ENTRY_HEADER.unpack_from(buf, pos)
+            etype = etype.decode("ascii", "replace")
+            if etype not in ENTRY_TYPES:
+                raise SarFormatError(f"Tipo di voce sconosciuto {etype!r} all'offset {pos}")
+            pos += _ENTRY_HEADER.size
+
+            raw_name = bytes(buf[pos:pos + name_len])
+            if null_terminated:
+                raw_name = raw_name.split(b"\x00", 1)[0]
+            name = raw_name.decode("utf-8", "replace")
+            pos += name_len
+            user_info = bytes(buf[pos:pos + user_info_len])
+            pos += user_info_len
+
+            size = (len_high << 32) | len_low
+            blocks: List[SarBlock] = []
+            crc = None
+            if etype in (TYPE_FILE, TYPE_SIGNATURE) and size > 0:
+                while True:
+                    if pos + 6 > end:
+                        raise SarFormatError(f"Blocco dati troncato per '{name}'")
+                    btype = bytes(buf[pos:pos + 2]).decode("ascii", "replace")
+                    (length,) = _U32.unpack_from(buf, pos + 2)
+                    payload = pos + 6
+                    if payload + length > end:
+                        raise SarFormatError(f"Blocco dati oltre la fine del file per '{name}'")
+                    if btype in COMPRESSED_BLOCK_TYPES:
+                        if length < _COMPR_HEADER.size:
+                            raise SarFormatError(f"Blocco compresso non valido per '{name}'")
+                        ulen, alg, _magic, _special = _COMPR_HEADER.unpack_from(buf, payload)
+                    elif btype in (BLOCK_UNCOMPRESSED, BLOCK_UNCOMPRESSED_LAST):
+                        ulen, alg = length, None
+                    else:
+                        raise SarFormatError(f"Tipo di blocco sconosciuto {btype!r} per '{name}'")
+                    blocks.append(SarBlock(btype, payload, length, ulen, alg))
+                    pos = payload + length
+                    if btype in LAST_BLOCK_TYPES:
+                        if pos + 4 > end:
+                            raise SarFormatError(f"Checksum mancante per '{name}'")
+                        (crc,) = _U32.unpack_from(buf, pos)
+                        pos += 4
+                        break
+
+            yield SarEntry(name, etype, mode, size, mtime, code_page, user_info,
+                           crc, tuple(blocks), header_offset)
+
+    def list(self) -> List[SarEntry]:
+        """Restituisce tutte le voci dell'archivio"""
+        return list(self.iter_entries())
+
+
+def iter_entries(path: str) -> Iterator[SarEntry]:
+    """Scorre le voci di un archivio SAR senza avviare SAPCAR"""
+    with SarArchive(path) as sar:
+        yield from sar.iter_entries()
+
+
+def list_entries(path: str) -> List[SarEntry]:
+    """Elenca le voci di un archivio SAR senza avviare SAPCAR"""
+    with SarArchive(path) as sar:
+        return sar.list()
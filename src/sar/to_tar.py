@@ -0,0 +1,175 @@
+"""
+Conversione diretta SAR -> tar (eventualmente compresso) senza scrivere i
+file estratti su disco.
+
+Le voci vengono decompresse dal motore nativo su un pool di processi, a
+intervalli di blocchi, e consumate nell'ordine originale dal writer tar:
+il disco viene toccato una sola volta, per scrivere l'archivio finale.
+"""
+
+import posixpath
+import stat
+import zlib
+from collections import deque
+from concurrent.futures import Executor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sar.decompress import decompress_block
+from sar.extract import RANGE_BYTES, _block_ranges
+from sar.reader import SarArchive, SarBlock, SarEntry, SarFormatError
+
+# (archivio, blocchi) di un intervallo da decomprimere
+_Range = Tuple[str, Tuple[SarBlock, ...]]
+
+
+def _decode_ranges(ranges: List[_Range]) -> List[bytes]:
+    """Eseguito nei processi del pool: decomprime una sequenza di intervalli"""
+    out = []
+    opened: Dict[str, SarArchive] = {}
+    try:
+        for archive_path, blocks in ranges:
+            sar = opened.get(archive_path)
+            if sar is None:
+                sar = opened[archive_path] = SarArchive(archive_path)
+            out.append(b"".join(decompress_block(b, sar.block_data(b)) for b in blocks))
+    finally:
+        for sar in opened.values():
+            sar.close()
+    return out
+
+
+def safe_arcname(entry_path: str) -> str:
+    """
+    Nome della voce nel tar, normalizzato come in safe_target: i percorsi
+    che risalgono sopra la radice (o con lettera di unità) sono rifiutati.
+    """
+    name = posixpath.normpath(entry_path.replace("\\", "/").lstrip("/"))
+    if name in (".", "..") or name.startswith("../") or (len(name) > 1 and name[1] == ":"):
+        raise SarFormatError(f"Percorso non sicuro nell'archivio: {entry_path}")
+    return name
+
+
+def plan_members(sar_files: List[str], log: Optional[Callable[[str], None]] = None
+                 ) -> Tuple[List[Tuple[str, SarEntry]], List[Tuple[str, str, SarEntry]]]:
+    """
+    Legge gli indici degli archivi (nell'ordine dato) e restituisce
+    cartelle (nome, voce) e file (archivio, nome, voce) da scrivere: per i
+    percorsi presenti in più pacchetti vince l'ultimo, come in
+    un'estrazione sequenziale. I nomi sono già validati con safe_arcname;
+    le voci di altro tipo (link, ecc.) vengono riportate in log e saltate.
+    """
+    dirs: Dict[str, SarEntry] = {}
+    files: Dict[str, Tuple[str, str, SarEntry]] = {}
+    for path in sar_files:
+        with SarArchive(path) as sar:
+            for entry in sar.iter_entries():
+                if not (entry.is_dir or entry.is_file):
+                    if log:
+                        log(f"(info) voce di tipo {entry.type} ignorata: {entry.path}")
+                    continue
+                name = safe_arcname(entry.path)
+                if entry.is_dir:
+                    dirs.setdefault(name, entry)
+                else:
+                    files.pop(name, None)
+                    files[name] = (path, name, entry)
+    return [(k, dirs[k]) for k in sorted(dirs)], list(files.values())
+
+
+def _range_stream(members: List[Tuple[str, str, SarEntry]], executor: Optional[Executor]) -> Iterator[bytes]:
+    """Dati decompressi di tutti gli intervalli, nell'ordine dei membri"""
+    ranges: List[_Range] = []
+    for archive_path, _name, entry in members:
+        ranges.extend((archive_path, blocks) for blocks in _block_ranges(entry.blocks))
+
+    # Intervalli consecutivi raggruppati in task di circa RANGE_BYTES
+    tasks: List[List[_Range]] = []
+    current, current_bytes = [], 0
+    for r in ranges:
+        current.append(r)
+        current_bytes += sum(b.length for b in r[1])
+        if current_bytes >= RANGE_BYTES:
+            tasks.append(current)
+            current, current_bytes = [], 0
+    if current:
+        tasks.append(current)
+
+    if executor is None:
+        for task in tasks:
+            yield from _decode_ranges(task)
+        return
+
+    import os
+    window = max(2, (os.cpu_count() or 1) * 2)
+    pending = deque()
+    it = iter(tasks)
+    try:
+        for task in it:
+            pending.append(executor.submit(_decode_ranges, task))
+            if len(pending) >= window:
+                break
+        while pending:
+            result = pending.popleft().result()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append(executor.submit(_decode_ranges, nxt))
+            yield from result
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+def _entry_chunks(entry: SarEntry, stream: Iterator[bytes]) -> Iterator[bytes]:
+    crc = 0
+    size = 0
+    for _ in _block_ranges(entry.blocks):
+        data = next(stream)
+        crc = zlib.crc32(data, crc)
+        size += len(data)
+        yield data
+    if size != entry.size:
+        raise SarFormatError(f"Dimensione errata per '{entry.path}' ({size} invece di {entry.size})")
+    if entry.crc is not None and crc != entry.crc:
+        raise SarFormatError(f"CRC errato per '{entry.path}'")
+
+
+def sar_to_tar(sar_files: List[str], save_to: str, log: Callable[[str], None],
+               base: str = "", verbose: bool = False, executor: Optional[Executor] = None) -> int:
+    """
+    Converte i pacchetti SAR (già ordinati, es. SAPEXE* prima) in un unico
+    archivio tar; l'estensione di save_to sceglie la compressione
+    (.tar, .tar.gz, .tar.zst, .tar.xz). Restituisce 0 se ok, 1 in caso di errore.
+    """
+    from utils.tar_utils import StreamingTarWriter
+
+    try:
+        dirs, members = plan_members(sar_files, log)
+    except (OSError, SarFormatError) as e:
+        log(f"[ERRORE] {e}")
+        return 1
+    log(f"(info) {len(members)} file e {len(dirs)} cartelle da {len(sar_files)} pacchetti")
+
+    prefix = base.strip("/") + "/" if base.strip("/") else ""
+    own_pool = executor is None
+    if own_pool:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor()
+    try:
+        with StreamingTarWriter(save_to, log, verbose=verbose) as writer:
+            for name, entry in dirs:
+                writer.add_member(prefix + name, 0, stat.S_IMODE(entry.mode), entry.mtime, is_dir=True)
+            stream = _range_stream(members, executor)
+            for _archive, name, entry in members:
+                chunks = _entry_chunks(entry, stream)
+                writer.add_member(prefix + name, entry.size, stat.S_IMODE(entry.mode),
+                                  entry.mtime, chunks)
+                # tarfile smette di leggere a entry.size byte: dimensione e CRC si
+                # controllano consumando il resto del generatore
+                deque(chunks, maxlen=0)
+    except (OSError, SarFormatError) as e:
+        log(f"[ERRORE] Conversione SAR -> TAR fallita: {e}")
+        return 1
+    finally:
+        if own_pool:
+            executor.shutdown()
+    return 0
@@ -0,0 +1,205 @@
+"""
+Motore asyncio per l'esecuzione dei processi esterni (SAPCAR, disp+work).
+
+Un solo event loop, in un thread dedicato, gestisce tutti i processi in
+corso. L'output viene letto a blocchi di byte, decodificato in modo
+incrementale e consegnato al thread chiamante a gruppi di righe tramite
+una coda limitata: se la callback di log rallenta, la coda si riempie,
+il loop smette di leggere la pipe e il processo figlio si ferma sulla
+scrittura invece di accumulare memoria.
+"""
+
+import asyncio
+import codecs
+import concurrent.futures
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# Codice di uscita restituito quando il comando viene annullato (come Ctrl+C nelle shell)
+CANCELLED_RC = 130
+# Codice di uscita restituito quando il comando supera il timeout (come timeout(1))
+TIMEOUT_RC = 124
+# Attesa tra la richiesta di chiusura e l'uccisione forzata dell'albero di processi
+KILL_GRACE = 0.5
+
+# Byte letti dalla pipe per volta
+READ_CHUNK = 64 * 1024
+# Gruppi di righe in coda verso il chiamante (al massimo ~READ_CHUNK byte ciascuno)
+QUEUE_BATCHES = 64
+# Righe senza a capo più lunghe di così vengono consegnate spezzate
+MAX_LINE = 64 * 1024
+# Intervallo con cui il chiamante controlla annullamento e timeout
+POLL_INTERVAL = 0.1
+
+_NEWLINE = re.compile(r"\r\n|\r|\n")
+
+
+def _new_group_kwargs() -> dict:
+    """Avvia il figlio in un proprio gruppo, così può essere terminato con tutti i suoi discendenti"""
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _split_lines(text: str) -> Tuple[List[str], str]:
+    """Divide il testo in righe complete e resto (un \\r finale può precedere un \\n)"""
+    hold = ""
+    if text.endswith("\r"):
+        text, hold = text[:-1], "\r"
+    parts = _NEWLINE.split(text)
+    rest = parts.pop() + hold
+    if len(rest) > MAX_LINE:
+        parts.append(rest)
+        rest = ""
+    return parts, rest
+
+
+class ProcessEngine:
+    """Esegue comandi su un event loop condiviso, con timeout e annullamento"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                # Su Windows il loop predefinito è Proactor, necessario per i sottoprocessi
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True, name="process-engine").start()
+                self._loop = loop
+            return self._loop
+
+    async def _spawn(self, cwd: str, cmd: List[str]):
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=cwd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            **_new_group_kwargs()
+        )
+        return proc, asyncio.Queue(maxsize=QUEUE_BATCHES)
+
+    async def _pump(self, proc, queue: asyncio.Queue) -> int:
+        """Legge l'output a blocchi e accoda gruppi di righe; None segnala la fine"""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        rest = ""
+        while True:
+            chunk = await proc.stdout.read(READ_CHUNK)
+            if not chunk:
+                rest += decoder.decode(b"", final=True)
+                break
+            lines, rest = _split_lines(rest + decoder.decode(chunk))
+            if lines:
+                await queue.put(lines)
+        if rest:
+            await queue.put([rest.rstrip("\r")])
+        await queue.put(None)
+        return await proc.wait()
+
+    async def _kill_tree(self, proc, grace: float) -> None:
+        """Termina il processo e i suoi figli; dopo grace secondi li uccide"""
+        if proc.returncode is not None:
+            return
+        if os.name == "nt":
+            async def taskkill(*flags):
+                killer = await asyncio.create_subprocess_exec(
+                    "taskkill", *flags, "/T", "/PID", str(proc.pid),
+                    stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+                await killer.wait()
+            await taskkill()
+            try:
+                await asyncio.wait_for(proc.wait(), grace)
+            except asyncio.TimeoutError:
+                await taskkill("/F")
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+            await asyncio.wait_for(proc.wait(), grace)
+        except asyncio.TimeoutError:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        except ProcessLookupError:
+            pass
+
+    def run(self, cwd: str, cmd: List[str], on_line: Callable[[str], None],
+            timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None,
+            grace: float = KILL_GRACE) -> int:
+        """
+        Esegue cmd e chiama on_line (nel thread chiamante) per ogni riga di output.
+
+        Returns:
+            int: Codice di uscita, CANCELLED_RC se annullato, TIMEOUT_RC se scaduto
+        Raises:
+            FileNotFoundError / OSError se il processo non può essere avviato
+        """
+        loop = self._ensure_loop()
+        proc, queue = asyncio.run_coroutine_threadsafe(self._spawn(cwd, cmd), loop).result()
+        pump = asyncio.run_coroutine_threadsafe(self._pump(proc, queue), loop)
+
+        deadline = time.monotonic() + timeout if timeout else None
+        stopped: Optional[int] = None
+        give_up = 0.0
+
+        def must_give_up() -> bool:
+            """Avvia la terminazione se annullato/scaduto; True se la pipe non si chiude più"""
+            nonlocal stopped, give_up
+            now = time.monotonic()
+            if stopped is None:
+                if cancel_event is not None and cancel_event.is_set():
+                    stopped = CANCELLED_RC
+                elif deadline is not None and now > deadline:
+                    stopped = TIMEOUT_RC
+                if stopped is not None:
+                    asyncio.run_coroutine_threadsafe(self._kill_tree(proc, grace), loop)
+                    # Un discendente staccato dal gruppo potrebbe tenere aperta la pipe
+                    give_up = now + grace + 2.0
+                return False
+            return now > give_up
+
+        try:
+            while True:
+                get = asyncio.run_coroutine_threadsafe(queue.get(), loop)
+                while True:
+                    try:
+                        batch = get.result(POLL_INTERVAL)
+                        break
+                    except concurrent.futures.TimeoutError:
+                        if must_give_up():
+                            get.cancel()
+                            pump.cancel()
+                            return stopped
+                if batch is None:
+                    break
+                for line in batch:
+                    on_line(line)
+                # Controllo anche quando l'output scorre senza pause
+                must_give_up()
+            rc = pump.result()
+        except BaseException:
+            # Errore nella callback: il processo non deve sopravvivere al chiamante
+            asyncio.run_coroutine_threadsafe(self._kill_tree(proc, grace), loop)
+            pump.cancel()
+            raise
+        return stopped if stopped is not None else rc
+
+
+_engine: Optional[ProcessEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> ProcessEngine:
+    """Motore condiviso da tutti i comandi dell'applicazione"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ProcessEngine()
+        return _engine
@@ -0,0 +1,125 @@
+"""
+Ricerca dei .SAR duplicati per contenuto (stesso pacchetto scaricato due
+volte con nomi diversi, es. "SAPEXE_100-1 (1).SAR").
+
+I candidati vengono ristretti per passi sempre più costosi: stessa
+dimensione, poi stesso hash dell'inizio e della fine del file, infine
+stesso sha256 completo. Gran parte dei file viene esclusa senza leggerli.
+"""
+
+import hashlib
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.hashing import file_digest, file_signature
+
+# Byte letti all'inizio e alla fine del file per l'hash parziale
+PARTIAL_BYTES = 64 * 1024
+
+# Nomi tipici delle copie: "(1)", " - Copia", "_copy", "Copy of"
+_COPY_NAME = re.compile(r"\(\d+\)|[ _-]+(copia|copy)\b|^(copia|copy) (di|of) ", re.IGNORECASE)
+
+
+def path_key(path: str) -> str:
+    """Identità del percorso (stesso file anche se scritto in modo diverso)"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _partial_digest(path: str, size: int) -> str:
+    """Hash di inizio e fine del file; fino a 2 * PARTIAL_BYTES hash dell'intero file"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        if size <= 2 * PARTIAL_BYTES:
+            h.update(f.read())
+        else:
+            h.update(f.read(PARTIAL_BYTES))
+            f.seek(size - PARTIAL_BYTES)
+            h.update(f.read(PARTIAL_BYTES))
+    return h.hexdigest()
+
+
+def _preference(path: str, order: int) -> Tuple[int, int, int]:
+    """Quale copia tenere: nome non da copia, poi nome più corto, poi prima aggiunta"""
+    name = os.path.basename(path)
+    return (1 if _COPY_NAME.search(os.path.splitext(name)[0]) else 0, len(name), order)
+
+
+class DuplicateFinder:
+    """
+    Trova i gruppi di .SAR identici. Gli hash calcolati restano in memoria
+    (per dimensione e mtime) tra una ricerca e l'altra; con full_hash si
+    può riusare una cache persistente, es. utils.sar_verify.HashCache.
+    """
+
+    def __init__(self, hash_cache=None):
+        self.hash_cache = hash_cache
+        self._partial: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._full: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+    def _cached(self, memo: dict, path: str, compute: Callable[[], str]) -> str:
+        sig = file_signature(path)
+        hit = memo.get(path)
+        if hit and hit[0] == sig:
+            return hit[1]
+        value = compute()
+        memo[path] = (sig, value)
+        return value
+
+    def _full_digest(self, path: str) -> str:
+        def compute() -> str:
+            if self.hash_cache is not None:
+                cached = self.hash_cache.get(path, ["sha256"])
+                if cached:
+                    return cached["sha256"]
+            digest = file_digest(path)
+            if self.hash_cache is not None:
+                self.hash_cache.put(path, {"sha256": digest})
+            return digest
+        return self._cached(self._full, path, compute)
+
+    def find(self, paths: List[str]) -> List[List[str]]:
+        """Gruppi di file identici; in ogni gruppo il primo è la copia da tenere"""
+        by_size: Dict[int, List[str]] = {}
+        for path in paths:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            by_size.setdefault(size, []).append(path)
+
+        groups: List[List[str]] = []
+        for size, same_size in by_size.items():
+            if len(same_size) < 2:
+                continue
+            for same_partial in self._split(same_size, lambda p: self._cached(
+                    self._partial, p, lambda: _partial_digest(p, size))):
+                # File piccoli: l'hash parziale li copre già per intero
+                if size <= 2 * PARTIAL_BYTES:
+                    groups.append(same_partial)
+                else:
+                    groups.extend(self._split(same_partial, self._full_digest))
+
+        order = {path: i for i, path in enumerate(paths)}
+        return [sorted(g, key=lambda p: _preference(p, order[p])) for g in groups]
+
+    @staticmethod
+    def _split(paths: List[str], key: Callable[[str], str]) -> List[List[str]]:
+        buckets: Dict[str, List[str]] = {}
+        for path in paths:
+            try:
+                buckets.setdefault(key(path), []).append(path)
+            except OSError:
+                continue
+        return [b for b in buckets.values() if len(b) > 1]
+
+
+def remove_duplicates(paths: List[str], finder: Optional[DuplicateFinder] = None
+                      ) -> Tuple[List[str], Dict[str, str]]:
+    """Lista senza duplicati (ordine invariato) e mappa copia rimossa -> copia tenuta"""
+    finder = finder or DuplicateFinder()
+    removed: Dict[str, str] = {}
+    for group in finder.find(paths):
+        for dup in group[1:]:
+            removed[dup] = group[0]
+    return [p for p in paths if p not in removed], removed
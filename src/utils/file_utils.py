@@ -1,7 +1,9 @@
 import os
+import stat
 import shutil
+import time
 import ctypes
-from typing import Optional
+from typing import Callable, List, Optional
 
 def to_short_path(path: str) -> str:
     """Converte un percorso Windows in formato DOS 8.3 (short path)"""
@@ -73,4 +75,52 @@ def find_dispwork(base_dir: str) -> Optional[str]:
         
     # Ordina per priorità (decrescente)
     candidates.sort(reverse=True)
-    return candidates[0][3]
\ No newline at end of file
+    return candidates[0][3]
+
+def _replace_with_retry(src: str, dst: str, attempts: int = 20, delay: float = 0.1) -> None:
+    """os.replace che riprova se dst è aperto da un altro thread (es. archiviazione .tar in corso su Windows)"""
+    for _ in range(attempts - 1):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            time.sleep(delay)
+    os.replace(src, dst)
+
+
+def _move_into(src: str, dst: str, before_replace: Optional[Callable[[str], None]]) -> None:
+    if before_replace is not None:
+        before_replace(dst)
+    try:
+        os.replace(src, dst)
+    except PermissionError:
+        # File di sola lettura già presente (es. estratto da un pacchetto precedente)
+        if not os.path.islink(dst):
+            os.chmod(dst, stat.S_IWRITE | stat.S_IREAD)
+        _replace_with_retry(src, dst)
+
+
+def merge_tree(src_dir: str, dst_dir: str,
+               before_replace: Optional[Callable[[str], None]] = None) -> List[str]:
+    """
+    Sposta il contenuto di src_dir in dst_dir sovrascrivendo i file esistenti
+    (stessa semantica di un'estrazione sequenziale nella destinazione).
+    I link simbolici, anche a cartelle, vengono spostati come link.
+    before_replace(percorso) viene chiamato prima di scrivere ogni file della
+    destinazione (es. TarPipeline.wait_released, che attende di aver finito
+    di leggere la versione precedente).
+    Restituisce i percorsi relativi dei file spostati.
+    """
+    moved = []
+    for root, dirs, files in os.walk(src_dir):
+        rel_root = os.path.relpath(root, src_dir)
+        target_root = dst_dir if rel_root == "." else os.path.join(dst_dir, rel_root)
+        os.makedirs(target_root, exist_ok=True)
+        # os.walk elenca tra le cartelle i link a cartelle, senza attraversarli
+        links = [name for name in dirs if os.path.islink(os.path.join(root, name))]
+        dirs[:] = [name for name in dirs if name not in links]
+        for name in files + links:
+            _move_into(os.path.join(root, name), os.path.join(target_root, name), before_replace)
+            moved.append(name if rel_root == "." else os.path.join(rel_root, name))
+    shutil.rmtree(src_dir, ignore_errors=True)
+    return moved
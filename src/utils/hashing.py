@@ -0,0 +1,41 @@
+import hashlib
+import os
+from typing import Dict, Iterable, Tuple
+
+# Dimensione dei blocchi letti per calcolare l'hash
+HASH_CHUNK = 1024 * 1024
+
+
+def file_digest(path: str, algorithm: str = "sha256", chunk_size: int = HASH_CHUNK) -> str:
+    """Hash esadecimale del contenuto di un file, letto a blocchi in un buffer riusato"""
+    h = hashlib.new(algorithm)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def file_digests(path: str, algorithms: Iterable[str], chunk_size: int = HASH_CHUNK) -> Dict[str, str]:
+    """Più hash dello stesso file in una sola lettura"""
+    hashes = {name: hashlib.new(name) for name in algorithms}
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            for h in hashes.values():
+                h.update(view[:n])
+    return {name: h.hexdigest() for name, h in hashes.items()}
+
+
+def file_signature(path: str) -> Tuple[int, int]:
+    """(dimensione, mtime in ns): confronto rapido senza leggere il contenuto"""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
@@ -0,0 +1,315 @@
+"""
+Cache locale dei kernel estratti, indirizzata per contenuto.
+
+    <cache>/objects/ab/abcdef...   un file per contenuto (sha256)
+    <cache>/sets/<chiave>.json     un indice per combinazione di .SAR
+
+La chiave di un indice è l'hash degli sha256 dei .SAR (nell'ordine di
+estrazione) e del filtro file; l'indice elenca lo stato finale di ogni
+file (contenuto, dimensione, permessi) e i file spostati da ciascun
+pacchetto. Gli oggetti sono copie indipendenti in sola lettura (reflink
+copy-on-write su Linux dove il file system lo supporta, altrimenti copia;
+su Windows e macOS sempre copia): una
+modifica sul posto in una destinazione non tocca la cache né le altre
+destinazioni. Una combinazione già vista viene materializzata allo stesso
+modo; con hardlinks=True gli oggetti vengono invece collegati (più veloce,
+ma destinazione e cache condividono i file, che restano in sola lettura)
+e il loro sha256 viene ricontrollato prima dell'uso. Oltre max_bytes gli
+indici usati meno di recente vengono eliminati insieme agli oggetti non
+più referenziati.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from utils.hashing import file_digest
+
+# Dimensione massima predefinita della cache
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+CACHE_VERSION = 2
+
+# Modi di materializzazione, dal più economico
+LINK_REFLINK = "reflink"
+LINK_HARDLINK = "hardlink"
+LINK_COPY = "copy"
+
+# Permessi di scrittura tolti agli oggetti in cache
+_WRITE_BITS = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+# ioctl FICLONE di Linux (btrfs, XFS, ...)
+_FICLONE = 0x40049409
+
+
+def _reflink(src: str, dst: str) -> None:
+    """
+    Clona src in dst condividendo i blocchi con l'ioctl FICLONE di Linux
+    (btrfs, XFS, ...). Su Windows (block clone di ReFS) e macOS (clonefile)
+    non è implementato: OSError, e il chiamante ripiega sulla copia.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflink non supportato") from None
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+class _Linker:
+    """Collega file provando reflink, hardlink (se ammesso) e copia; ricorda i modi non supportati"""
+
+    def __init__(self, hardlinks: bool = False):
+        self.modes = [LINK_REFLINK, LINK_HARDLINK, LINK_COPY] if hardlinks else [LINK_REFLINK, LINK_COPY]
+        self.used: Dict[str, int] = {}
+
+    def link(self, src: str, dst: str) -> str:
+        """Crea dst da src; restituisce il modo usato"""
+        for mode in list(self.modes):
+            try:
+                if mode == LINK_REFLINK:
+                    _reflink(src, dst)
+                elif mode == LINK_HARDLINK:
+                    os.link(src, dst)
+                else:
+                    shutil.copy2(src, dst)
+            except OSError:
+                if mode == LINK_COPY:
+                    raise
+                # Non supportato su questo volume: non lo riproviamo per i file successivi
+                self.modes.remove(mode)
+                continue
+            self.used[mode] = self.used.get(mode, 0) + 1
+            return mode
+        raise OSError(f"Impossibile creare {dst}")
+
+    def summary(self) -> str:
+        return ", ".join(f"{n} {mode}" for mode, n in self.used.items()) or "nessun file"
+
+
+def combination_key(sar_digests: List[str], filter_key: str = "") -> str:
+    """Chiave dell'indice per i .SAR (sha256, in ordine di estrazione) e il filtro"""
+    h = hashlib.sha256()
+    for digest in sar_digests:
+        h.update(digest.encode("ascii") + b"\n")
+    h.update(filter_key.encode("utf-8"))
+    return h.hexdigest()
+
+
+class KernelCache:
+    """Cache dei kernel estratti (thread-safe; un solo processo alla volta)"""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, hardlinks: bool = False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hardlinks = hardlinks
+        self.objects_dir = os.path.join(directory, "objects")
+        self.sets_dir = os.path.join(directory, "sets")
+        self._lock = threading.Lock()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _set_path(self, key: str) -> str:
+        return os.path.join(self.sets_dir, key + ".json")
+
+    def _read_set(self, path: str) -> Optional[dict]:
+        try:
+            return self._parse_set(path)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _parse_set(path: str) -> Optional[dict]:
+        """Indice letto da path; None se non valido, OSError se non leggibile"""
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except ValueError:
+                return None
+        return data if isinstance(data, dict) and data.get("version") == CACHE_VERSION else None
+
+    def _write_set(self, key: str, data: dict) -> None:
+        os.makedirs(self.sets_dir, exist_ok=True)
+        path = self._set_path(key)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def lookup(self, sar_digests: List[str], filter_key: str = "") -> Optional[dict]:
+        """Indice della combinazione, se presente e con tutti gli oggetti"""
+        key = combination_key(sar_digests, filter_key)
+        with self._lock:
+            data = self._read_set(self._set_path(key))
+            if data is None:
+                return None
+            for digest, size, _mode in data["files"].values():
+                try:
+                    if os.path.getsize(self._object_path(digest)) != size:
+                        return None
+                except OSError:
+                    return None
+            data["key"] = key
+            return data
+
+    def materialize(self, entry: dict, target_dir: str) -> str:
+        """Ricrea in target_dir i file dell'indice; restituisce il riepilogo dei modi usati"""
+        linker = _Linker(self.hardlinks)
+        for rel, (digest, _size, mode) in entry["files"].items():
+            target = os.path.join(target_dir, *rel.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            obj = self._object_path(digest)
+            # Un oggetto con altri collegamenti (hardlink ammessi o cache di versioni
+            # precedenti) può essere stato modificato da una destinazione
+            if (self.hardlinks or os.stat(obj).st_nlink > 1) and file_digest(obj) != digest:
+                self._remove_object(obj)
+                raise OSError(f"oggetto in cache modificato: {rel}")
+            if linker.link(obj, target) == LINK_HARDLINK:
+                # Il file resta condiviso con la cache: permessi originali senza scrittura
+                os.chmod(target, mode & ~_WRITE_BITS)
+            else:
+                os.chmod(target, mode)
+        for rel in entry.get("dirs", []):
+            os.makedirs(os.path.join(target_dir, *rel.split("/")), exist_ok=True)
+        with self._lock:
+            entry["last_used"] = time.time()
+            data = {k: v for k, v in entry.items() if k != "key"}
+            try:
+                self._write_set(entry["key"], data)
+            except OSError:
+                pass
+        return linker.summary()
+
+    def store(self, sar_digests: List[str], filter_key: str, source_dir: str,
+              packages: List[List[str]], log: Callable[[str], None]) -> None:
+        """
+        Registra il contenuto finale di source_dir per la combinazione.
+        packages: file (relativi, con "/") spostati da ciascun pacchetto, nell'ordine dei .SAR.
+        """
+        files: Dict[str, list] = {}
+        dirs = set()
+        # Mai hardlink verso la destinazione: l'oggetto deve restare indipendente
+        linker = _Linker()
+        for rel in sorted({rel for pkg in packages for rel in pkg}):
+            path = os.path.join(source_dir, *rel.split("/"))
+            if os.path.isdir(path):
+                dirs.add(rel)
+                continue
+            digest = file_digest(path)
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+            obj = self._object_path(digest)
+            # Un oggetto ancora collegato a una destinazione viene sostituito da una copia
+            if not os.path.exists(obj) or (not self.hardlinks and os.stat(obj).st_nlink > 1):
+                os.makedirs(os.path.dirname(obj), exist_ok=True)
+                tmp = f"{obj}.{os.getpid()}.tmp"
+                linker.link(path, tmp)
+                os.chmod(tmp, mode & ~_WRITE_BITS)
+                if os.path.exists(obj):
+                    self._remove_object(obj)
+                os.replace(tmp, obj)
+            files[rel] = [digest, os.path.getsize(obj), mode]
+        key = combination_key(sar_digests, filter_key)
+        now = time.time()
+        with self._lock:
+            self._write_set(key, {
+                "version": CACHE_VERSION,
+                "sars": list(sar_digests),
+                "filter": filter_key,
+                "files": files,
+                "dirs": sorted(dirs),
+                "packages": [[rel for rel in pkg if rel in files or rel in dirs] for pkg in packages],
+                "created": now,
+                "last_used": now,
+            })
+        log(f"[CACHE] Kernel registrato in cache: {len(files)} file ({linker.summary()})")
+        self.evict(log)
+
+    def evict(self, log: Optional[Callable[[str], None]] = None) -> None:
+        """Elimina gli indici meno usati di recente finché la cache non rientra in max_bytes"""
+        with self._lock:
+            sets = []
+            try:
+                names = [n for n in os.listdir(self.sets_dir) if n.endswith(".json")]
+            except OSError:
+                return
+            unreadable = 0
+            for name in names:
+                path = os.path.join(self.sets_dir, name)
+                try:
+                    data = self._parse_set(path)
+                except OSError:
+                    # Indice forse valido ma non leggibile ora: non si tocca
+                    unreadable += 1
+                    continue
+                if data is None:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                sets.append((data.get("last_used", 0.0), path, data))
+            sets.sort()
+            # Indici che non è stato possibile eliminare: i loro oggetti restano
+            pinned = []
+
+            def referenced() -> Dict[str, int]:
+                refs: Dict[str, int] = {}
+                for _, _, data in sets + pinned:
+                    for digest, size, _mode in data["files"].values():
+                        refs[digest] = size
+                return refs
+
+            refs = referenced()
+            removed = 0
+            while sets and sum(refs.values()) > self.max_bytes:
+                entry = sets.pop(0)
+                try:
+                    os.remove(entry[1])
+                except OSError as e:
+                    pinned.append(entry)
+                    if log is not None:
+                        log(f"[AVVISO] Impossibile rimuovere l'indice di cache {entry[1]}: {e}")
+                    continue
+                removed += 1
+                refs = referenced()
+            # Oggetti non più referenziati da nessun indice
+            freed = 0
+            if unreadable:
+                # Gli oggetti degli indici non letti risulterebbero orfani
+                if log is not None:
+                    log(f"[AVVISO] {unreadable} indici di cache non leggibili: oggetti non rimossi")
+                walk = []
+            else:
+                walk = os.walk(self.objects_dir)
+            for root, _, names in walk:
+                for name in names:
+                    if name not in refs:
+                        path = os.path.join(root, name)
+                        try:
+                            size = os.path.getsize(path)
+                            self._remove_object(path)
+                            freed += size
+                        except OSError:
+                            pass
+            if removed and log is not None:
+                log(f"[CACHE] Rimossi {removed} kernel meno recenti ({freed / 1048576:,.0f} MB di oggetti rimossi)")
+
+    @staticmethod
+    def _remove_object(path: str) -> None:
+        """Elimina un oggetto (in sola lettura: su Windows va prima reso scrivibile)"""
+        try:
+            os.remove(path)
+        except PermissionError:
+            os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+            os.remove(path)
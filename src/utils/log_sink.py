@@ -0,0 +1,98 @@
+import queue
+from typing import List
+
+class LogSink:
+    """
+    Raccoglie le righe di log da qualsiasi thread e le scrive nel widget Text
+    a lotti, dal main loop Tk, con cadenza fissa (after()).
+
+    Il widget conserva solo le ultime max_lines righe (ring buffer); se è
+    indicato uno store, ogni lotto viene anche salvato su disco per intero.
+    Le righe scritte prima di attach_store (al massimo max_lines) vengono
+    salvate nello store quando viene collegato.
+    """
+
+    def __init__(self, root, widget, interval_ms: int = 100, max_batch: int = 5000,
+                 max_lines: int = 5000, store=None):
+        self.root = root
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+        self.max_lines = max_lines
+        self.store = store
+        self._queue: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+        self._unstored: List[str] = []
+        self._running = False
+
+    def write(self, message: str) -> None:
+        """Accoda una riga (thread-safe, non tocca il widget)"""
+        self._queue.put(message)
+
+    def start(self) -> None:
+        """Avvia lo svuotamento periodico della coda"""
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval_ms, self._tick)
+
+    def stop(self) -> None:
+        self._running = False
+
+    def attach_store(self, store) -> None:
+        """Collega lo store e vi salva le righe già mostrate (solo dal thread Tk)"""
+        self.store = store
+        pending, self._unstored = self._unstored, []
+        self._store(pending)
+
+    def drain(self) -> None:
+        """Salva nello store le righe ancora in coda senza toccare il widget (alla chiusura)"""
+        while True:
+            lines = self._take_batch()
+            if not lines:
+                return
+            self._store(lines)
+
+    def _store(self, lines: List[str]) -> None:
+        if not lines:
+            return
+        if self.store is None:
+            self._unstored.extend(lines)
+            del self._unstored[:-self.max_lines]
+            return
+        try:
+            self.store.append(lines)
+        except OSError:
+            self.store = None
+
+    def _take_batch(self) -> List[str]:
+        lines = []
+        try:
+            while len(lines) < self.max_batch:
+                lines.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return lines
+
+    def flush(self) -> None:
+        """Scrive subito le righe in coda (solo dal thread Tk)"""
+        lines = self._take_batch()
+        if not lines:
+            return
+        self._store(lines)
+        self.widget.configure(state="normal")
+        self.widget.insert("end", "\n".join(lines) + "\n")
+        # Ring buffer: scarta le righe più vecchie oltre max_lines
+        count = int(self.widget.index("end-1c").split(".")[0]) - 1
+        if count > self.max_lines:
+            self.widget.delete("1.0", f"{count - self.max_lines + 1}.0")
+        self.widget.see("end")
+        self.widget.configure(state="disabled")
+
+    def _tick(self) -> None:
+        if not self._running:
+            return
+        try:
+            self.flush()
+            self.root.after(self.interval_ms, self._tick)
+        except Exception:
+            # Finestra chiusa: il widget non esiste più
+            self._running = False
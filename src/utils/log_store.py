@@ -0,0 +1,149 @@
+import gzip
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Tuple
+
+class LogStore:
+    """
+    Log completo su disco, a segmenti rotanti compressi.
+
+    Le righe vengono accodate al segmento corrente (testo semplice); al
+    raggiungimento di lines_per_segment il segmento viene chiuso e compresso
+    in gzip in background. Il numero di righe di ogni segmento è nel nome
+    del file, così il visualizzatore può saltare a qualsiasi riga caricando
+    un solo segmento alla volta.
+    """
+
+    CURRENT_NAME = "current.log"
+
+    def __init__(self, directory: str, lines_per_segment: int = 100_000, max_segments: int = 200):
+        self.directory = directory
+        self.lines_per_segment = lines_per_segment
+        self.max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._segments: List[Tuple[str, int]] = []   # (percorso, righe) dei segmenti chiusi
+        self._seq = 0
+        self._current_path = os.path.join(directory, self.CURRENT_NAME)
+        self._current = open(self._current_path, "w", encoding="utf-8", newline="\n")
+        self._current_lines = 0
+        self._cache: Dict[str, List[str]] = {}
+        self._current_cache: Tuple[tuple, List[str]] = ((), [])
+
+    @classmethod
+    def for_session(cls, base_dir: str, keep_sessions: int = 5, **kwargs) -> "LogStore":
+        """Crea lo store di una nuova sessione e rimuove le sessioni più vecchie"""
+        logs_dir = os.path.join(base_dir, "logs")
+        os.makedirs(logs_dir, exist_ok=True)
+        sessions = sorted(d for d in os.listdir(logs_dir) if d.startswith("session-"))
+        for old in sessions[:max(0, len(sessions) - (keep_sessions - 1))]:
+            shutil.rmtree(os.path.join(logs_dir, old), ignore_errors=True)
+        name = time.strftime("session-%Y%m%d-%H%M%S")
+        return cls(os.path.join(logs_dir, name), **kwargs)
+
+    @property
+    def total_lines(self) -> int:
+        with self._lock:
+            return sum(n for _, n in self._segments) + self._current_lines
+
+    def append(self, lines: List[str]) -> None:
+        """Accoda righe al log su disco"""
+        if not lines:
+            return
+        with self._lock:
+            if self._current is None:
+                return
+            # una riga di log può contenere a capo: li contiamo come righe separate
+            text = "\n".join(lines) + "\n"
+            self._current.write(text)
+            self._current.flush()
+            self._current_lines += text.count("\n")
+            if self._current_lines >= self.lines_per_segment:
+                self._rotate()
+
+    def _rotate(self) -> None:
+        self._current.close()
+        self._seq += 1
+        plain = os.path.join(self.directory, f"segment-{self._seq:06d}-{self._current_lines}.log")
+        os.replace(self._current_path, plain)
+        self._segments.append((plain, self._current_lines))
+        threading.Thread(target=self._compress, args=(plain,), daemon=True).start()
+
+        while len(self._segments) > self.max_segments:
+            old, _ = self._segments.pop(0)
+            for path in (old, old + ".gz"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        self._current = open(self._current_path, "w", encoding="utf-8", newline="\n")
+        self._current_lines = 0
+
+    def _compress(self, plain: str) -> None:
+        gz = plain + ".gz"
+        try:
+            with open(plain, "rb") as src, gzip.open(gz + ".tmp", "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(gz + ".tmp", gz)
+            with self._lock:
+                self._segments = [(p + ".gz" if p == plain else p, n) for p, n in self._segments]
+                self._cache.pop(plain, None)
+            os.remove(plain)
+        except OSError:
+            pass
+
+    def _load_segment(self, path: str) -> List[str]:
+        lines = self._cache.get(path)
+        if lines is None:
+            if not path.endswith(".gz") and not os.path.exists(path):
+                # compresso nel frattempo dal thread in background
+                path += ".gz"
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+                lines = f.read().split("\n")[:-1]
+            # Tiene in memoria al massimo due segmenti
+            if len(self._cache) >= 2:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[path] = lines
+        return lines
+
+    def read_lines(self, start: int, count: int) -> List[str]:
+        """Restituisce fino a count righe a partire dalla riga start (0-based)"""
+        with self._lock:
+            segments = list(self._segments)
+            if self._current is not None:
+                self._current.flush()
+        result: List[str] = []
+        offset = 0
+        for path, n in segments:
+            if start < offset + n and len(result) < count:
+                seg = self._load_segment(path)
+                lo = max(0, start - offset)
+                result.extend(seg[lo:lo + count - len(result)])
+            offset += n
+        if len(result) < count and start + len(result) >= offset:
+            current = self._read_current()
+            lo = max(0, start + len(result) - offset)
+            result.extend(current[lo:lo + count - len(result)])
+        return result
+
+    def _read_current(self) -> List[str]:
+        size = os.path.getsize(self._current_path) if os.path.exists(self._current_path) else 0
+        key = (self._seq, size)
+        if self._current_cache[0] != key:
+            try:
+                with open(self._current_path, "r", encoding="utf-8", errors="replace") as f:
+                    self._current_cache = (key, f.read().split("\n")[:-1])
+            except OSError:
+                self._current_cache = (key, [])
+        return self._current_cache[1]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._current is not None:
+                self._current.close()
+                self._current = None
@@ -0,0 +1,116 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# Estensioni riconosciute -> codec
+CODEC_EXTENSIONS = (
+    (".tar.gz", "gz"), (".tgz", "gz"),
+    (".tar.zst", "zst"), (".tzst", "zst"),
+    (".tar.xz", "xz"), (".txz", "xz"),
+)
+
+# Dimensione dei blocchi compressi indipendentemente, per codec
+BLOCK_SIZES = {"gz": 1024 * 1024, "zst": 4 * 1024 * 1024, "xz": 8 * 1024 * 1024}
+DEFAULT_LEVELS = {"gz": 6, "zst": 3, "xz": 6}
+
+
+def codec_for_path(path: str) -> Optional[str]:
+    """Codec da usare in base all'estensione del file (None = tar non compresso)"""
+    lower = path.lower()
+    for ext, codec in CODEC_EXTENSIONS:
+        if lower.endswith(ext):
+            return codec
+    return None
+
+
+def _make_compressor(codec: str, level: int):
+    """Restituisce una funzione bytes -> bytes che produce un membro/frame/stream completo"""
+    if codec == "gz":
+        import gzip
+        # mtime=0: membri riproducibili; più membri concatenati sono un .gz valido (come pigz -i)
+        return lambda data: gzip.compress(data, compresslevel=level, mtime=0)
+    if codec == "xz":
+        import lzma
+        # Stream .xz concatenati: supportati da xz, tar -J e dal modulo lzma
+        return lambda data: lzma.compress(data, format=lzma.FORMAT_XZ, preset=level)
+    if codec == "zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("Compressione .zst non disponibile: installa il pacchetto 'zstandard'")
+        import threading
+        # Frame zstd concatenati; ZstdCompressor non è thread-safe: uno per thread
+        local = threading.local()
+
+        def compress(data):
+            cctx = getattr(local, "cctx", None)
+            if cctx is None:
+                cctx = local.cctx = zstandard.ZstdCompressor(level=level)
+            return cctx.compress(data)
+        return compress
+    raise ValueError(f"Codec non supportato: {codec}")
+
+
+class ParallelCompressedWriter:
+    """
+    File-like in sola scrittura che comprime a blocchi in parallelo.
+
+    I dati vengono divisi in blocchi di dimensione fissa, compressi da un
+    pool di thread (zlib/lzma/zstd rilasciano il GIL) e scritti nell'ordine
+    originale. Al massimo 2 blocchi per thread sono in volo, quindi la
+    memoria resta limitata.
+    """
+
+    def __init__(self, path: str, codec: str, level: Optional[int] = None,
+                 workers: Optional[int] = None, block_size: Optional[int] = None):
+        self.codec = codec
+        self._compress = _make_compressor(codec, DEFAULT_LEVELS[codec] if level is None else level)
+        self.block_size = block_size or BLOCK_SIZES[codec]
+        self.workers = workers or max(1, os.cpu_count() or 1)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"compress-{codec}")
+        self._pending = deque()
+        self._buf = bytearray()
+        self._pos = 0
+        self.compressed_bytes = 0
+        self._out = open(path, "wb")
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._buf += data
+        self._pos += len(data)
+        while len(self._buf) >= self.block_size:
+            block = bytes(self._buf[:self.block_size])
+            del self._buf[:self.block_size]
+            self._submit(block)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def _submit(self, block: bytes) -> None:
+        self._pending.append(self._pool.submit(self._compress, block))
+        while len(self._pending) > self.workers * 2:
+            self._write_one()
+
+    def _write_one(self) -> None:
+        out = self._pending.popleft().result()
+        self.compressed_bytes += len(out)
+        self._out.write(out)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._buf:
+                self._submit(bytes(self._buf))
+                self._buf.clear()
+            while self._pending:
+                self._write_one()
+        finally:
+            self.closed = True
+            self._pool.shutdown()
+            self._out.close()
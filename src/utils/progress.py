@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+# Finestra (secondi) su cui si misura la velocità per l'ETA
+RATE_WINDOW = 30.0
+# Secondi di misura minimi prima di stimare l'ETA
+MIN_RATE_SPAN = 2.0
+
+
+class ProgressSnapshot(NamedTuple):
+    fraction: float           # 0..1, pesato sui byte dei .SAR
+    done_bytes: int
+    total_bytes: int
+    rate: Optional[float]     # byte/s misurati sui pacchetti effettivamente estratti
+    eta: Optional[float]      # secondi rimanenti (None finché non c'è una misura)
+    done_packages: int
+    total_packages: int
+
+
+def _toc_weights(sar: str) -> Optional[Dict[str, int]]:
+    """Byte compressi di ogni file del pacchetto, dall'indice dell'archivio (None se non leggibile)"""
+    try:
+        from sar import list_entries
+        return {e.path: max(1, e.compressed_size) for e in list_entries(sar) if e.is_file}
+    except Exception:
+        return None
+
+
+def _line_path(line: str) -> Optional[str]:
+    """Percorso dalla riga "x <file>" di SAPCAR -xvf (o del motore nativo)"""
+    line = line.strip()
+    if not line.startswith("x "):
+        return None
+    path = line[2:].strip().replace("\\", "/")
+    # Solo il prefisso "./": i nomi che iniziano con "." (es. .profile) restano intatti
+    while path.startswith("./"):
+        path = path[2:]
+    # Come SarEntry.path
+    return path.lstrip("/")
+
+
+class ProgressTracker:
+    """
+    Avanzamento di un batch pesato sulla dimensione dei .SAR.
+
+    Con fine=True l'avanzamento dentro un pacchetto segue le righe "x <file>"
+    dell'output, pesate con i byte compressi delle voci lette dall'indice
+    dell'archivio. La velocità (e quindi l'ETA) è misurata su una finestra
+    mobile e considera solo i pacchetti estratti davvero: quelli saltati
+    avanzano la barra ma non falsano la stima.
+    """
+
+    def __init__(self, sar_files: List[str], fine: bool = True):
+        self.fine = fine
+        self._lock = threading.Lock()
+        self._sizes: Dict[int, int] = {}
+        for idx, sar in enumerate(sar_files, start=1):
+            try:
+                self._sizes[idx] = max(1, os.path.getsize(sar))
+            except OSError:
+                self._sizes[idx] = 1
+        self._sars = dict(enumerate(sar_files, start=1))
+        self.total_bytes = sum(self._sizes.values())
+        self._progress: Dict[int, int] = {}
+        self._weights: Dict[int, Optional[Dict[str, int]]] = {}
+        self._started = set()
+        self._finished = set()
+        self._work_done = 0
+        self._samples = deque()
+        self.started_at = time.time()
+
+    def package_started(self, idx: int) -> None:
+        """Il pacchetto inizia l'estrazione (carica l'indice per l'avanzamento fine)"""
+        weights = _toc_weights(self._sars[idx]) if self.fine else None
+        if weights:
+            # Le voci si spartiscono la dimensione del .SAR in proporzione ai loro byte compressi
+            scale = self._sizes[idx] / max(1, sum(weights.values()))
+            weights = {path: int(w * scale) for path, w in weights.items()}
+        with self._lock:
+            self._started.add(idx)
+            self._weights[idx] = weights
+            if not self._samples:
+                # Riferimento per la velocità: inizio del primo pacchetto estratto davvero
+                self._samples.append((time.monotonic(), self._work_done))
+
+    def on_line(self, idx: int, line: str) -> None:
+        """Riga di output del pacchetto idx"""
+        weights = self._weights.get(idx)
+        if not weights:
+            return
+        path = _line_path(line)
+        if path is None:
+            return
+        credit = weights.pop(path, 0)
+        if credit:
+            with self._lock:
+                self._add(idx, credit)
+
+    def package_done(self, idx: int) -> None:
+        """Pacchetto terminato (o saltato): conta per intero"""
+        with self._lock:
+            if idx in self._finished:
+                return
+            self._finished.add(idx)
+            remaining = self._sizes[idx] - self._progress.get(idx, 0)
+            if idx in self._started:
+                self._add(idx, remaining)
+            else:
+                # Saltato: avanza la barra ma non entra nella misura della velocità
+                self._progress[idx] = self._sizes[idx]
+
+    def _add(self, idx: int, amount: int) -> None:
+        amount = min(amount, self._sizes[idx] - self._progress.get(idx, 0))
+        if amount <= 0:
+            return
+        self._progress[idx] = self._progress.get(idx, 0) + amount
+        self._work_done += amount
+        now = time.monotonic()
+        self._samples.append((now, self._work_done))
+        while len(self._samples) > 2 and now - self._samples[0][0] > RATE_WINDOW:
+            self._samples.popleft()
+
+    def snapshot(self) -> ProgressSnapshot:
+        with self._lock:
+            done = sum(self._progress.values())
+            rate = eta = None
+            if self._samples:
+                # Il campione più vecchio della finestra è il riferimento
+                t0, b0 = self._samples[0]
+                now = time.monotonic()
+                if now - t0 >= MIN_RATE_SPAN:
+                    rate = (self._work_done - b0) / (now - t0)
+            if rate:
+                eta = max(0.0, self.total_bytes - done) / rate
+            return ProgressSnapshot(
+                fraction=done / self.total_bytes if self.total_bytes else 1.0,
+                done_bytes=done,
+                total_bytes=self.total_bytes,
+                rate=rate,
+                eta=eta,
+                done_packages=len(self._finished),
+                total_packages=len(self._sizes),
+            )
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    """ETA leggibile (mm:ss o h:mm:ss)"""
+    if seconds is None:
+        return "--:--"
+    m, s = divmod(int(seconds + 0.5), 60)
+    h, m = divmod(m, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
@@ -0,0 +1,145 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+# Database dello storico delle estrazioni (nella cartella delle impostazioni)
+HISTORY_NAME = "history.sqlite3"
+# Estrazioni più recenti considerate per stimare la velocità
+RATE_SAMPLES = 50
+# Estrazioni minime prima di fare previsioni o segnalare lentezze
+MIN_SAMPLES = 3
+# Un pacchetto è "lento" se impiega più di SLOW_FACTOR volte il previsto...
+SLOW_FACTOR = 2.5
+# ...e almeno questi secondi (i pacchetti piccoli sono dominati dall'avvio di SAPCAR)
+SLOW_MIN_SECONDS = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS packages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    host TEXT NOT NULL,
+    package TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    mbps REAL NOT NULL,
+    backend TEXT NOT NULL,
+    workers INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS packages_package ON packages (package, size);
+CREATE INDEX IF NOT EXISTS packages_host ON packages (host, backend, ts);
+"""
+
+
+def _package_key(sar: str) -> str:
+    return os.path.basename(sar).upper()
+
+
+class RunHistory:
+    """
+    Storico locale (SQLite) delle estrazioni riuscite: dimensione, durata,
+    MB/s e host di ogni pacchetto.
+
+    Serve a stimare la durata di un batch prima di avviarlo, a segnalare i
+    pacchetti anomalmente lenti e a ordinare la coda per costo previsto.
+    Le previsioni usano prima le estrazioni dello stesso pacchetto, poi la
+    velocità media misurata su questo host con lo stesso motore.
+    Tutti i metodi sono thread-safe e non sollevano eccezioni: senza
+    database le previsioni sono semplicemente None.
+    """
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, HISTORY_NAME)
+        self.host = socket.gethostname()
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.executescript(_SCHEMA)
+        except (OSError, sqlite3.Error):
+            self._conn = None
+
+    def record(self, sar: str, size: int, duration: float, backend: str, workers: int) -> None:
+        """Registra un'estrazione riuscita"""
+        if self._conn is None or duration <= 0:
+            return
+        mbps = size / 1048576 / duration
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO packages (ts, host, package, size, duration, mbps, backend, workers) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (time.time(), self.host, _package_key(sar), int(size), float(duration),
+                     mbps, backend, int(workers)))
+                self._conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def _query(self, sql: str, params: tuple) -> list:
+        if self._conn is None:
+            return []
+        with self._lock:
+            try:
+                return self._conn.execute(sql, params).fetchall()
+            except sqlite3.Error:
+                return []
+
+    def expected_rate(self, backend: str, workers: int = 1) -> Optional[float]:
+        """Byte/s previsti per pacchetto su questo host (None senza storico sufficiente)"""
+        for sql, params in (
+            ("SELECT size, duration FROM packages WHERE host = ? AND backend = ? AND workers = ? "
+             "ORDER BY ts DESC LIMIT ?", (self.host, backend, workers, RATE_SAMPLES)),
+            ("SELECT size, duration FROM packages WHERE host = ? AND backend = ? "
+             "ORDER BY ts DESC LIMIT ?", (self.host, backend, RATE_SAMPLES)),
+        ):
+            rows = self._query(sql, params)
+            if len(rows) >= MIN_SAMPLES:
+                total_time = sum(d for _, d in rows)
+                return sum(s for s, _ in rows) / total_time if total_time > 0 else None
+        return None
+
+    def expected_duration(self, sar: str, size: int, backend: str, workers: int = 1) -> Optional[float]:
+        """Secondi previsti per estrarre sar (None senza storico)"""
+        rows = self._query(
+            "SELECT duration FROM packages WHERE host = ? AND backend = ? AND package = ? AND size = ? "
+            "ORDER BY ts DESC LIMIT 5", (self.host, backend, _package_key(sar), int(size)))
+        if rows:
+            durations = sorted(d for (d,) in rows)
+            return durations[len(durations) // 2]
+        rate = self.expected_rate(backend, workers)
+        return size / rate if rate else None
+
+    def predict_total(self, sar_files: List[str], backend: str, workers: int = 1) -> Optional[float]:
+        """Durata prevista del batch (None se manca lo storico per qualche pacchetto)"""
+        durations = []
+        for sar in sar_files:
+            try:
+                size = os.path.getsize(sar)
+            except OSError:
+                return None
+            expected = self.expected_duration(sar, size, backend, workers)
+            if expected is None:
+                return None
+            durations.append(expected)
+        if not durations:
+            return 0.0
+        workers = max(1, workers)
+        # Con più worker il batch dura circa il totale diviso per i worker, ma mai meno del pacchetto più lungo
+        return max(sum(durations) / workers, max(durations))
+
+    def is_slow(self, sar: str, size: int, duration: float, backend: str, workers: int = 1) -> Optional[float]:
+        """Durata prevista se duration è anomala rispetto allo storico, altrimenti None"""
+        if duration < SLOW_MIN_SECONDS:
+            return None
+        expected = self.expected_duration(sar, size, backend, workers)
+        if expected and duration > expected * SLOW_FACTOR:
+            return expected
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
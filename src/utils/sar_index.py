@@ -0,0 +1,239 @@
+"""
+Indice dei .SAR di una cartella di download (repository software).
+
+Componente, patch e numero SAP si ricavano dal nome nel formato SAP
+COMPONENTE_PATCH-NUMERO.SAR (es. SAPEXE_1200-80002573.SAR); se l'archivio
+contiene SAPMANIFEST.MF, release, piattaforma e patch vengono presi da lì.
+Il numero SAP identifica il pacchetto per release e piattaforma, quindi
+due file con stesso componente e stesso numero differiscono solo per il
+livello di patch.
+
+L'indice è persistito in JSON per (percorso, dimensione, mtime): una nuova
+scansione della stessa cartella non riapre i file invariati.
+"""
+
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.dedup import path_key
+
+# File (nella cartella delle impostazioni) con l'indice
+INDEX_NAME = "sar_index.json"
+INDEX_VERSION = 1
+# Voce con il manifest del pacchetto negli archivi SAR
+MANIFEST_NAME = "SAPMANIFEST.MF"
+# Oltre questa dimensione la voce non viene considerata un manifest
+MANIFEST_MAX_BYTES = 1024 * 1024
+# File letti contemporaneamente alla prima indicizzazione
+INDEX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+_FILENAME = re.compile(r"^(?P<comp>.+?)_(?P<patch>\d+)-(?P<sapnum>\d+)\.sar$", re.IGNORECASE)
+_MANIFEST_LINE = re.compile(r"^\s*([^:]+?)\s*:\s*(.*?)\s*$")
+
+# Chiavi del manifest, in ordine di preferenza
+_COMPONENT_KEYS = ("keyname",)
+_RELEASE_KEYS = ("kernel release", "release", "keyrelease")
+_PATCH_KEYS = ("kernel patch number", "patch number", "patch level", "patchlevel", "keylevel")
+_PLATFORM_KEYS = ("platform", "os", "operating system")
+
+
+@dataclass
+class SarInfo:
+    """Dati di un .SAR nell'indice"""
+    path: str
+    size: int
+    mtime_ns: int
+    component: Optional[str] = None   # maiuscolo
+    patch: Optional[int] = None
+    sapnum: Optional[str] = None
+    release: Optional[str] = None
+    platform: Optional[str] = None
+    manifest: bool = False            # dati presi da SAPMANIFEST.MF
+    error: Optional[str] = None       # manifest non leggibile (restano i dati del nome)
+
+    @property
+    def group(self) -> Optional[Tuple[str, ...]]:
+        """Pacchetti confrontabili per patch; None se non riconosciuto"""
+        if not self.component or self.patch is None:
+            return None
+        if self.sapnum:
+            return (self.component, self.sapnum)
+        if self.release:
+            return (self.component, self.release, self.platform or "")
+        return None
+
+    def describe(self) -> str:
+        parts = [f"{self.component} patch {self.patch}"]
+        if self.release:
+            parts.append(f"release {self.release}")
+        if self.platform:
+            parts.append(self.platform)
+        return ", ".join(parts)
+
+
+def parse_filename(name: str) -> Optional[Tuple[str, int, str]]:
+    """(componente, patch, numero SAP) da un nome SAP standard, altrimenti None"""
+    m = _FILENAME.match(os.path.basename(name))
+    if not m:
+        return None
+    return m.group("comp").upper(), int(m.group("patch")), m.group("sapnum")
+
+
+def parse_manifest(text: str) -> Dict[str, str]:
+    """Coppie "chiave: valore" del manifest (chiavi minuscole, prima occorrenza)"""
+    values: Dict[str, str] = {}
+    for line in text.splitlines():
+        m = _MANIFEST_LINE.match(line)
+        if m and m.group(2):
+            values.setdefault(m.group(1).lower(), m.group(2))
+    return values
+
+
+def _first(values: Dict[str, str], keys: Tuple[str, ...]) -> Optional[str]:
+    for key in keys:
+        if values.get(key):
+            return values[key]
+    return None
+
+
+def read_manifest(path: str) -> Optional[Dict[str, str]]:
+    """Manifest del .SAR (lettore nativo), None se l'archivio non lo contiene"""
+    from sar import SarArchive
+    from sar.extract import read_entry
+
+    with SarArchive(path) as sar:
+        for entry in sar.iter_entries():
+            if entry.is_file and os.path.basename(entry.path).upper() == MANIFEST_NAME:
+                if entry.size > MANIFEST_MAX_BYTES:
+                    return None
+                return parse_manifest(read_entry(sar, entry).decode("utf-8", "replace"))
+    return None
+
+
+def index_file(path: str, size: int, mtime_ns: int) -> SarInfo:
+    """Legge nome e manifest di un .SAR"""
+    info = SarInfo(path, size, mtime_ns)
+    parsed = parse_filename(path)
+    if parsed:
+        info.component, info.patch, info.sapnum = parsed
+    try:
+        values = read_manifest(path)
+    except Exception as e:
+        info.error = str(e) or type(e).__name__
+        return info
+    if values:
+        info.manifest = True
+        info.component = info.component or (_first(values, _COMPONENT_KEYS) or "").upper() or None
+        info.release = _first(values, _RELEASE_KEYS)
+        info.platform = _first(values, _PLATFORM_KEYS)
+        patch = _first(values, _PATCH_KEYS)
+        if patch and patch.isdigit():
+            info.patch = int(patch)
+    return info
+
+
+class SarIndex:
+    """Indice incrementale dei .SAR (thread-safe)"""
+
+    def __init__(self, path: str, workers: int = INDEX_WORKERS):
+        self.path = path
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries: Dict[str, SarInfo] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("version") == INDEX_VERSION:
+                for key, rec in data.get("entries", {}).items():
+                    self._entries[key] = SarInfo(**rec)
+        except (OSError, ValueError, TypeError):
+            self._entries = {}
+
+    def lookup(self, paths: Iterable[str]) -> List[SarInfo]:
+        """Dati dei .SAR indicati (nell'ordine dato); legge solo i file nuovi o modificati"""
+        result: List[Optional[SarInfo]] = []
+        missing: List[Tuple[int, str, str, int, int]] = []
+        with self._lock:
+            for path in paths:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                key = path_key(path)
+                info = self._entries.get(key)
+                if info and info.size == st.st_size and info.mtime_ns == st.st_mtime_ns:
+                    # Stesso file anche se scritto in modo diverso: restituito col percorso richiesto
+                    result.append(SarInfo(**{**asdict(info), "path": path}))
+                else:
+                    missing.append((len(result), key, path, st.st_size, st.st_mtime_ns))
+                    result.append(None)
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(missing)),
+                                    thread_name_prefix="sar-index") as pool:
+                infos = list(pool.map(lambda m: index_file(*m[2:]), missing))
+            with self._lock:
+                for (pos, key, *_), info in zip(missing, infos):
+                    self._entries[key] = info
+                    result[pos] = info
+                self._dirty = True
+        return [info for info in result if info is not None]
+
+    def scan(self, folder: str) -> List[SarInfo]:
+        """Tutti i .SAR di una cartella (non ricorsivo), in ordine di nome"""
+        with os.scandir(folder) as it:
+            paths = sorted(e.path for e in it if e.name.lower().endswith(".sar") and e.is_file())
+        infos = self.lookup(paths)
+        # Voci di file spariti dalla cartella
+        present = {path_key(i.path) for i in infos}
+        prefix = path_key(folder)
+        with self._lock:
+            gone = [k for k in self._entries if os.path.dirname(k) == prefix and k not in present]
+            for key in gone:
+                del self._entries[key]
+            self._dirty = self._dirty or bool(gone)
+        return infos
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION,
+                           "entries": {k: asdict(v) for k, v in self._entries.items()}}, f)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+
+def select_latest(infos: List[SarInfo]) -> Tuple[List[SarInfo], Dict[str, SarInfo]]:
+    """
+    Pacchetti da tenere (ordine invariato) e mappa percorso superato ->
+    pacchetto più recente dello stesso gruppo. I .SAR non riconosciuti
+    vengono sempre tenuti; a parità di patch si tengono tutti.
+    """
+    best: Dict[Tuple[str, ...], SarInfo] = {}
+    for info in infos:
+        group = info.group
+        if group is not None and (group not in best or info.patch > best[group].patch):
+            best[group] = info
+    superseded: Dict[str, SarInfo] = {}
+    kept: List[SarInfo] = []
+    for info in infos:
+        newest = best.get(info.group) if info.group is not None else None
+        if newest is not None and info.patch < newest.patch:
+            superseded[info.path] = newest
+        else:
+            kept.append(info)
+    return kept, superseded
+
+
+def format_superseded(path: str, newer: SarInfo) -> str:
+    return (f"[SUPERATO] {os.path.basename(path)}: esiste una patch più recente "
+            f"({os.path.basename(newer.path)}, {newer.describe()})")
@@ -0,0 +1,261 @@
+"""
+Verifica dei .SAR prima dell'estrazione.
+
+Ogni .SAR viene confrontato con il checksum pubblicato accanto al file
+(NOME.SAR.sha256, .sha1, .md5, .sha512 oppure liste tipo SHA256SUMS o
+checksums.txt nella stessa cartella, nei formati "hash  nome" e
+"SHA256 (nome) = hash"). Gli archivi firmati contengono SIGNATURE.SMF:
+la firma non viene verificata qui (serve SAPCAR -tVf con il certificato
+SAP), ma la presenza viene riportata.
+
+Gli hash sono calcolati in parallelo (un file per thread, letto a blocchi
+grandi in un buffer riusato: hashlib rilascia il GIL) e memorizzati per
+(percorso, dimensione, mtime), così un file invariato non viene riletto.
+"""
+
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.hashing import file_digests, file_signature
+
+# File (nella cartella delle impostazioni) con gli hash già calcolati
+HASH_CACHE_NAME = "hash_cache.json"
+# Blocchi letti per volta durante la verifica
+VERIFY_CHUNK = 8 * 1024 * 1024
+# File verificati contemporaneamente
+VERIFY_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# Nome della voce con il manifest firmato negli archivi SAR
+SIGNATURE_NAME = "SIGNATURE.SMF"
+
+# Algoritmo riconosciuto dalla lunghezza dell'hash esadecimale
+_ALGORITHMS_BY_LENGTH = {32: "md5", 40: "sha1", 64: "sha256", 128: "sha512"}
+_SIDECAR_SUFFIXES = (".sha256", ".sha512", ".sha1", ".md5")
+_LIST_NAMES = re.compile(r"^(sha\d*|md5)sums?(\.txt)?$|^checksums?(\.txt|\.sha\d*|\.md5)?$|\.(sha\d*|md5)sums?$",
+                         re.IGNORECASE)
+_GNU_LINE = re.compile(r"^([0-9a-fA-F]{32,128})\s+\*?(.+?)\s*$")
+_BSD_LINE = re.compile(r"^(MD5|SHA1|SHA256|SHA512)\s*\((.+)\)\s*=\s*([0-9a-fA-F]{32,128})\s*$", re.IGNORECASE)
+
+# Esiti
+VERIFY_OK = "ok"
+VERIFY_MISMATCH = "mismatch"
+VERIFY_UNVERIFIED = "unverified"
+VERIFY_ERROR = "error"
+
+
+@dataclass
+class VerifyResult:
+    sar: str
+    status: str
+    sha256: Optional[str] = None
+    algorithm: Optional[str] = None
+    source: Optional[str] = None      # file da cui proviene il checksum atteso
+    signed: bool = False              # contiene SIGNATURE.SMF
+    cached: bool = False
+    error: Optional[str] = None
+
+
+class HashCache:
+    """
+    Hash dei file per (percorso, dimensione, mtime), persistiti in JSON.
+    Al salvataggio le voci già su disco vengono unite a quelle in memoria:
+    più istanze sullo stesso file (GUI, verifica, CLI) non si sovrascrivono.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries: Dict[str, dict] = self._read_disk()
+
+    def _read_disk(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def get(self, path: str, algorithms: List[str]) -> Optional[Dict[str, str]]:
+        try:
+            size, mtime_ns = file_signature(path)
+        except OSError:
+            return None
+        with self._lock:
+            rec = self._entries.get(os.path.abspath(path))
+        if not rec or rec.get("size") != size or rec.get("mtime_ns") != mtime_ns:
+            return None
+        digests = rec.get("digests", {})
+        return digests if all(a in digests for a in algorithms) else None
+
+    def put(self, path: str, digests: Dict[str, str]) -> None:
+        try:
+            size, mtime_ns = file_signature(path)
+        except OSError:
+            return
+        key = os.path.abspath(path)
+        with self._lock:
+            rec = self._entries.get(key)
+            if rec and rec.get("size") == size and rec.get("mtime_ns") == mtime_ns:
+                rec["digests"].update(digests)
+            else:
+                self._entries[key] = {"size": size, "mtime_ns": mtime_ns, "digests": dict(digests)}
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            merged = self._read_disk()
+            for key, rec in self._entries.items():
+                old = merged.get(key)
+                if old and old.get("size") == rec.get("size") and old.get("mtime_ns") == rec.get("mtime_ns"):
+                    rec["digests"] = {**old.get("digests", {}), **rec.get("digests", {})}
+                merged[key] = rec
+            # Voci di file non più esistenti
+            self._entries = {k: v for k, v in merged.items() if os.path.exists(k)}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+
+def _parse_checksums(path: str, default_name: Optional[str] = None) -> Dict[str, Tuple[str, str]]:
+    """Checksum elencati in un file: NOME (maiuscolo) -> (algoritmo, hash)"""
+    found: Dict[str, Tuple[str, str]] = {}
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read(1024 * 1024).splitlines()
+    except OSError:
+        return found
+    for line in lines:
+        line = line.strip()
+        m = _BSD_LINE.match(line)
+        if m:
+            algo, name, digest = m.group(1).lower(), m.group(2), m.group(3).lower()
+        else:
+            m = _GNU_LINE.match(line)
+            if m:
+                digest, name = m.group(1).lower(), m.group(2)
+            elif default_name and re.fullmatch(r"[0-9a-fA-F]{32,128}", line):
+                digest, name = line.lower(), default_name
+            else:
+                continue
+            algo = _ALGORITHMS_BY_LENGTH.get(len(digest))
+            if algo is None:
+                continue
+        found[os.path.basename(name.replace("\\", "/")).upper()] = (algo, digest)
+    return found
+
+
+def find_published(sar: str, _lists: Optional[Dict[str, Dict[str, Tuple[str, str, str]]]] = None
+                   ) -> Optional[Tuple[str, str, str]]:
+    """(algoritmo, hash, file sorgente) pubblicato per sar, se presente"""
+    folder = os.path.dirname(os.path.abspath(sar))
+    name = os.path.basename(sar)
+    stem = os.path.splitext(name)[0]
+    for base in (name, stem):
+        for suffix in _SIDECAR_SUFFIXES:
+            sidecar = os.path.join(folder, base + suffix)
+            if os.path.isfile(sidecar):
+                found = _parse_checksums(sidecar, default_name=name).get(name.upper())
+                if found:
+                    return found[0], found[1], sidecar
+    lists = _lists if _lists is not None else {}
+    if folder not in lists:
+        merged: Dict[str, Tuple[str, str, str]] = {}
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            names = []
+        for entry in names:
+            if _LIST_NAMES.search(entry):
+                path = os.path.join(folder, entry)
+                for key, (algo, digest) in _parse_checksums(path).items():
+                    merged.setdefault(key, (algo, digest, path))
+        lists[folder] = merged
+    return lists[folder].get(name.upper())
+
+
+def _is_signed(sar: str) -> bool:
+    try:
+        from sar import list_entries
+        return any(os.path.basename(e.path).upper() == SIGNATURE_NAME for e in list_entries(sar))
+    except Exception:
+        return False
+
+
+class SarVerifier:
+    """
+    Verifica in parallelo una lista di .SAR, con cache degli hash; cache
+    permette di condividere una HashCache già aperta (es. con DuplicateFinder).
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, workers: int = VERIFY_WORKERS,
+                 cache: Optional[HashCache] = None):
+        if cache is None and cache_dir:
+            cache = HashCache(os.path.join(cache_dir, HASH_CACHE_NAME))
+        self.cache = cache
+        self.workers = max(1, workers)
+
+    def _verify_one(self, sar: str, lists: dict) -> VerifyResult:
+        published = find_published(sar, lists)
+        algorithms = ["sha256"]
+        if published and published[0] not in algorithms:
+            algorithms.append(published[0])
+        result = VerifyResult(sar, VERIFY_UNVERIFIED, signed=_is_signed(sar))
+        digests = self.cache.get(sar, algorithms) if self.cache else None
+        if digests is not None:
+            result.cached = True
+        else:
+            try:
+                digests = file_digests(sar, algorithms, VERIFY_CHUNK)
+            except OSError as e:
+                result.status, result.error = VERIFY_ERROR, str(e)
+                return result
+            if self.cache:
+                self.cache.put(sar, digests)
+        result.sha256 = digests["sha256"]
+        if published:
+            algo, expected, source = published
+            result.algorithm, result.source = algo, source
+            result.status = VERIFY_OK if digests[algo] == expected else VERIFY_MISMATCH
+        return result
+
+    def verify(self, sar_files: List[str], log: Callable[[str], None]) -> List[VerifyResult]:
+        """Verifica i .SAR (nell'ordine dato) e riporta l'esito di ciascuno nel log"""
+        lists: dict = {}
+        # Le liste di checksum di ogni cartella vengono lette una volta sola, prima dei thread
+        for sar in sar_files:
+            find_published(sar, lists)
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(sar_files)) or 1,
+                                thread_name_prefix="verify") as pool:
+            results = list(pool.map(lambda s: self._verify_one(s, lists), sar_files))
+        for r in results:
+            log(format_result(r))
+        if self.cache:
+            try:
+                self.cache.save()
+            except OSError:
+                pass
+        return results
+
+
+def format_result(r: VerifyResult) -> str:
+    name = os.path.basename(r.sar)
+    cached = " (hash in cache)" if r.cached else ""
+    signed = "; firmato (SIGNATURE.SMF, firma verificabile con SAPCAR -tVf)" if r.signed else ""
+    if r.status == VERIFY_ERROR:
+        return f"[ERRORE] Verifica di {name} non riuscita: {r.error}"
+    if r.status == VERIFY_MISMATCH:
+        return (f"[ERRORE] {name}: {r.algorithm} diverso da quello pubblicato in "
+                f"{os.path.basename(r.source)} (file corrotto o incompleto){signed}")
+    if r.status == VERIFY_OK:
+        return f"[VERIFICA] {name}: {r.algorithm} corretto ({os.path.basename(r.source)}){cached}{signed}"
+    return f"[VERIFICA] {name}: nessun checksum pubblicato, sha256 {r.sha256}{cached}{signed}"
@@ -2,6 +2,11 @@ import os
 import json
 from typing import Optional
 
+from models.backends import BACKEND_SAPCAR, BACKENDS
+
+DEFAULT_MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+DEFAULT_CACHE_MAX_GB = 20
+
 class SettingsManager:
     def __init__(self):
         self.settings_dir = os.path.join(
@@ -9,34 +14,94 @@ class SettingsManager:
             "SapcarUnpacker"
         )
         self.settings_file = os.path.join(self.settings_dir, "settings.json")
-        
+
     def _ensure_dir(self) -> None:
         """Assicura che la directory delle impostazioni esista"""
         try:
             os.makedirs(self.settings_dir, exist_ok=True)
         except Exception:
             pass
-            
-    def load_last_sapcar(self) -> Optional[str]:
-        """Carica l'ultimo percorso SAPCAR usato"""
+
+    def _read(self) -> dict:
+        """Legge il file delle impostazioni (dizionario vuoto se assente o non valido)"""
         try:
             with open(self.settings_file, "r", encoding="utf-8") as f:
                 data = json.load(f)
-                last = data.get("sapcar_path")
-                if last and os.path.isfile(last):
-                    return last
+                return data if isinstance(data, dict) else {}
         except FileNotFoundError:
             pass
         except Exception:
             pass
-        return None
-        
-    def save_last_sapcar(self, path: str) -> None:
-        """Salva l'ultimo percorso SAPCAR usato"""
+        return {}
+
+    def _update(self, **values) -> None:
+        """Aggiorna solo le chiavi indicate mantenendo le altre impostazioni"""
         try:
             self._ensure_dir()
-            data = {"sapcar_path": path.strip('" ')} if path else {}
+            data = self._read()
+            data.update(values)
             with open(self.settings_file, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
         except Exception:
-            pass
\ No newline at end of file
+            pass
+
+    def load_last_sapcar(self) -> Optional[str]:
+        """Carica l'ultimo percorso SAPCAR usato"""
+        last = self._read().get("sapcar_path")
+        if last and os.path.isfile(last):
+            return last
+        return None
+
+    def save_last_sapcar(self, path: str) -> None:
+        """Salva l'ultimo percorso SAPCAR usato"""
+        self._update(sapcar_path=path.strip('" ') if path else "")
+
+    def load_max_workers(self) -> int:
+        """Carica il numero massimo di estrazioni parallele"""
+        try:
+            return max(1, int(self._read().get("max_workers", DEFAULT_MAX_WORKERS)))
+        except (TypeError, ValueError):
+            return DEFAULT_MAX_WORKERS
+
+    def save_max_workers(self, value: int) -> None:
+        """Salva il numero massimo di estrazioni parallele"""
+        try:
+            self._update(max_workers=max(1, int(value)))
+        except (TypeError, ValueError):
+            pass
+
+    def load_backend(self) -> str:
+        """Carica il motore di estrazione scelto ("sapcar" o "native")"""
+        value = self._read().get("backend")
+        return value if value in BACKENDS else BACKEND_SAPCAR
+
+    def save_backend(self, value: str) -> None:
+        """Salva il motore di estrazione scelto"""
+        if value in BACKENDS:
+            self._update(backend=value)
+
+    @property
+    def cache_dir(self) -> str:
+        """Cartella della cache dei kernel estratti"""
+        return os.path.join(self.settings_dir, "kernel_cache")
+
+    def load_cache_max_bytes(self) -> int:
+        """Dimensione massima della cache dei kernel ("cache_max_gb" in settings.json)"""
+        try:
+            gb = float(self._read().get("cache_max_gb", DEFAULT_CACHE_MAX_GB))
+        except (TypeError, ValueError):
+            gb = DEFAULT_CACHE_MAX_GB
+        return int(max(0.0, gb) * 1024 ** 3)
+
+    def load_cache_hardlinks(self) -> bool:
+        """Materializza la cache con hardlink ("cache_hardlinks" in settings.json, predefinito no)"""
+        return self._read().get("cache_hardlinks") is True
+
+    def load_last_dest(self) -> Optional[str]:
+        """Carica l'ultima cartella di destinazione usata"""
+        last = self._read().get("last_dest")
+        return last if last and os.path.isdir(last) else None
+
+    def save_last_dest(self, path: str) -> None:
+        """Salva l'ultima cartella di destinazione usata"""
+        self._update(last_dest=os.path.normpath(path) if path else "")
@@ -1,40 +1,38 @@
-import subprocess
-from typing import List, Callable
+import threading
+from typing import List, Callable, Optional
 
-def run_cmd(cwd: str, cmd: List[str], log_callback: Callable[[str], None]) -> int:
+# CANCELLED_RC e TIMEOUT_RC sono riesportati per chi usa run_cmd
+from utils.async_process import CANCELLED_RC, KILL_GRACE, TIMEOUT_RC, get_engine
+
+
+def run_cmd(cwd: str, cmd: List[str], log_callback: Callable[[str], None],
+            cancel_event: Optional[threading.Event] = None, grace: float = KILL_GRACE,
+            timeout: Optional[float] = None) -> int:
     """
     Esegue un comando e invia l'output alla callback di log.
-    
+
     Args:
         cwd: Directory di lavoro
         cmd: Lista di argomenti del comando
         log_callback: Funzione per loggare l'output
-        
+        cancel_event: Se impostato, il processo e i suoi figli vengono terminati
+        grace: Secondi concessi al processo prima dell'uccisione forzata
+        timeout: Secondi massimi di esecuzione (None = nessun limite)
+
     Returns:
-        int: Codice di uscita del processo
+        int: Codice di uscita del processo (CANCELLED_RC se annullato, TIMEOUT_RC se scaduto)
     """
     try:
-        process = subprocess.Popen(
-            cmd,
-            cwd=cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            shell=False,
-            text=True,
-            encoding="utf-8",
-            errors="replace"
-        )
-        
-        # Stream dell'output
-        for line in process.stdout:
-            log_callback(line.rstrip("\n"))
-            
-        return process.wait()
-        
+        rc = get_engine().run(cwd, cmd, log_callback, timeout=timeout,
+                              cancel_event=cancel_event, grace=grace)
+        if rc == TIMEOUT_RC and timeout:
+            log_callback(f"[ERRORE] Nessuna risposta entro {timeout:g}s: processo terminato")
+        return rc
+
     except FileNotFoundError as e:
         log_callback(f"[ERRORE] File non trovato: {e}")
         return 127
-        
+
     except Exception as e:
         log_callback(f"[ERRORE] {e}")
-        return 1
\ No newline at end of file
+        return 1
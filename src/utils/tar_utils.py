@@ -0,0 +1,439 @@
+import os
+import queue
+import stat
+import tarfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.parallel_compress import ParallelCompressedWriter, codec_for_path
+
+# Dimensione dei blocchi letti dal thread di prefetch
+CHUNK_SIZE = 1024 * 1024
+# Buffer di scrittura dell'archivio
+WRITE_BUFFER = 8 * 1024 * 1024
+# Memoria massima occupata dai blocchi letti in anticipo
+PREFETCH_BYTES = 64 * 1024 * 1024
+# Intervallo minimo tra due righe di avanzamento nel log
+PROGRESS_INTERVAL = 2.0
+
+# (percorso completo, nome nell'archivio, stat senza seguire i link, è una cartella)
+TarItem = Tuple[str, str, os.stat_result, bool]
+
+
+def iter_tree(source_dir: str, base: str, exclude: Iterable[str] = ()) -> Iterator[TarItem]:
+    """
+    Scorre source_dir in profondità con os.scandir, riusando lo stat delle
+    DirEntry (su Windows non richiede chiamate aggiuntive). Ogni cartella
+    precede il proprio contenuto; i percorsi in exclude vengono saltati.
+    I link simbolici vengono restituiti come link (non seguiti).
+    """
+    excluded = {os.path.normcase(os.path.abspath(p)) for p in exclude}
+    stack = [(source_dir, base)]
+    while stack:
+        folder, arc_folder = stack.pop()
+        try:
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if os.path.normcase(os.path.abspath(entry.path)) in excluded:
+                continue
+            arcname = f"{arc_folder}/{entry.name}" if arc_folder else entry.name
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                yield entry.path, arcname, st, True
+                subdirs.append((entry.path, arcname))
+            elif stat.S_ISREG(st.st_mode) or stat.S_ISLNK(st.st_mode):
+                yield entry.path, arcname, st, False
+        # Ordine alfabetico anche per le sottocartelle (lo stack è LIFO)
+        stack.extend(reversed(subdirs))
+
+
+def _tarinfo(item: TarItem) -> tarfile.TarInfo:
+    full, arcname, st, is_dir = item
+    ti = tarfile.TarInfo(arcname)
+    ti.mtime = int(st.st_mtime)
+    if is_dir:
+        ti.type = tarfile.DIRTYPE
+        ti.mode = stat.S_IMODE(st.st_mode) or 0o755
+    elif stat.S_ISLNK(st.st_mode):
+        ti.type = tarfile.SYMTYPE
+        ti.linkname = os.readlink(full)
+        ti.mode = stat.S_IMODE(st.st_mode) or 0o777
+    else:
+        ti.type = tarfile.REGTYPE
+        ti.size = st.st_size
+        ti.mode = stat.S_IMODE(st.st_mode) or 0o644
+    return ti
+
+
+class _ChunkReader:
+    """File-like che restituisce a tarfile i blocchi letti dal thread di prefetch"""
+
+    def __init__(self, take: Callable[[], bytes]):
+        self._take = take
+        self._buf = b""
+
+    def read(self, n: int) -> bytes:
+        while len(self._buf) < n:
+            chunk = self._take()
+            if not chunk:
+                break
+            self._buf = self._buf + chunk if self._buf else chunk
+        data, self._buf = self._buf[:n], self._buf[n:]
+        return data
+
+
+class StreamingTarWriter:
+    """
+    Scrive un archivio .tar in streaming a memoria costante.
+
+    Un thread di prefetch legge i file in anticipo (al massimo
+    PREFETCH_BYTES in coda) mentre questo thread scrive l'archivio con un
+    buffer grande; l'avanzamento viene riportato nel log in MB/s.
+
+    Se save_to termina con .tar.gz, .tar.zst o .tar.xz (o codec è indicato)
+    il flusso tar viene compresso a blocchi in parallelo.
+    """
+
+    def __init__(self, save_to: str, log: Callable[[str], None], verbose: bool = False,
+                 codec: Optional[str] = None):
+        self.save_to = os.path.abspath(save_to)
+        self.log = log
+        self.verbose = verbose
+        self.codec = codec or codec_for_path(save_to)
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self._t0 = time.time()
+        self._last_report = self._t0
+        if self.codec:
+            self._raw = ParallelCompressedWriter(self.save_to, self.codec)
+        else:
+            self._raw = open(self.save_to, "wb", buffering=WRITE_BUFFER)
+        self._tar = tarfile.open(fileobj=self._raw, mode="w", copybufsize=CHUNK_SIZE)
+
+    def add_tree(self, source_dir: str, base: str, exclude: Iterable[str] = ()) -> None:
+        """Aggiunge il contenuto di source_dir con prefisso base (escluso l'archivio stesso)"""
+        self.add_items(iter_tree(os.path.normpath(source_dir), base, exclude=(self.save_to,) + tuple(exclude)))
+
+    def add_items(self, items: Iterable[TarItem],
+                  on_released: Optional[Callable[[str], None]] = None) -> None:
+        """
+        Aggiunge gli elementi indicati leggendoli con il thread di prefetch;
+        on_released(percorso) viene chiamato quando un file è stato letto e chiuso.
+        """
+        q: "queue.Queue[tuple]" = queue.Queue(maxsize=max(2, PREFETCH_BYTES // CHUNK_SIZE))
+        stop = threading.Event()
+
+        def prefetch():
+            try:
+                for item in items:
+                    if stop.is_set():
+                        return
+                    full, _arcname, st, is_dir = item
+                    if is_dir or stat.S_ISLNK(st.st_mode):
+                        q.put(("item", item))
+                        continue
+                    try:
+                        f = open(full, "rb", buffering=0)
+                        opened = os.fstat(f.fileno())
+                    except OSError as e:
+                        q.put(("skip", item, e))
+                        if on_released:
+                            on_released(full)
+                        continue
+                    if opened.st_size != st.st_size or opened.st_mtime_ns != st.st_mtime_ns:
+                        # File cambiato dopo essere stato accodato: l'header usa la versione aperta
+                        f.close()
+                        q.put(("skip", item, OSError("file modificato dopo essere stato accodato")))
+                        if on_released:
+                            on_released(full)
+                        continue
+                    q.put(("item", item))
+                    remaining = st.st_size
+                    error = None
+                    with f:
+                        while remaining > 0 and not stop.is_set():
+                            try:
+                                chunk = f.read(min(CHUNK_SIZE, remaining))
+                            except OSError as e:
+                                chunk, error = b"", e
+                            if not chunk:
+                                # File accorciato durante la lettura: completiamo con zeri
+                                chunk = bytes(min(CHUNK_SIZE, remaining))
+                                error = error or OSError("file modificato durante la lettura")
+                            remaining -= len(chunk)
+                            q.put(("data", chunk))
+                    if on_released:
+                        on_released(full)
+                    if error:
+                        q.put(("warn", item, error))
+            except Exception as e:
+                q.put(("fatal", None, e))
+            finally:
+                q.put(("done",))
+
+        def take() -> bytes:
+            msg = q.get()
+            return msg[1] if msg[0] == "data" else b""
+
+        reader = threading.Thread(target=prefetch, daemon=True, name="tar-prefetch")
+        reader.start()
+        try:
+            while True:
+                msg = q.get()
+                kind = msg[0]
+                if kind == "done":
+                    break
+                if kind == "fatal":
+                    raise msg[2]
+                if kind == "skip":
+                    self.errors += 1
+                    self.log(f"[ERRORE] Impossibile leggere {msg[1][0]}: {msg[2]}")
+                    continue
+                if kind == "warn":
+                    self.errors += 1
+                    self.log(f"[ERRORE] Lettura incompleta di {msg[1][0]}: {msg[2]}")
+                    continue
+                item = msg[1]
+                try:
+                    ti = _tarinfo(item)
+                except OSError as e:
+                    # Link simbolico non leggibile
+                    self.errors += 1
+                    self.log(f"[ERRORE] Impossibile leggere {item[0]}: {e}")
+                    continue
+                if self.verbose:
+                    self.log(f"Aggiungo: {ti.name}")
+                if ti.type != tarfile.REGTYPE:
+                    self._tar.addfile(ti)
+                else:
+                    self._tar.addfile(ti, _ChunkReader(take))
+                    self.files += 1
+                    self.bytes += ti.size
+                self._report()
+        finally:
+            stop.set()
+            # Sblocca il prefetch se è fermo su una coda piena
+            while reader.is_alive():
+                try:
+                    q.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+
+    def add_member(self, arcname: str, size: int, mode: int, mtime: int,
+                   chunks: Iterable[bytes] = (), is_dir: bool = False) -> None:
+        """Aggiunge un elemento i cui dati arrivano da un iteratore di blocchi (non da disco)"""
+        ti = tarfile.TarInfo(arcname)
+        ti.mtime = int(mtime)
+        ti.mode = mode or (0o755 if is_dir else 0o644)
+        if self.verbose:
+            self.log(f"Aggiungo: {arcname}")
+        if is_dir:
+            ti.type = tarfile.DIRTYPE
+            self._tar.addfile(ti)
+        else:
+            ti.size = size
+            it = iter(chunks)
+            self._tar.addfile(ti, _ChunkReader(lambda: next(it, b"")))
+            self.files += 1
+            self.bytes += size
+        self._report()
+
+    def _report(self, final: bool = False) -> None:
+        now = time.time()
+        if not final and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        elapsed = max(now - self._t0, 1e-6)
+        mb = self.bytes / (1024 * 1024)
+        if final:
+            prefix = f"[ERRORE] TAR incompleto ({self.errors} file non archiviati):" if self.errors else "[OK] TAR completato:"
+        else:
+            prefix = "(info) TAR:"
+        self.log(f"{prefix} {self.files} file, {mb:.1f} MB in {elapsed:.1f}s ({mb / elapsed:.1f} MB/s)")
+
+    def close(self) -> None:
+        """
+        Chiude l'archivio e riporta il riepilogo; solleva OSError se qualche
+        file non è stato archiviato (l'archivio resta leggibile ma incompleto).
+        """
+        try:
+            self._tar.close()
+        finally:
+            self._raw.close()
+        self._report(final=True)
+        if self.codec and self.bytes:
+            ratio = self._raw.compressed_bytes / max(1, self._raw.tell())
+            self.log(f"(info) Compressione {self.codec}: {self._raw.compressed_bytes / (1024 * 1024):.1f} MB ({ratio * 100:.1f}% del tar)")
+        if self.errors:
+            raise OSError(f"archivio incompleto: {self.errors} file non archiviati")
+
+    def __enter__(self) -> "StreamingTarWriter":
+        return self
+
+    def abort(self) -> None:
+        """Chiude i file senza riepilogo (archivio incompleto)"""
+        try:
+            self._tar.close()
+        finally:
+            self._raw.close()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class TarPipeline:
+    """
+    Archivia una cartella mentre viene popolata.
+
+    add_files accoda i percorsi relativi (a source_dir) dei file appena
+    arrivati; un thread li aggiunge subito all'archivio, creando prima le
+    cartelle che li contengono. Lo stat dei file viene preso in add_files,
+    quando sono appena stati spostati nella destinazione. close attende la
+    coda, aggiunge quanto non è ancora stato archiviato (cartelle vuote,
+    file già presenti) e chiude.
+
+    Un file sovrascritto da un pacchetto successivo compare due volte: in
+    estrazione vince l'ultima copia, come su disco. Prima di sovrascriverlo
+    va chiamato wait_released, che attende che la copia precedente sia stata
+    letta (su Windows un file aperto non può essere sostituito).
+    """
+
+    def __init__(self, source_dir: str, save_to: str, log: Callable[[str], None], verbose: bool = False,
+                 exclude: Iterable[str] = ()):
+        self.source_dir = os.path.normpath(source_dir)
+        self.exclude = tuple(exclude)
+        self.base = os.path.basename(self.source_dir.rstrip("\\/"))
+        self.log = log
+        self.writer = StreamingTarWriter(save_to, log, verbose=verbose)
+        self._added = set()
+        self._error: Optional[BaseException] = None
+        # File spariti prima di essere accodati
+        self._missing = 0
+        # File accodati e non ancora letti (percorso normalizzato -> volte)
+        self._pending: Dict[str, int] = {}
+        self._released = threading.Condition()
+        self._queue: "queue.Queue[Optional[list]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._consume, daemon=True, name="tar-pipeline")
+        self._thread.start()
+
+    def add_files(self, rel_paths: Iterable[str]) -> None:
+        """Accoda file (percorsi relativi a source_dir) da archiviare"""
+        batch = []
+        for rel in dict.fromkeys(rel_paths):
+            try:
+                st = os.lstat(os.path.join(self.source_dir, *rel.replace("\\", "/").split("/")))
+            except OSError as e:
+                self._missing += 1
+                self.log(f"[ERRORE] Impossibile leggere {rel}: {e}")
+                continue
+            batch.append((rel, st))
+        with self._released:
+            for rel, _st in batch:
+                key = self._key(rel)
+                self._pending[key] = self._pending.get(key, 0) + 1
+        self._queue.put(batch)
+
+    def wait_released(self, path: str) -> None:
+        """Attende che il file indicato (percorso completo) non sia più in coda o in lettura"""
+        key = os.path.normcase(os.path.abspath(path))
+        with self._released:
+            while key in self._pending:
+                self._released.wait()
+
+    def _key(self, rel: str) -> str:
+        return os.path.normcase(os.path.abspath(os.path.join(self.source_dir, *rel.replace("\\", "/").split("/"))))
+
+    def _release(self, keys: Iterable[str]) -> None:
+        with self._released:
+            for key in keys:
+                count = self._pending.get(key, 0) - 1
+                if count > 0:
+                    self._pending[key] = count
+                else:
+                    self._pending.pop(key, None)
+            self._released.notify_all()
+
+    def _consume(self) -> None:
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            waiting = {self._key(rel) for rel, _st in batch}
+
+            def on_released(full: str) -> None:
+                key = os.path.normcase(os.path.abspath(full))
+                if key in waiting:
+                    waiting.discard(key)
+                    self._release((key,))
+
+            try:
+                if self._error is None:
+                    self.writer.add_items(self._items(batch), on_released=on_released)
+            except BaseException as e:
+                self._error = e
+                self.log(f"[ERRORE] Archiviazione .tar interrotta: {e}")
+            finally:
+                # File saltati o non letti per un errore
+                self._release(waiting)
+
+    def _items(self, batch: List[Tuple[str, os.stat_result]]) -> Iterator[TarItem]:
+        for rel, st in batch:
+            parts = rel.replace("\\", "/").split("/")
+            # Cartelle intermedie non ancora presenti nell'archivio
+            for depth in range(1, len(parts)):
+                arc_dir = "/".join([self.base] + parts[:depth])
+                if arc_dir in self._added:
+                    continue
+                full_dir = os.path.join(self.source_dir, *parts[:depth])
+                try:
+                    dir_st = os.stat(full_dir)
+                except OSError:
+                    continue
+                self._added.add(arc_dir)
+                yield full_dir, arc_dir, dir_st, True
+            full = os.path.join(self.source_dir, *parts)
+            self._added.add("/".join([self.base] + parts))
+            yield full, "/".join([self.base] + parts), st, False
+
+    def close(self) -> None:
+        """Completa l'archivio; solleva l'eventuale errore avvenuto durante la pipeline"""
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            self.writer.abort()
+            raise self._error
+        try:
+            rest = (item for item in iter_tree(self.source_dir, self.base, exclude=(self.writer.save_to,) + self.exclude)
+                    if item[1] not in self._added)
+            self.writer.add_items(rest)
+        except BaseException:
+            self.writer.abort()
+            raise
+        self.writer.errors += self._missing
+        self.writer.close()
+
+
+def create_tar(source_dir: str, save_to: str, log: Callable[[str], None], verbose: bool = False,
+               exclude: Iterable[str] = ()) -> None:
+    """
+    Crea un archivio .tar di source_dir (struttura e cartelle vuote incluse).
+    L'archivio stesso e i percorsi in exclude vengono esclusi.
+    Solleva un'eccezione in caso di errore, anche quando l'archivio è stato
+    scritto ma alcuni file non si sono potuti leggere.
+    """
+    source_dir = os.path.normpath(source_dir)
+    base = os.path.basename(source_dir.rstrip("\\/"))
+    with StreamingTarWriter(save_to, log, verbose=verbose) as writer:
+        writer.add_tree(source_dir, base, exclude=exclude)
@@ -0,0 +1,95 @@
+import tkinter as tk
+from tkinter import ttk
+
+class LogViewer(tk.Toplevel):
+    """
+    Visualizzatore del log completo su disco.
+
+    Mostra solo la pagina visibile: la scrollbar è virtuale e ogni
+    spostamento legge dallo store le sole righe necessarie, così anche
+    milioni di righe non vengono mai caricate tutte in memoria.
+    """
+
+    ROWS = 40
+
+    def __init__(self, parent, store):
+        super().__init__(parent)
+        self.title("Log completo")
+        self.geometry("1000x700")
+        self.store = store
+        self._top = 0
+
+        frame = ttk.Frame(self, padding="5")
+        frame.pack(fill="both", expand=True)
+
+        self.text = tk.Text(
+            frame,
+            height=self.ROWS,
+            wrap=tk.NONE,
+            font=("Consolas", 10),
+            bg="#ffffff",
+            fg="#000000",
+            state="disabled"
+        )
+        self.scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text.pack(fill="both", expand=True)
+
+        bottom = ttk.Frame(self, padding="5")
+        bottom.pack(fill="x")
+        self.position_lbl = ttk.Label(bottom, text="")
+        self.position_lbl.pack(side="left")
+        ttk.Button(bottom, text="Fine", command=self._go_end).pack(side="right", padx=2)
+        ttk.Button(bottom, text="Inizio", command=self._go_start).pack(side="right", padx=2)
+        ttk.Button(bottom, text="Aggiorna", command=self._render).pack(side="right", padx=2)
+
+        self.text.bind("<MouseWheel>", lambda e: self._move(-3 if e.delta > 0 else 3))
+        self.text.bind("<Button-4>", lambda e: self._move(-3))
+        self.text.bind("<Button-5>", lambda e: self._move(3))
+        self.bind("<Prior>", lambda e: self._move(-self.ROWS))
+        self.bind("<Next>", lambda e: self._move(self.ROWS))
+        self.bind("<Home>", lambda e: self._go_start())
+        self.bind("<End>", lambda e: self._go_end())
+
+        self._go_end()
+
+    def _on_scroll(self, *args):
+        """Gestisce i comandi della scrollbar (moveto/scroll) sulla posizione virtuale"""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self._top = int(float(args[1]) * self.store.total_lines)
+            self._render()
+        elif args[0] == "scroll":
+            step = self.ROWS if args[2] == "pages" else 1
+            self._move(int(args[1]) * step)
+
+    def _move(self, delta):
+        self._top += delta
+        self._render()
+        return "break"
+
+    def _go_start(self):
+        self._top = 0
+        self._render()
+
+    def _go_end(self):
+        self._top = self.store.total_lines
+        self._render()
+
+    def _render(self):
+        total = self.store.total_lines
+        self._top = max(0, min(self._top, max(0, total - self.ROWS)))
+        lines = self.store.read_lines(self._top, self.ROWS)
+
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("end", "\n".join(lines))
+        self.text.configure(state="disabled")
+
+        if total:
+            self.scrollbar.set(self._top / total, min(1.0, (self._top + len(lines)) / total))
+            self.position_lbl.configure(text=f"Righe {self._top + 1}–{self._top + len(lines)} di {total}")
+        else:
+            self.scrollbar.set(0.0, 1.0)
+            self.position_lbl.configure(text="Log vuoto")
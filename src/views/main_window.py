@@ -1,7 +1,6 @@
 import os
 import tkinter as tk
 from tkinter import ttk
-import customtkinter as ctk
 class MainWindow(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -14,6 +13,15 @@ class MainWindow(tk.Tk):
         self.sapcar_path = tk.StringVar()
         self.dest_dir = tk.StringVar()
         self.sar_files = []
+        self.max_workers = tk.IntVar(value=1)
+        self.backend = tk.StringVar(value="SAPCAR")
+        self.tar_during = tk.BooleanVar(value=False)
+        self.skip_unchanged = tk.BooleanVar(value=True)
+        self.use_cache = tk.BooleanVar(value=False)
+        self.verify_sar = tk.BooleanVar(value=True)
+        self.latest_only = tk.BooleanVar(value=True)
+        self.include_patterns = tk.StringVar()
+        self.exclude_patterns = tk.StringVar()
         
         # EY Style
         self.style = ttk.Style()
@@ -51,6 +59,8 @@ class MainWindow(tk.Tk):
         self.add_sar_folder_btn.pack(side="left", padx=2)
         self.clear_sar_btn = ttk.Button(sar_frame, text="Svuota Lista")
         self.clear_sar_btn.pack(side="left", padx=2)
+        self.latest_only_chk = ttk.Checkbutton(sar_frame, text="Da cartella: solo ultima patch per componente", variable=self.latest_only)
+        self.latest_only_chk.pack(side="left", padx=(15, 0))
         
         # Sezione Destinazione
         dest_frame = self._create_section(main_frame, "Cartella Destinazione", 2)
@@ -58,6 +68,30 @@ class MainWindow(tk.Tk):
         self.dest_browse_btn = ttk.Button(dest_frame, text="Sfoglia")
         self.dest_browse_btn.pack(side="right")
         
+        # Sezione Opzioni
+        options_frame = self._create_section(main_frame, "Opzioni", 3)
+        ttk.Label(options_frame, text="Estrazioni parallele:").pack(side="left", padx=(0, 5))
+        self.max_workers_spin = ttk.Spinbox(options_frame, from_=1, to=32, width=5, textvariable=self.max_workers)
+        self.max_workers_spin.pack(side="left")
+        ttk.Label(options_frame, text="Motore:").pack(side="left", padx=(15, 5))
+        self.backend_combo = ttk.Combobox(options_frame, values=("SAPCAR", "Nativo"), width=10, state="readonly", textvariable=self.backend)
+        self.backend_combo.pack(side="left")
+        self.tar_during_chk = ttk.Checkbutton(options_frame, text="Crea .tar durante l'estrazione", variable=self.tar_during)
+        self.tar_during_chk.pack(side="left", padx=(15, 0))
+        self.skip_unchanged_chk = ttk.Checkbutton(options_frame, text="Salta pacchetti invariati", variable=self.skip_unchanged)
+        self.skip_unchanged_chk.pack(side="left", padx=(15, 0))
+        self.use_cache_chk = ttk.Checkbutton(options_frame, text="Usa cache kernel", variable=self.use_cache)
+        self.use_cache_chk.pack(side="left", padx=(15, 0))
+        self.verify_sar_chk = ttk.Checkbutton(options_frame, text="Verifica checksum", variable=self.verify_sar)
+        self.verify_sar_chk.pack(side="left", padx=(15, 0))
+
+        # Sezione Filtro file
+        filter_frame = self._create_section(main_frame, "Filtro file (pattern separati da ;  es. disp+work*; R3trans*; lib*.so)", 4)
+        ttk.Label(filter_frame, text="Includi:").pack(side="left", padx=(0, 5))
+        ttk.Entry(filter_frame, textvariable=self.include_patterns).pack(side="left", fill="x", expand=True, padx=(0, 10))
+        ttk.Label(filter_frame, text="Escludi:").pack(side="left", padx=(0, 5))
+        ttk.Entry(filter_frame, textvariable=self.exclude_patterns).pack(side="left", fill="x", expand=True)
+        
         # Sezione Azioni
         actions_frame = ttk.LabelFrame(main_frame, text="Azioni", padding="10")
         actions_frame.pack(fill="x", pady=10)
@@ -65,7 +99,51 @@ class MainWindow(tk.Tk):
         # Griglia azioni
         for i in range(3):
             actions_frame.columnconfigure(i, weight=1, uniform="actions")
+        self.actions_frame = actions_frame
             
+        # Progress bar
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.pack(fill="x", pady=5)
+        
+        self.progress_var = tk.DoubleVar(value=0.0)
+        self.progress_bar = ttk.Progressbar(
+            progress_frame,
+            mode="determinate",
+            variable=self.progress_var
+        )
+        self.progress_bar.pack(side="left", fill="x", expand=True)
+        
+        self.progress_lbl = ttk.Label(progress_frame, text="Pronto")
+        self.progress_lbl.pack(side="left", padx=10)
+        
+        # Log area
+        log_frame = ttk.LabelFrame(main_frame, text="Log", padding="5")
+        log_frame.pack(fill="both", expand=True, pady=(10, 0))
+        
+        self.log = tk.Text(
+            log_frame,
+            height=10,
+            wrap=tk.WORD,
+            font=("Consolas", 10),
+            bg="#ffffff",
+            fg="#000000"
+        )
+        self.log.pack(fill="both", expand=True)
+        
+        # Scrollbar per il log
+        scrollbar = ttk.Scrollbar(log_frame, orient="vertical", command=self.log.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.log.configure(yscrollcommand=scrollbar.set)
+        
+    def create_action_buttons(self):
+        """
+        Crea i pulsanti CustomTkinter delle azioni.
+        Chiamato dopo il primo disegno della finestra: customtkinter (e Pillow)
+        vengono importati solo qui, così la finestra appare subito.
+        """
+        import customtkinter as ctk
+        actions_frame = self.actions_frame
+
         self.run_btn = ctk.CTkButton(
             actions_frame, 
             text="Esegui Estrazione",
@@ -75,14 +153,28 @@ class MainWindow(tk.Tk):
             height=40,              # Slightly taller main button
             border_width=0         # Remove border
         )
-        self.run_btn.grid(row=0, column=0, columnspan=3, sticky="ew", pady=(0, 5))
+        self.run_btn.grid(row=0, column=0, columnspan=2, sticky="ew", padx=(0, 2), pady=(0, 5))
+
+        self.cancel_btn = ctk.CTkButton(
+            actions_frame, 
+            text="Annulla",
+            fg_color="#2E2E38",     # EY Dark grey
+            hover_color="#474752",   # Lighter grey on hover
+            text_color="#FFFFFF",    # White text
+            height=40,
+            border_width=0,
+            state="disabled"
+        )
+        self.cancel_btn.grid(row=0, column=2, sticky="ew", padx=(2, 0), pady=(0, 5))
         
         # Bottoni azioni secondarie
         secondary_btns = [
             ("Testa Kernel", 1, 0),
             ("Esporta Script", 1, 1),
             ("Crea TAR", 1, 2),
-            ("Apri Destinazione", 2, 0, 3)
+            ("Apri Destinazione", 2, 0),
+            ("Pianifica", 2, 1),
+            ("Converti SAR → TAR", 2, 2)
         ]
         
         # create references for secondary buttons so controller can bind actions
@@ -128,42 +220,30 @@ class MainWindow(tk.Tk):
             height=32,
             border_width=0         # Remove border
         )
-        self.open_btn.grid(row=2, column=0, columnspan=3, sticky="ew", padx=2, pady=2)
-            
-        # Progress bar
-        progress_frame = ttk.Frame(main_frame)
-        progress_frame.pack(fill="x", pady=5)
-        
-        self.progress_var = tk.DoubleVar(value=0.0)
-        self.progress_bar = ttk.Progressbar(
-            progress_frame,
-            mode="determinate",
-            variable=self.progress_var
+        self.open_btn.grid(row=2, column=0, sticky="ew", padx=2, pady=2)
+
+        self.plan_btn = ctk.CTkButton(
+            actions_frame, 
+            text="Pianifica",
+            fg_color="#FFE600",     # EY Yellow
+            hover_color="#FFD700",   # Slightly darker yellow on hover
+            text_color="#000000",    # Black text
+            height=32,
+            border_width=0         # Remove border
         )
-        self.progress_bar.pack(side="left", fill="x", expand=True)
-        
-        self.progress_lbl = ttk.Label(progress_frame, text="Pronto")
-        self.progress_lbl.pack(side="left", padx=10)
-        
-        # Log area
-        log_frame = ttk.LabelFrame(main_frame, text="Log", padding="5")
-        log_frame.pack(fill="both", expand=True, pady=(10, 0))
-        
-        self.log = tk.Text(
-            log_frame,
-            height=10,
-            wrap=tk.WORD,
-            font=("Consolas", 10),
-            bg="#ffffff",
-            fg="#000000"
+        self.plan_btn.grid(row=2, column=1, sticky="ew", padx=2, pady=2)
+
+        self.sar2tar_btn = ctk.CTkButton(
+            actions_frame, 
+            text="Converti SAR → TAR",
+            fg_color="#FFE600",     # EY Yellow
+            hover_color="#FFD700",   # Slightly darker yellow on hover
+            text_color="#000000",    # Black text
+            height=32,
+            border_width=0         # Remove border
         )
-        self.log.pack(fill="both", expand=True)
-        
-        # Scrollbar per il log
-        scrollbar = ttk.Scrollbar(log_frame, orient="vertical", command=self.log.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.log.configure(yscrollcommand=scrollbar.set)
-        
+        self.sar2tar_btn.grid(row=2, column=2, sticky="ew", padx=2, pady=2)
+
     def _create_section(self, parent, text, row):
         """Crea una sezione standard dell'interfaccia"""
         frame = ttk.LabelFrame(parent, text=text, padding="5")
@@ -188,6 +268,9 @@ class MainWindow(tk.Tk):
         menubar.add_cascade(label="Strumenti", menu=tools_menu)
         tools_menu.add_command(label="Test Kernel")
         tools_menu.add_command(label="Crea TAR...")
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Log completo...")
+        self.tools_menu = tools_menu
         
         # Menu Aiuto
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# I moduli dell'applicazione si importano dalla cartella src (come "python -m cli")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
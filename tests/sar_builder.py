@@ -0,0 +1,117 @@
+"""
+Costruzione di piccoli archivi SAR per i test.
+
+I blocchi compressi usano lo stesso formato atteso da sar.decompress
+(header SAP di 8 byte seguito da un flusso deflate); non sostituiscono gli
+archivi prodotti da SAPCAR di tests/fixtures/sapcar.
+"""
+
+import struct
+import zlib
+from typing import List, Optional, Tuple
+
+from sar.reader import ALG_LZH
+
+_ENTRY_HEADER = struct.Struct("<2sIIIIIHH")
+_COMPR_HEADER = struct.Struct("<IB2sB")
+
+MTIME = 1700000000
+
+
+def lzh_block(data: bytes) -> bytes:
+    c = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return _COMPR_HEADER.pack(len(data), ALG_LZH, b"\x1f\x9d", 2) + c.compress(data) + c.flush()
+
+
+def lzc_compress(data: bytes, maxbits: int = 16, clear_when_full: bool = False) -> bytes:
+    """
+    Codifica LZW nel formato di compress(1), senza l'header 1F 9D flag:
+    codici LSB-first, gruppi di 8 codici completati a ogni cambio di
+    ampiezza e, in block mode, CLEAR quando la tabella è piena.
+    """
+    init_bits, clear, first = 9, 256, 257
+    maxmaxcode = 1 << maxbits
+    out = bytearray()
+    group = []  # codici del gruppo corrente con la loro ampiezza
+    n_bits = init_bits
+    maxcode = (1 << n_bits) - 1
+    free_ent = first
+    table = {bytes((i,)): i for i in range(256)}
+
+    def flush_group(last=False):
+        if not group:
+            return
+        acc = nacc = 0
+        for code, bits in group:
+            acc |= code << nacc
+            nacc += bits
+        # Il gruppo occupa n_bits byte (8 codici) anche se incompleto, tranne l'ultimo
+        width = (nacc + 7) // 8 if last else group[0][1]
+        out.extend(acc.to_bytes(width, "little"))
+        group.clear()
+
+    def output(code, reset=False):
+        nonlocal n_bits, maxcode
+        group.append((code, n_bits))
+        if len(group) == 8:
+            flush_group()
+        if reset or free_ent > maxcode:
+            flush_group()
+            n_bits = init_bits if reset else n_bits + 1
+            maxcode = maxmaxcode if n_bits == maxbits else (1 << n_bits) - 1
+
+    w = b""
+    for c in data:
+        wc = w + bytes((c,))
+        if wc in table:
+            w = wc
+            continue
+        output(table[w])
+        if free_ent < maxmaxcode:
+            table[wc] = free_ent
+            free_ent += 1
+        elif clear_when_full:
+            table = {bytes((i,)): i for i in range(256)}
+            free_ent = first
+            output(clear, reset=True)
+        w = bytes((c,))
+    if w:
+        output(table[w])
+    flush_group(last=True)
+    return bytes(out)
+
+
+def entry(name: str, data: bytes = b"", etype: bytes = b"RG", mode: int = 0o100755,
+          block_size: int = 65536, crc: Optional[int] = None, compressed: bool = True) -> bytes:
+    raw_name = name.encode() + b"\x00"
+    out = _ENTRY_HEADER.pack(etype, mode, len(data) & 0xFFFFFFFF, len(data) >> 32,
+                             MTIME, 4103, 0, len(raw_name)) + raw_name
+    if etype == b"RG" and data:
+        chunks = [data[i:i + block_size] for i in range(0, len(data), block_size)]
+        for i, chunk in enumerate(chunks):
+            last = i == len(chunks) - 1
+            if compressed:
+                payload, btype = lzh_block(chunk), (b"ED" if last else b"DA")
+            else:
+                payload, btype = chunk, (b"UE" if last else b"UD")
+            out += btype + struct.pack("<I", len(payload)) + payload
+            if last:
+                out += struct.pack("<I", zlib.crc32(data) if crc is None else crc)
+    return out
+
+
+def make_sar(path: str, files: List[Tuple[str, bytes]], **kwargs) -> str:
+    """Scrive un archivio CAR 2.01 con le cartelle necessarie e i file indicati"""
+    dirs = set()
+    for name, _ in files:
+        parts = name.split("/")[:-1]
+        for i in range(1, len(parts) + 1):
+            dirs.add("/".join(parts[:i]))
+    body = b"CAR 2.01"
+    for d in sorted(dirs):
+        body += entry(d, etype=b"DR", mode=0o40755)
+    for name, data in files:
+        body += entry(name, data, **kwargs)
+    with open(path, "wb") as f:
+        f.write(body)
+    return str(path)
@@ -0,0 +1,20 @@
+import io
+import json
+
+import cli
+
+
+def _run(argv):
+    out = io.StringIO()
+    args = cli.build_parser().parse_args(argv)
+    rc = args.func(args, cli.EventWriter(out))
+    return rc, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_missing_sar_dir_is_an_error_event(tmp_path):
+    missing = str(tmp_path / "non-esiste")
+    for argv in (["verify", "--sar-dir", missing],
+                 ["plan", "--dest", str(tmp_path / "dest"), "--sar-dir", missing]):
+        rc, events = _run(argv)
+        assert rc == 2
+        assert events[-1]["event"] == "error" and events[-1]["sar_dir"] == missing
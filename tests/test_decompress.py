@@ -0,0 +1,48 @@
+import random
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+from sar.decompress import _unlzw, decompress_block
+from sar.reader import ALG_LZC, SarBlock
+from sar_builder import lzc_compress
+
+# compress -b 16 di "TOBEORNOTTOBEORTOBEORNOT" (file .Z completo, verificato con gzip -d)
+TOBEORNOT_Z = bytes.fromhex("1f9d90549e0829f2448a932754020e2ca890a04184")
+
+
+def _sample(size):
+    rnd = random.Random(7)
+    words = [bytes(rnd.getrandbits(8) for _ in range(rnd.randint(2, 9))) for _ in range(300)]
+    data = b"".join(rnd.choice(words) for _ in range(size // 5))
+    return data[:size]
+
+
+def test_unlzw_known_vector():
+    assert TOBEORNOT_Z[:2] == b"\x1f\x9d"
+    assert _unlzw(TOBEORNOT_Z[3:], TOBEORNOT_Z[2]) == b"TOBEORNOTTOBEORTOBEORNOT"
+
+
+@pytest.mark.parametrize("maxbits,clear", [(16, False), (12, False), (12, True), (10, True)])
+def test_unlzw_code_width_changes_and_clear(maxbits, clear):
+    data = _sample(300000)
+    assert _unlzw(lzc_compress(data, maxbits, clear), 0x80 | maxbits) == data
+
+
+@pytest.mark.skipif(shutil.which("gzip") is None, reason="gzip non disponibile")
+@pytest.mark.parametrize("maxbits,clear", [(16, False), (12, True)])
+def test_lzc_stream_matches_gzip(maxbits, clear):
+    # gzip -d legge i file .Z di compress: conferma che il flusso di prova è valido
+    data = _sample(300000)
+    z = b"\x1f\x9d" + bytes((0x80 | maxbits,)) + lzc_compress(data, maxbits, clear)
+    assert subprocess.run(["gzip", "-dc"], input=z, capture_output=True, check=True).stdout == data
+    assert _unlzw(z[3:], z[2]) == data
+
+
+def test_decompress_lzc_block():
+    data = _sample(50000)
+    payload = struct.pack("<IB2sB", len(data), ALG_LZC, b"\x1f\x9d", 0x90) + lzc_compress(data)
+    block = SarBlock("ED", 0, len(payload), len(data), ALG_LZC)
+    assert decompress_block(block, payload) == data
@@ -0,0 +1,40 @@
+from utils.dedup import PARTIAL_BYTES, remove_duplicates
+from utils.sar_verify import HashCache
+
+
+def test_same_head_different_tail_is_not_duplicate(tmp_path):
+    head = b"h" * PARTIAL_BYTES
+    size = PARTIAL_BYTES + 30 * 1024
+    a = tmp_path / "PKG_1-1.SAR"
+    b = tmp_path / "PKG_1-1 (1).SAR"
+    a.write_bytes(head + b"a" * (size - PARTIAL_BYTES))
+    b.write_bytes(head + b"b" * (size - PARTIAL_BYTES))
+    kept, removed = remove_duplicates([str(a), str(b)])
+    assert kept == [str(a), str(b)]
+    assert removed == {}
+
+
+def test_identical_small_files_are_duplicates(tmp_path):
+    a = tmp_path / "PKG_1-1.SAR"
+    b = tmp_path / "PKG_1-1 (1).SAR"
+    for p in (a, b):
+        p.write_bytes(b"x" * (PARTIAL_BYTES + 1))
+    kept, removed = remove_duplicates([str(b), str(a)])
+    assert kept == [str(a)]
+    assert removed == {str(b): str(a)}
+
+
+def test_hash_cache_instances_merge_on_save(tmp_path):
+    cache_file = str(tmp_path / "hash_cache.json")
+    a, b = tmp_path / "A.SAR", tmp_path / "B.SAR"
+    a.write_bytes(b"a")
+    b.write_bytes(b"b")
+    first, second = HashCache(cache_file), HashCache(cache_file)
+    first.put(str(a), {"sha256": "aa"})
+    second.put(str(b), {"sha256": "bb"})
+    second.put(str(a), {"md5": "a5"})
+    first.save()
+    second.save()
+    reloaded = HashCache(cache_file)
+    assert reloaded.get(str(a), ["sha256", "md5"]) == {"sha256": "aa", "md5": "a5"}
+    assert reloaded.get(str(b), ["sha256"]) == {"sha256": "bb"}
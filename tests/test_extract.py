@@ -0,0 +1,42 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import sar.extract as extract
+from sar_builder import make_sar
+
+
+class _CountingPool(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=4)
+        self.ranges = 0
+
+    def submit(self, fn, *args, **kwargs):
+        if fn is extract._decode_range:
+            self.ranges += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_large_entries_are_split_over_the_pool(tmp_path, monkeypatch):
+    # Soglie piccole: le voci da ~200 KB vengono trattate come "grandi"
+    monkeypatch.setattr(extract, "SPLIT_BYTES", 16 * 1024)
+    monkeypatch.setattr(extract, "RANGE_BYTES", 8 * 1024)
+    files = [(f"exe/big{i}", os.urandom(200 * 1024)) for i in range(3)] + [("exe/small", b"s")]
+    sar = make_sar(tmp_path / "PKG_1-1.SAR", files, block_size=4096)
+    dest = tmp_path / "dest"
+    lines = []
+    with _CountingPool() as pool:
+        assert extract.extract_archive(sar, str(dest), lines.append, executor=pool) == 0
+    assert pool.ranges > 3 * 10
+    for name, data in files:
+        assert (dest / name).read_bytes() == data
+    assert sum(line.startswith("x exe/") for line in lines) == len(files)
+
+
+def test_bad_crc_in_large_entry_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract, "SPLIT_BYTES", 16 * 1024)
+    monkeypatch.setattr(extract, "RANGE_BYTES", 8 * 1024)
+    sar = make_sar(tmp_path / "BAD_1-1.SAR", [("exe/big", os.urandom(100 * 1024))], block_size=4096, crc=1)
+    lines = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert extract.extract_archive(sar, str(tmp_path / "dest"), lines.append, executor=pool) == 1
+    assert any("CRC errato" in line for line in lines)
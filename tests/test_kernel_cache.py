@@ -0,0 +1,55 @@
+import os
+import time
+
+from utils import kernel_cache
+from utils.kernel_cache import KernelCache
+
+
+def _store(cache, tmp_path, name, content):
+    src = tmp_path / name
+    src.mkdir()
+    (src / "disp+work").write_bytes(content)
+    cache.store([name], "", str(src), [["disp+work"]], lambda line: None)
+    time.sleep(0.01)
+
+
+def test_evict_keeps_objects_of_an_index_it_cannot_remove(tmp_path, monkeypatch):
+    cache = KernelCache(str(tmp_path / "cache"), max_bytes=10**9)
+    _store(cache, tmp_path, "old", b"a" * 1000)
+    _store(cache, tmp_path, "new", b"b" * 1000)
+    old_set = cache._set_path(kernel_cache.combination_key(["old"]))
+    real_remove = os.remove
+
+    def remove(path):
+        if path == old_set:
+            raise PermissionError("in uso")
+        real_remove(path)
+
+    monkeypatch.setattr(kernel_cache.os, "remove", remove)
+    cache.max_bytes = 1500
+    lines = []
+    cache.evict(lines.append)
+    assert any(line.startswith("[AVVISO]") for line in lines)
+    entry = cache.lookup(["old"])
+    assert entry is not None
+    cache.materialize(entry, str(tmp_path / "dest"))
+    assert (tmp_path / "dest" / "disp+work").read_bytes() == b"a" * 1000
+
+
+def test_evict_leaves_objects_when_an_index_is_unreadable(tmp_path, monkeypatch):
+    cache = KernelCache(str(tmp_path / "cache"), max_bytes=10**9)
+    _store(cache, tmp_path, "only", b"a" * 1000)
+    only_set = cache._set_path(kernel_cache.combination_key(["only"]))
+    real_parse = KernelCache._parse_set
+
+    def parse(path):
+        if path == only_set:
+            raise OSError("bloccato")
+        return real_parse(path)
+
+    monkeypatch.setattr(KernelCache, "_parse_set", staticmethod(parse))
+    cache.max_bytes = 0
+    cache.evict(lambda line: None)
+    assert os.path.exists(only_set)
+    objects = [n for _, _, names in os.walk(cache.objects_dir) for n in names]
+    assert len(objects) == 1
@@ -0,0 +1,24 @@
+from utils.log_sink import LogSink
+
+
+class _Store:
+    def __init__(self):
+        self.lines = []
+
+    def append(self, lines):
+        self.lines.extend(lines)
+
+
+def test_lines_before_attach_and_at_close_reach_the_store():
+    sink = LogSink(root=None, widget=None, max_lines=3)
+    for i in range(5):
+        sink.write(f"prima {i}")
+    sink.drain()
+    store = _Store()
+    sink.attach_store(store)
+    # Senza store si conservano solo le ultime max_lines righe
+    assert store.lines == ["prima 2", "prima 3", "prima 4"]
+    sink.write("chiusura")
+    sink.stop()
+    sink.drain()
+    assert store.lines[-1] == "chiusura"
@@ -0,0 +1,32 @@
+import json
+import os
+
+from models.manifest import MANIFEST_NAME, ExtractionManifest, package_key
+
+
+def _sar(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_same_name_in_different_folders_kept_apart(tmp_path):
+    a = _sar(tmp_path / "a" / "PKG_1-1.SAR", b"first")
+    b = _sar(tmp_path / "b" / "PKG_1-1.SAR", b"second")
+    manifest = ExtractionManifest(str(tmp_path / "dest"))
+    manifest.record(a, 0, ["exe/x"])
+    manifest.record(b, 0, ["exe/y"])
+    assert manifest.packages[package_key(a)]["files"] == ["exe/x"]
+    assert manifest.packages[package_key(b)]["files"] == ["exe/y"]
+    assert manifest.sar_unchanged(a) and manifest.sar_unchanged(b)
+
+
+def test_version_1_manifest_is_migrated(tmp_path):
+    sar = _sar(tmp_path / "dl" / "PKG_1-1.SAR", b"data")
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    rec = {"sar": os.path.abspath(sar), "size": 4, "mtime_ns": 0, "sha256": None, "rc": 0, "files": []}
+    (dest / MANIFEST_NAME).write_text(json.dumps({"version": 1, "packages": {"PKG_1-1.SAR": rec}, "files": {}}))
+    manifest = ExtractionManifest.load(str(dest))
+    assert list(manifest.packages) == [package_key(sar)]
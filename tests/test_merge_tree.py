@@ -0,0 +1,41 @@
+import os
+import tarfile
+
+from utils.file_utils import merge_tree
+from utils.tar_utils import TarPipeline
+
+
+def test_merge_tree_moves_symlinks(tmp_path):
+    src, dst = tmp_path / "stage", tmp_path / "dest"
+    (src / "exe" / "real").mkdir(parents=True)
+    (src / "exe" / "real" / "lib.so").write_bytes(b"lib")
+    os.symlink("real", src / "exe" / "linkdir")
+    os.symlink("real/lib.so", src / "exe" / "link.so")
+    moved = merge_tree(str(src), str(dst))
+    assert sorted(moved) == sorted([os.path.join("exe", "real", "lib.so"), os.path.join("exe", "linkdir"),
+                                    os.path.join("exe", "link.so")])
+    assert os.readlink(dst / "exe" / "linkdir") == "real"
+    assert os.readlink(dst / "exe" / "link.so") == "real/lib.so"
+    assert not src.exists()
+
+
+def test_merge_tree_waits_for_tar_pipeline(tmp_path):
+    dest, stage = tmp_path / "dest", tmp_path / "stage"
+    (dest / "exe").mkdir(parents=True)
+    (dest / "exe" / "disp+work").write_bytes(b"old" * 100000)
+    (stage / "exe").mkdir(parents=True)
+    (stage / "exe" / "disp+work").write_bytes(b"new")
+    pipeline = TarPipeline(str(dest), str(tmp_path / "out.tar"), lambda line: None)
+    pipeline.add_files([os.path.join("exe", "disp+work")])
+    waited = []
+
+    def before_replace(path):
+        pipeline.wait_released(path)
+        waited.append(path)
+
+    merge_tree(str(stage), str(dest), before_replace)
+    pipeline.close()
+    assert waited == [str(dest / "exe" / "disp+work")]
+    with tarfile.open(tmp_path / "out.tar") as tar:
+        copies = [m for m in tar.getmembers() if m.name == "dest/exe/disp+work"]
+        assert tar.extractfile(copies[0]).read() == b"old" * 100000
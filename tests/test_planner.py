@@ -0,0 +1,19 @@
+import os
+
+from models.planner import CLUSTER_SIZE, SPACE_HEADROOM, plan_extraction
+from sar_builder import make_sar
+
+
+def test_existing_files_in_dest_are_reclaimable(tmp_path):
+    data = b"k" * (10 * CLUSTER_SIZE)
+    sar = make_sar(tmp_path / "PKG_1-1.SAR", [("exe/disp+work", data), ("exe/new", b"n")])
+    dest = tmp_path / "dest"
+    fresh = plan_extraction([sar], str(dest))
+    assert fresh.reclaimable_bytes == 0
+
+    os.makedirs(dest / "exe")
+    (dest / "exe" / "disp+work").write_bytes(data)
+    again = plan_extraction([sar], str(dest))
+    assert again.reclaimable_bytes == len(data)
+    assert again.required_bytes == fresh.required_bytes - len(data)
+    assert again.required_bytes >= SPACE_HEADROOM
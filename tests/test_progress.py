@@ -0,0 +1,9 @@
+from utils.progress import _line_path
+
+
+def test_line_path_keeps_dot_files():
+    assert _line_path("x ./.profile") == ".profile"
+    assert _line_path("x .profile") == ".profile"
+    assert _line_path("x ../x") == "../x"
+    assert _line_path("x exe\\disp+work") == "exe/disp+work"
+    assert _line_path("(info) altro") is None
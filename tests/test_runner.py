@@ -0,0 +1,82 @@
+import json
+import os
+import stat
+import sys
+
+from models.extraction_runner import ExtractionRunner
+from models.member_filter import MemberFilter
+
+# SAPCAR finto: "-xvf ARCHIVIO -R DEST [voci...]" scrive DEST/<archivio>.txt con le voci richieste
+FAKE_SAPCAR = f"""#!{sys.executable}
+import os, sys
+args = sys.argv[1:]
+sar, dest, members = args[1], args[3], args[4:]
+with open(os.path.join(dest, os.path.basename(sar) + ".txt"), "w") as f:
+    f.write(" ".join(members) or "tutto")
+print("x " + os.path.basename(sar) + ".txt")
+sys.exit(1 if "FAIL" in sar else 0)
+"""
+
+
+def _fake_sapcar(tmp_path):
+    path = tmp_path / "sapcar"
+    path.write_text(FAKE_SAPCAR)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def test_filter_falls_back_to_full_extraction_when_index_unreadable(tmp_path):
+    sapcar = _fake_sapcar(tmp_path)
+    sar = tmp_path / "SAPEXE_1-1.SAR"
+    sar.write_bytes(b"non un archivio CAR")
+    dest = tmp_path / "dest"
+    lines = []
+    runner = ExtractionRunner(os.path.dirname(sapcar), os.path.basename(sapcar), str(dest), lines.append,
+                              preflight=False, member_filter=MemberFilter(["disp+work*"]))
+    assert runner.run([str(sar)]) == 0
+    assert any(line.startswith("[AVVISO]") and "pacchetto completo" in line for line in lines)
+    assert (dest / "SAPEXE_1-1.SAR.txt").read_text() == "tutto"
+    with open(dest / ".sapcar_manifest.json", encoding="utf-8") as f:
+        (rec,) = json.load(f)["packages"].values()
+    assert rec["rc"] == 0 and rec["filter"] == ""
+
+
+class _UnusedCache:
+    def lookup(self, *args):
+        raise AssertionError("la cache non va usata se lo spazio non basta")
+
+
+def test_preflight_runs_before_cache(tmp_path, monkeypatch):
+    import models.extraction_runner as runner_mod
+
+    class _Plan:
+        fits = False
+
+    monkeypatch.setattr(runner_mod, "plan_extraction", lambda *args: _Plan())
+    monkeypatch.setattr(runner_mod, "format_plan", lambda plan: ["[ERRORE] Spazio insufficiente"])
+    sapcar = _fake_sapcar(tmp_path)
+    sar = tmp_path / "SAPEXE_1-1.SAR"
+    sar.write_bytes(b"CAR 2.01")
+    lines = []
+    runner = ExtractionRunner(os.path.dirname(sapcar), os.path.basename(sapcar), str(tmp_path / "dest"),
+                              lines.append, cache=_UnusedCache())
+    assert runner.run([str(sar)]) == 1
+    assert "[ERRORE] Spazio insufficiente" in lines
+
+
+def test_failed_package_is_not_merged(tmp_path):
+    sapcar = _fake_sapcar(tmp_path)
+    ok, bad = tmp_path / "SAPEXE_1-1.SAR", tmp_path / "FAIL_1-1.SAR"
+    ok.write_bytes(b"CAR 2.01")
+    bad.write_bytes(b"CAR 2.01")
+    dest = tmp_path / "dest"
+    lines = []
+    runner = ExtractionRunner(os.path.dirname(sapcar), os.path.basename(sapcar), str(dest), lines.append,
+                              preflight=False)
+    assert runner.run([str(ok), str(bad)]) == 1
+    assert (dest / "SAPEXE_1-1.SAR.txt").exists()
+    assert not (dest / "FAIL_1-1.SAR.txt").exists()
+    assert any("FAIL_1-1.SAR non spostato in destinazione" in line for line in lines)
+    with open(dest / ".sapcar_manifest.json", encoding="utf-8") as f:
+        packages = {os.path.basename(r["sar"]): r for r in json.load(f)["packages"].values()}
+    assert packages["FAIL_1-1.SAR"]["rc"] == 1 and packages["FAIL_1-1.SAR"]["files"] == []
@@ -0,0 +1,45 @@
+"""Motore nativo contro gli SHA-256 registrati da SAPCAR (vedi tests/fixtures/sapcar)"""
+
+import hashlib
+import json
+import os
+
+import pytest
+
+from sar.extract import extract_archive
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sapcar")
+EXPECTED = os.path.join(CORPUS, "expected.json")
+
+
+def _expected():
+    try:
+        with open(EXPECTED, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _tree_digest(root):
+    result = {}
+    for dirpath, _dirs, files in os.walk(root):
+        for name in files:
+            full = os.path.join(dirpath, name)
+            with open(full, "rb") as f:
+                result[os.path.relpath(full, root).replace("\\", "/")] = hashlib.sha256(f.read()).hexdigest()
+    return result
+
+
+CASES = sorted(_expected().items())
+
+
+@pytest.mark.skipif(not CASES, reason="corpus SAPCAR non presente (tests/fixtures/sapcar/README.md)")
+@pytest.mark.parametrize("name,digests", CASES, ids=[name for name, _ in CASES])
+def test_native_matches_sapcar(tmp_path, name, digests):
+    from concurrent.futures import ThreadPoolExecutor
+
+    lines = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        rc = extract_archive(os.path.join(CORPUS, name), str(tmp_path), lines.append, executor=pool)
+    assert rc == 0, lines
+    assert _tree_digest(tmp_path) == digests
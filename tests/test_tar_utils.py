@@ -0,0 +1,57 @@
+import os
+import tarfile
+
+import pytest
+
+from utils.tar_utils import StreamingTarWriter, create_tar
+
+
+def test_create_tar_archives_tree(tmp_path):
+    src = tmp_path / "kernel"
+    (src / "exe").mkdir(parents=True)
+    (src / "exe" / "disp+work").write_bytes(b"kernel")
+    create_tar(str(src), str(tmp_path / "out.tar"), lambda line: None)
+    with tarfile.open(tmp_path / "out.tar") as tar:
+        assert tar.extractfile("kernel/exe/disp+work").read() == b"kernel"
+
+
+def test_unreadable_file_fails_the_archive(tmp_path):
+    present = tmp_path / "present"
+    present.write_bytes(b"data")
+    st = os.stat(present)
+    lines = []
+    writer = StreamingTarWriter(str(tmp_path / "out.tar"), lines.append)
+    writer.add_items([(str(tmp_path / "gone"), "gone", st, False), (str(present), "present", st, False)])
+    with pytest.raises(OSError, match="1 file non archiviati"):
+        writer.close()
+    assert any(line.startswith("[ERRORE] TAR incompleto") for line in lines)
+    with tarfile.open(tmp_path / "out.tar") as tar:
+        assert tar.getnames() == ["present"]
+
+
+def test_file_changed_after_queueing_is_not_padded(tmp_path):
+    path = tmp_path / "lib.so"
+    path.write_bytes(b"old")
+    st = os.stat(path)
+    path.write_bytes(b"much longer content")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    writer = StreamingTarWriter(str(tmp_path / "out.tar"), lambda line: None)
+    writer.add_items([(str(path), "lib.so", st, False)])
+    with pytest.raises(OSError):
+        writer.close()
+    with tarfile.open(tmp_path / "out.tar") as tar:
+        assert tar.getnames() == []
+
+
+def test_create_tar_keeps_symlinks(tmp_path):
+    src = tmp_path / "kernel"
+    (src / "exe").mkdir(parents=True)
+    (src / "exe" / "libsapu16.so").write_bytes(b"lib")
+    os.symlink("libsapu16.so", src / "exe" / "libsapu16_mt.so")
+    os.symlink("exe", src / "run")
+    create_tar(str(src), str(tmp_path / "out.tar"), lambda line: None)
+    with tarfile.open(tmp_path / "out.tar") as tar:
+        link = tar.getmember("kernel/exe/libsapu16_mt.so")
+        assert link.issym() and link.linkname == "libsapu16.so"
+        assert tar.getmember("kernel/run").issym()
+        assert "kernel/run/libsapu16.so" not in tar.getnames()
@@ -0,0 +1,47 @@
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+
+from sar.to_tar import sar_to_tar
+from sar_builder import entry, make_sar
+
+
+def _convert(sar, output):
+    lines = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        rc = sar_to_tar([sar], str(output), lines.append, executor=pool)
+    return rc, lines
+
+
+def test_sar_to_tar_writes_members(tmp_path):
+    data = bytes(range(256)) * 1000
+    sar = make_sar(tmp_path / "PKG_1-1.SAR", [("exe/disp+work", data), ("exe/empty.txt", b"x")], block_size=4096)
+    rc, _ = _convert(sar, tmp_path / "out.tar")
+    assert rc == 0
+    with tarfile.open(tmp_path / "out.tar") as tar:
+        assert tar.extractfile("exe/disp+work").read() == data
+        assert tar.extractfile("exe/empty.txt").read() == b"x"
+
+
+def test_sar_to_tar_rejects_bad_crc(tmp_path):
+    sar = make_sar(tmp_path / "BAD_1-1.SAR", [("exe/disp+work", b"kernel" * 5000)], crc=0xDEADBEEF)
+    rc, lines = _convert(sar, tmp_path / "out.tar")
+    assert rc == 1
+    assert any("CRC errato" in line for line in lines)
+
+
+def test_sar_to_tar_rejects_unsafe_paths(tmp_path):
+    sar = make_sar(tmp_path / "EVIL_1-1.SAR", [("exe/../../etc/profile", b"x")])
+    rc, lines = _convert(sar, tmp_path / "out.tar")
+    assert rc == 1
+    assert any("Percorso non sicuro" in line for line in lines)
+
+
+def test_sar_to_tar_logs_skipped_entries(tmp_path):
+    sar = tmp_path / "LINK_1-1.SAR"
+    sar.write_bytes(open(make_sar(tmp_path / "BASE_1-1.SAR", [("exe/lib.so", b"lib")]), "rb").read()
+                    + entry("exe/link.so", etype=b"LK", mode=0o120777))
+    rc, lines = _convert(str(sar), tmp_path / "out.tar")
+    assert rc == 0
+    assert "(info) voce di tipo LK ignorata: exe/link.so" in lines
+    with tarfile.open(tmp_path / "out.tar") as tar:
+        assert tar.getnames() == ["exe", "exe/lib.so"]